@@ -1,5 +1,6 @@
 import os
 import bpy
+from LevelBuilder import import_world_reference # the addon has to be installed
 
 # put the location to the folder where the objs are located here in this fashion
 # this line will only work on windows ie C:\objects
@@ -11,7 +12,5 @@ file_list = sorted(os.listdir(path_to_obj_dir))
 # get a list of files ending in 'obj'
 obj_list = [item for item in file_list if item.endswith('.obj')]
 
-# loop through the strings in obj_list and add the files to the scene
-for item in obj_list:
-    path_to_file = os.path.join(path_to_obj_dir, item)
-    bpy.ops.import_scene.obj(filepath = path_to_file)
\ No newline at end of file
+# add the files to the scene, parsed in parallel by the addon's world reference loader
+import_world_reference(bpy.context, [os.path.join(path_to_obj_dir, item) for item in obj_list])
\ No newline at end of file
@@ -0,0 +1,67 @@
+import os, sys, time, random, tempfile, tracemalloc
+
+# compares the streaming actor writer against the old list building one, for throughput and peak memory
+# run with: blender -b --python BenchmarkActorExport.py
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from LevelBuilder import actor_blocks, write_actor_blocks
+
+# stands in for an actor object so the benchmark measures the writer, not creating 100k objects
+class FakeActor(dict):
+    def __init__(self, index):
+        super().__init__({"Actor Type": "money", "Game Task": 0, "Bounding Sphere Radius": 10})
+        self.name = "Actor."+format(index, "03d")
+        self.location = [random.uniform(-1000.0, 1000.0) for axis in range(3)]
+        self.rotation_quaternion = [random.random() for axis in range(4)]
+
+# the writer the addon used before, kept here to compare against
+def old_actor_block(actor_name, actor_type, actor_location, actor_rotation, game_task, bsphere_radius):
+    return ['    {\n', '      "trans": [', str(actor_location[0]), ', ', str(actor_location[2]), ', ', str(actor_location[1]), '],\n',
+        '      "etype": "', actor_type, '",\n', '      "game_task": ', str(game_task), ',\n',
+        '      "quat" : [', str(actor_rotation[0]), ', ', str(actor_rotation[1]), ', ', str(actor_rotation[2]), ', ', str(actor_rotation[3]), '],\n',
+        '      "bsphere": [', str(actor_location[0]), ', ', str(actor_location[2]), ', ', str(actor_location[1]), ', ', str(bsphere_radius), '],\n',
+        '      "lump": {\n', '        "name":"', actor_name, '"\n', '      }\n', '    }']
+
+def old_writer(f, actors):
+    contents = []
+    commas = len(actors)
+    for actor in actors:
+        contents+=old_actor_block(actor.name, actor["Actor Type"], actor.location, actor.rotation_quaternion, actor["Game Task"], actor["Bounding Sphere Radius"])
+        if commas>1:
+            contents+=",\n\n"
+            commas-=1
+        else:
+            contents+="\n\n"
+    f.writelines(contents)
+
+def new_writer(f, actors):
+    # gather_actors reads these with foreach_get from real objects, plain lists stand in for its output here
+    translations = [[actor.location[0], actor.location[2], actor.location[1]] for actor in actors]
+    # the bsphere centered on the actor, like gather_actors without Automatic Bounding Spheres
+    bspheres = [trans+[actor["Bounding Sphere Radius"]] for trans, actor in zip(translations, actors)]
+    fields = ([actor.name for actor in actors], [actor["Actor Type"] for actor in actors],
+        translations, [actor.rotation_quaternion for actor in actors],
+        [actor["Game Task"] for actor in actors], bspheres)
+    write_actor_blocks(f, actor_blocks(*fields))
+
+def measure(writer, actors, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(path, 'w', encoding="utf-8", buffering=1024*1024) as f:
+        writer(f, actors)
+    elapsed = time.perf_counter()-start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    with open(path, 'rb') as f:
+        return elapsed, peak, f.read()
+
+print("\nActor export writer")
+with tempfile.TemporaryDirectory() as directory:
+    for count in (1000, 10000, 100000):
+        actors = [FakeActor(index) for index in range(count)]
+        results = {}
+        for name, writer in (("old", old_writer), ("streaming", new_writer)):
+            elapsed, peak, output = measure(writer, actors, os.path.join(directory, name+".jsonc"))
+            results[name] = output
+            print("\t"+str(count)+" actors, "+name+": "+format(count/elapsed, ",.0f")+" actors/s, peak "+format(peak/1024/1024, ".2f")+" MB")
+        print("\t"+str(count)+" actors, output identical: "+str(results["old"] == results["streaming"]))
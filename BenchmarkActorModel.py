@@ -0,0 +1,46 @@
+import bpy, os, sys, time
+
+# compares building the actor mesh from the packed model against the old from_pydata path
+# run with: blender -b --python BenchmarkActorModel.py
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from LevelBuilder import actor_model_path, read_actor_model, load_actor_model
+
+runs = 500
+path = actor_model_path("money")
+
+# recreate the Vector literals the addon used to carry so the old path pays for them like it used to
+co, edges, loop_starts, loop_totals, loop_vertices = read_actor_model(path)
+co, edges, loop_vertices = co.tolist(), edges.tolist(), loop_vertices.tolist()
+source = "verts = [\n"
+for i in range(0, len(co), 3):
+    source += "    Vector(("+str(co[i])+","+str(co[i+1])+","+str(co[i+2])+")),\n"
+source += "    ]\n\nedges = "+str([edges[i:i+2] for i in range(0, len(edges), 2)])
+source += "\n\nfaces = "+str([loop_vertices[start:start+total] for start, total in zip(loop_starts.tolist(), loop_totals.tolist())])+"\n"
+
+start = time.perf_counter()
+code = compile(source, "<actor literals>", "exec")
+compile_time = time.perf_counter()-start
+
+def from_pydata():
+    data = {"Vector": __import__("mathutils").Vector}
+    exec(code, data)
+    mesh = bpy.data.meshes.new(name="benchmark")
+    mesh.from_pydata(data["verts"], data["edges"], data["faces"])
+    return mesh
+
+def foreach_set():
+    return load_actor_model(path, "benchmark")
+
+print("\nActor model loader, "+str(runs)+" builds each")
+print("\tparsing the literals once: "+format(compile_time*1000, ".3f")+" ms")
+
+for name, build in (("from_pydata", from_pydata), ("foreach_set", foreach_set)):
+    meshes = []
+    start = time.perf_counter()
+    for run in range(runs):
+        meshes.append(build())
+    elapsed = time.perf_counter()-start
+    for mesh in meshes:
+        bpy.data.meshes.remove(mesh)
+    print("\t"+name+": "+format(elapsed/runs*1000, ".3f")+" ms per mesh")
@@ -0,0 +1,40 @@
+import bpy, os, sys, time, tempfile
+
+# compares the direct .glb writer against blender's gltf exporter on a level's geometry
+# run with: blender -b level.blend --python BenchmarkGlbWriter.py -- <anchor name>
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from LevelBuilder import anchor_children, object_parts, write_glb, format_bytes
+
+runs = 3
+arguments = sys.argv[sys.argv.index("--")+1:] if "--" in sys.argv else []
+anchor = bpy.context.scene.objects[arguments[0] if arguments else "World Geometry"]
+objects = anchor_children(anchor)
+
+def gltf_exporter(path):
+    # what the addon did before, selection changes included
+    bpy.ops.object.select_all(action='DESELECT')
+    anchor.select_set(True)
+    bpy.ops.object.select_grouped(type='CHILDREN_RECURSIVE')
+    bpy.ops.export_scene.gltf(filepath=path, use_selection=True)
+
+def direct_writer(path):
+    write_glb(path, object_parts(objects, bpy.context.evaluated_depsgraph_get()))
+
+def measure(export, path):
+    best = None
+    for run in range(runs):
+        start = time.perf_counter()
+        export(path)
+        elapsed = time.perf_counter()-start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, os.path.getsize(path)
+
+print("\n.glb export of "+anchor.name+", "+str(len(objects))+" objects, best of "+str(runs))
+with tempfile.TemporaryDirectory() as directory:
+    results = {}
+    for name, export in (("gltf exporter", gltf_exporter), ("direct writer", direct_writer)):
+        elapsed, size = measure(export, os.path.join(directory, name.replace(" ", "-")+".glb"))
+        results[name] = elapsed
+        print("\t"+name+": "+format(elapsed, ".2f")+"s, "+format_bytes(size))
+    print("\tdirect writer speedup: "+format(results["gltf exporter"]/results["direct writer"], ".1f")+"x")
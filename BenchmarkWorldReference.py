@@ -0,0 +1,50 @@
+import bpy, os, sys, time
+
+# compares the world reference loader against importing each .obj with bpy.ops.import_scene.obj
+# run with: blender -b --python BenchmarkWorldReference.py -- <path to data/debug_out>
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from LevelBuilder import world_reference_files, import_world_reference
+
+arguments = sys.argv[sys.argv.index("--")+1:] if "--" in sys.argv else []
+paths = world_reference_files(arguments[0] if arguments else "debug_out")
+if not paths:
+    sys.exit("no .obj files found, pass the debug_out folder after --")
+size = sum([os.path.getsize(path) for path in paths])
+
+def clear_scene():
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj)
+    for mesh in list(bpy.data.meshes):
+        bpy.data.meshes.remove(mesh)
+    for material in list(bpy.data.materials):
+        bpy.data.materials.remove(material)
+
+def import_operator():
+    # what the addon did before
+    bpy.ops.object.empty_add(type='PLAIN_AXES', location=(0, 0, 0))
+    anchor = bpy.context.object
+    anchor.name = "World Geometry"
+    before = set(bpy.data.objects)
+    for path in paths:
+        bpy.ops.import_scene.obj(filepath = path)
+    for obj in set(bpy.data.objects)-before:
+        obj.parent = anchor
+    anchor.scale = (16,16,16)
+
+def loader():
+    import_world_reference(bpy.context, paths)
+
+def polygon_count():
+    return sum([len(mesh.polygons) for mesh in bpy.data.meshes])
+
+print("\nworld reference import of "+str(len(paths))+" .obj files, "+format(size/(1<<20), ".0f")+" MiB")
+results = {}
+for name, load in (("import_scene.obj", import_operator), ("loader", loader)):
+    clear_scene()
+    start = time.perf_counter()
+    load()
+    results[name] = time.perf_counter()-start
+    print("\t"+name+": "+format(results[name], ".1f")+"s, "+str(len(bpy.data.objects)-1)+" objects, "+str(polygon_count())+" faces")
+print("\tloader speedup: "+format(results["import_scene.obj"]/results["loader"], ".1f")+"x")
+clear_scene()
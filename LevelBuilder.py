@@ -20,8 +20,10 @@ bl_info = {
 # ------------------------------------------------------------------------
 #    Includes
 # ------------------------------------------------------------------------
-import bpy, bmesh, os, re, shutil, math, fileinput, socket, struct, sys, json
+import bpy, bmesh, gpu, os, re, shutil, math, fileinput, socket, struct, sys, json, array, numpy, hashlib, io, time, argparse, traceback, multiprocessing
 from bpy.app.handlers import persistent
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from bpy.props import (StringProperty,
                        BoolProperty,
                        IntProperty,
@@ -37,15 +39,27 @@ from bpy.types import (Panel,
                        )
 from bpy.utils import previews
 from bpy_extras.object_utils import AddObjectHelper, object_data_add
-from mathutils import Vector
+from gpu_extras.batch import batch_for_shader
+from mathutils.kdtree import KDTree
+
+# the world reference's .obj parser is in the world package next to this file, so worker processes can import it without bpy.
+# without the world folder only the world reference is unavailable
+try:
+    if __package__:
+        from .world import ObjParser
+    else:
+        from world import ObjParser
+except ImportError:
+    ObjParser = None
 
 # this config file is not on a per level basis, it's the config for the addon itself so you don't have to enter everything again
 if os.path.exists("blender_goal_config.json"):
     with open("blender_goal_config.json", "r") as f:
         json_data = json.loads(f.read())
 else:
+    json_data = {"Custom Levels Path": ""}
     with open("blender_goal_config.json", "w") as f:
-        f.write('{"Custom Levels Path": ""}')
+        json.dump(json_data, f)
 
 # ------------------------------------------------------------------------
 #    Scene Properties
@@ -113,12 +127,59 @@ class MyProperties(PropertyGroup):
         default = True
         )
         
+    optimize_geometry: BoolProperty(
+        name="Optimize Geometry",
+        description="Export cleaned up copies of the level geometry: vertices merged by distance, degenerate triangles and unused vertices dropped, and meshes sharing a material joined.\nYour meshes are left as they are",
+        default = False
+        )
+        
+    merge_distance: FloatProperty(
+        name="Merge Distance",
+        description="Vertices closer together than this are merged when optimizing the geometry. 0 turns merging off.\nDefault: 0.001",
+        default=0.001,
+        min=0.0,
+        precision=4
+        )
+        
+    direct_glb: BoolProperty(
+        name="Direct .glb Writer",
+        description="Write the .glb straight from the meshes with only what custom levels use (positions, normals, uvs, vertex colors, materials and base color textures).\nFaster than Blender's glTF exporter and leaves your selection alone",
+        default = False
+        )
+        
+    budget_glb_size: FloatProperty(
+        name="Size Budget",
+        description="The estimated .glb size, in MB, the geometry budget warns above.\nDefault: 64",
+        default=64.0,
+        min=0.0
+        )
+        
+    budget_triangles: IntProperty(
+        name="Triangle Budget",
+        description="The triangle count the geometry budget warns above.\nDefault: 500000",
+        default=500000,
+        min=0
+        )
+        
+    budget_texture_memory: FloatProperty(
+        name="Texture Budget",
+        description="The uncompressed texture memory, in MB, the geometry budget warns above.\nDefault: 64",
+        default=64.0,
+        min=0.0
+        )
+        
     should_playtest_level: BoolProperty(
         name="Playtest Level",
         description="Check if you'd like to launch the level immediately after export",
         default = True
         )
         
+    include_in_export_all: BoolProperty(
+        name="Include in Export All",
+        description="Check if this scene is a level that Export All Levels should export",
+        default = True
+        )
+        
     actor_name: StringProperty(
         name="Actor Name",
         description="The name of your object (actor).\nOnly lowercase letters and dashes are allowed.\nDefault: my-level",
@@ -242,6 +303,109 @@ class MyProperties(PropertyGroup):
         min= 0.0,
         max = 1.0
         )
+        
+    auto_bsphere: BoolProperty(
+        name="Automatic Bounding Spheres",
+        description="Fit each actor's bounding sphere to its mesh when exporting, never smaller than its Bounding Sphere Radius.\nOff centers it on the actor with the Bounding Sphere Radius property instead.\nDefault: False",
+        default = False
+        )
+        
+    actor_min_spacing: FloatProperty(
+        name="Minimum Actor Spacing",
+        description="Actors closer together than this are reported when checking actors.\nDefault: 0.5",
+        default=0.5,
+        min=0.0
+        )
+        
+    actor_max_geometry_distance: FloatProperty(
+        name="Maximum Distance From Geometry",
+        description="Actors further than this outside the bounds of all the level geometry are reported when checking actors. 0 turns this off.\nDefault: 20",
+        default=20.0,
+        min=0.0
+        )
+        
+    actor_display: EnumProperty(
+        name="Actor Display",
+        description="How actors are drawn in the viewport. Proxies hide the actor collection in the view layer and draw bounding boxes, and points past the proxy distance, in its place.\nThe actors themselves aren't changed and exporting always uses them",
+        items=[ ('AUTO', 'Automatic', 'Full meshes until the level has more actors than the proxy threshold, proxies after'),
+                ('MESH', 'Full Mesh', 'Always draw every actor with its full mesh'),
+                ('PROXY', 'Proxies', 'Always draw actors as proxies'),
+               ],
+        default='AUTO',
+        update=lambda self, context: update_actor_display(self, context)
+        )
+        
+    actor_proxy_threshold: IntProperty(
+        name="Proxy Threshold",
+        description="How many actors the level needs before automatic display switches to proxies.\nDefault: 2000",
+        default=2000,
+        min=0,
+        update=lambda self, context: update_actor_display(self, context)
+        )
+        
+    actor_proxy_distance: FloatProperty(
+        name="Proxy Distance",
+        description="Proxies further than this from the view are drawn as points. 0 turns this off.\nDefault: 100",
+        default=100.0,
+        min=0.0,
+        update=lambda self, context: update_actor_display(self, context)
+        )
+    
+    world_reference_mode: EnumProperty(
+        name="World Reference",
+        description="Which of the game's levels Create World Reference imports",
+        items=[ ('ALL', 'All Levels', 'Every level the decompiler converted to .obj'),
+                ('NEARBY', 'Nearby Levels', 'Only the levels within the radius, more are loaded as the anchor or 3D cursor moves'),
+               ],
+        default='ALL'
+        )
+        
+    world_reference_center: EnumProperty(
+        name="Around",
+        description="What nearby levels are measured from",
+        items=[ ('ANCHOR', 'Anchor', 'The level geometry anchor'),
+                ('CURSOR', '3D Cursor', 'The 3D cursor'),
+               ],
+        default='ANCHOR'
+        )
+        
+    world_reference_radius: FloatProperty(
+        name="Radius",
+        description="Levels whose bounds come closer than this are loaded by nearby loading.\nDefault: 2000",
+        default=2000.0,
+        min=0.0
+        )
+        
+    world_reference_merge: BoolProperty(
+        name="Merge Levels",
+        description="Import each of the game's levels as one object instead of one per object in it. Each face remembers the object it came from, Select World Reference Pieces in edit mode selects by it.\nDefault: False",
+        default=False
+        )
+        
+    world_reference_proxies: BoolProperty(
+        name="Proxies",
+        description="Import the world reference as decimated proxies. The selected objects and the ones the 3D cursor is in are swapped for their full meshes.\nDefault: True",
+        default=True
+        )
+        
+    world_reference_proxy_ratio: FloatProperty(
+        name="Ratio",
+        description="About how many of the vertices the proxies keep.\nDefault: 0.1",
+        default=0.1,
+        min=0.01,
+        max=1.0
+        )
+        
+    world_reference_display: EnumProperty(
+        name="Proxy Display",
+        description="How world reference proxies are drawn",
+        items=[ ('BOUNDS', 'Bounds', 'Bounding boxes'),
+                ('WIRE', 'Wire', 'Wireframes of the proxies'),
+                ('SOLID', 'Solid', 'The proxies themselves'),
+               ],
+        default='WIRE',
+        update=lambda self, context: update_world_reference_display(self, context)
+        )
     
     # unused properties
 
@@ -266,9 +430,9 @@ class MyProperties(PropertyGroup):
 class WM_OT_World_Ref(Operator):
     bl_label = "Create World Reference*"
     bl_idname = "wm.create_world_reference"
-    bl_description = "Imports the game's level models so that you can position your level within the world."
+    bl_description = "Imports the game's level models so that you can position your level within the world.\nPress Esc to stop, the levels imported so far are kept"
 
-    def execute(self, context):
+    def start(self, context):
         scene = context.scene
         mytool = scene.my_tool
         
@@ -276,33 +440,144 @@ class WM_OT_World_Ref(Operator):
         # run batch import
         # put the location to the folder where the objs are located here in this fashion
         
-        path_to_obj_dir = os.path.dirname(os.path.dirname(mytool.custom_levels_path))+"\\debug_out\\"
+        if ObjParser is None:
+            show_message(world_reference_missing,"Error","ERROR")
+            return None
+        
+        path_to_obj_dir = world_reference_dir(mytool.custom_levels_path)
         
-        # get list of all files in directory
-        file_list = sorted(os.listdir(path_to_obj_dir))
-
         # get a list of files ending in 'obj'
-        obj_list = [item for item in file_list if item.endswith('.obj')]
+        obj_list = world_reference_files(path_to_obj_dir)
         
         # check if it's empty and throw an error
         if obj_list == []:
             show_message("You don't seem to have extracted the level geometry from the game. Try turning on the levels_convert_to_obj option in the decompiler config and extracting from your iso again.","Error","ERROR")
+            return None
+        
+        # parent everything to a "World Geometry" anchor scaled up by 16
+        stop_nearby_world_reference() # this import takes over any levels nearby loading is adding
+        self.start_time = time.perf_counter()
+        proxy_ratio = mytool.world_reference_proxy_ratio if mytool.world_reference_proxies else None
+        cache = world_reference_cache(path_to_obj_dir, proxy_ratio)
+        try:
+            if mytool.world_reference_mode == 'NEARBY':
+                # only the levels around the anchor or 3D cursor, the timer loads more as it moves
+                center = world_reference_center(scene, mytool)
+                world_reference.update(directory=path_to_obj_dir, cache=cache, proxy_ratio=proxy_ratio, bounds=world_reference_bounds(obj_list, cache), center=center)
+                obj_list = nearby_world_reference(scene, mytool, center)
+            return start_world_reference(context, obj_list, cache=cache, proxy_ratio=proxy_ratio, display=mytool.world_reference_display, merge=mytool.world_reference_merge)
+        except (OSError, ValueError) as error:
+            show_message(str(error),"Error","ERROR")
+            return None
+    
+    def report_import(self, loader, verb):
+        print("\t"+verb+" "+str(loader.count)+" objects from "+str(loader.file)+" of "+str(len(loader.paths))+" .obj files in "+format(time.perf_counter()-self.start_time, ".1f")+"s\n")
+    
+    def execute(self, context):
+        # scripts and background mode import in one go
+        loader = self.start(context)
+        if loader is None:
+            return {'CANCELLED'}
+        try:
+            loader.step()
+        except (OSError, ValueError) as error:
+            loader.cancel()
+            show_message(str(error),"Error","ERROR")
+            return {'CANCELLED'}
+        except Exception:
+            loader.cancel()
+            raise
+        self.report_import(loader, "Imported")
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        # from the ui the import runs a slice at a time on a timer so blender stays responsive and Esc can stop it
+        self.loader = self.start(context)
+        if self.loader is None:
+            return {'CANCELLED'}
+        world_reference["importing"] = True
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(world_reference_tick, window=context.window)
+        wm.progress_begin(0, max(len(self.loader.paths), 1))
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def finish(self, context):
+        # safe to call more than once, and without a screen while another file is loading
+        world_reference["importing"] = False
+        if self.timer is None:
+            return
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        self.timer = None
+        wm.progress_end()
+        if context.workspace is not None:
+            context.workspace.status_text_set(None)
+        if context.screen is not None:
+            for area in context.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+    
+    def cancel(self, context):
+        # blender stops the import itself when the window closes or another file is opened
+        try:
+            self.loader.cancel()
+        finally:
+            self.finish(context)
+    
+    def modal(self, context, event):
+        loader = self.loader
+        try:
+            loader.anchor.name
+        except ReferenceError:
+            # the anchor was deleted or undone away while importing
+            self.cancel(context)
+            show_message("The World Geometry anchor was removed, the world reference import stopped.","Error","ERROR")
+            return {'CANCELLED'}
+        
+        if event.type == 'ESC':
+            self.cancel(context)
+            self.report_import(loader, "Stopped after importing")
             return {'CANCELLED'}
         
-        # create an anchor for the world geometry
-        bpy.ops.object.empty_add(type='PLAIN_AXES', location=(0, 0, 0))
-        anchor = bpy.context.object
-        anchor.name = "World Geometry"
+        if event.type == 'TIMER':
+            try:
+                done = loader.step(world_reference_slice)
+            except Exception as error:
+                traceback.print_exc()
+                self.cancel(context)
+                show_message(str(error),"Error","ERROR")
+                return {'CANCELLED'}
+            if done:
+                self.finish(context)
+                self.report_import(loader, "Imported")
+                return {'FINISHED'}
+            context.window_manager.progress_update(loader.file)
+            context.workspace.status_text_set("Importing the world reference: "+str(loader.file)+" of "+str(len(loader.paths))+" .obj files, "+str(loader.count)+" objects. Esc to stop")
+        
+        return {'PASS_THROUGH'}
+        
+class WM_OT_Select_World_Reference_Pieces(Operator):
+    bl_label = "Select World Reference Pieces"
+    bl_idname = "wm.select_world_reference_pieces"
+    bl_description = "Selects all of every game object that the selected faces of a merged world reference level belong to"
 
-        # loop through the strings in obj_list and add the files to the scene
-        for item in obj_list:
-            path_to_file = os.path.join(path_to_obj_dir, item)
-            bpy.ops.import_scene.obj(filepath = path_to_file)
-            bpy.context.scene.objects[item[:-4]].parent = anchor # parent them to the anchor
-            
-        # scale up by 16
-        anchor.scale=(16,16,16)
+    def execute(self, context):
+        obj = context.active_object
+        if obj is None or obj.type != 'MESH' or not world_reference_attribute in obj.data.attributes:
+            show_message("The active object isn't a merged world reference level.","Error","ERROR")
+            return {'CANCELLED'}
+        
+        # face selection only reaches the mesh outside of edit mode
+        edit = obj.mode == 'EDIT'
+        if edit:
+            bpy.ops.object.mode_set(mode='OBJECT')
+        pieces = select_world_reference_pieces(obj.data)
+        if edit:
+            bpy.ops.object.mode_set(mode='EDIT')
         
+        names = obj.get("World Reference Objects", "").split("\n")
+        print("\tSelected "+", ".join([names[piece] if piece < len(names) else str(piece) for piece in pieces]))
         return {'FINISHED'}
         
 class WM_OT_Export(Operator):
@@ -316,31 +591,17 @@ class WM_OT_Export(Operator):
         
         # validate level info inputs
         # eventually want validation to live update while you're typing
-        if not bool(re.match("^[A-Za-z-]*$", mytool.level_title)): # should have only letters and dashes
-            show_message("Level Title can only contain letters and dashes","Error","ERROR")
-            return {'CANCELLED'}
-        
-        if not bool(re.match("^[A-Za-z]*$", mytool.level_nickname)): # should have only letters
-            show_message("Level Nickname can only contain letters","Error","ERROR")
-            return {'CANCELLED'}
-        
-        if (mytool.anchor == "") & mytool.should_export_geometry:
-            show_message("Anchor cannot be empty if exporting geometry","Error","ERROR")
-            return {'CANCELLED'}
-        
-        if mytool.custom_levels_path == "": # can't be empty
-            show_message("Custom Levels Path cannot be empty","Error","ERROR")
-            return {'CANCELLED'}
-        
-        if not os.path.dirname(mytool.custom_levels_path)[-19:] == "\data\custom_levels": # check dir and parent dir are correct
-            show_message("Custom Levels Path seems incorrect","Error","ERROR")
+        error = check_level_settings(mytool)
+        if error is not None:
+            show_message(error,"Error","ERROR")
             return {'CANCELLED'}
 
         # create values needed to make files
-        longtitle = mytool.level_title.lower()
-        title = re.sub(r'[^\w\s]', '', mytool.level_title)[0:8] # create 8 digit alpha-only short title
-        nick = mytool.level_nickname.lower()
-        newpath = mytool.custom_levels_path+longtitle+"\\"
+        level = level_settings(scene)
+        longtitle = level["longtitle"]
+        title = level["title"]
+        nick = level["nick"]
+        newpath = level["newpath"]
         
         # be extra
         print("\n   ---Beginning Export Process---\n")
@@ -349,15 +610,19 @@ class WM_OT_Export(Operator):
         task_count = (mytool.should_export_level_info or mytool.should_export_actor_info)+mytool.should_export_geometry+mytool.should_playtest_level
         current_task = 1
         
+        # look for misplaced actors before they end up in the game
+        if mytool.should_export_actor_info:
+            print_actor_problems(validate_actors(scene))
+        
         # update level info and actor info if needed
-        current_task = update_files(task_count, current_task, mytool.should_export_level_info, mytool.should_export_actor_info, newpath, nick, longtitle, title, mytool.spawn_location)
+        current_task = update_files(task_count, current_task, mytool.should_export_level_info, mytool.should_export_actor_info, newpath, nick, longtitle, title, mytool.spawn_location, mytool.auto_bsphere)
         
         # export the geometry
         # may need to update renderer to cycles before exporting, just in case. make sure to notify user.
         if mytool.should_export_geometry:
             print("Task ("+str(current_task)+"/"+str(task_count)+")")
             current_task += 1
-            export_geometry(context, mytool.anchor, newpath, longtitle)
+            export_geometry(context, mytool.anchor, newpath, longtitle, mytool.optimize_geometry, mytool.merge_distance, mytool.direct_glb)
         
         # open the level in game
         if mytool.should_playtest_level:
@@ -366,6 +631,41 @@ class WM_OT_Export(Operator):
             playtest_level(longtitle, newpath)
         
         return {'FINISHED'}
+        
+class WM_OT_ExportAll(Operator):
+    bl_label = "Export All Levels"
+    bl_idname = "wm.export_all"
+    bl_description = "Exports every scene checked for Export All as its own level, using each scene's Level Info and export options.\nlevel-info.gc, game.gp and the config are read and written once for all of them. Nothing is playtested"
+
+    def execute(self, context):
+        
+        levels = []
+        for scene in bpy.data.scenes:
+            mytool = scene.my_tool
+            if not mytool.include_in_export_all:
+                continue
+            error = check_level_settings(mytool)
+            if error is not None:
+                show_message(scene.name+": "+error,"Error","ERROR")
+                return {'CANCELLED'}
+            levels.append(level_settings(scene))
+        
+        if levels == []:
+            show_message("No scenes are checked for Export All","Error","ERROR")
+            return {'CANCELLED'}
+        
+        longtitles = [level["longtitle"] for level in levels]
+        for level in levels:
+            if longtitles.count(level["longtitle"]) > 1:
+                show_message("More than one scene exports the level "+level["longtitle"],"Error","ERROR")
+                return {'CANCELLED'}
+            if level["custom_levels_path"] != levels[0]["custom_levels_path"]: # they share level-info.gc and game.gp
+                show_message(level["scene"].name+": every level needs the same Custom Levels Path","Error","ERROR")
+                return {'CANCELLED'}
+        
+        export_levels(context, levels)
+        
+        return {'FINISHED'}
     
 # ------------------------------------------------------------------------
 #    Functions
@@ -378,79 +678,1351 @@ def show_message(message, title = "Message", icon = "INFO"):
         
     bpy.context.window_manager.popup_menu(draw, title = title, icon = icon)
     
-def return_actor_block(actor_name, actor_type, actor_location, actor_rotation, game_task, bsphere_radius):
-
-    return [
-        '    {\n',
-        '      "trans": [',
-        str(actor_location[0]),
-        ', ',
-        str(actor_location[2]),
-        ', ',
-        str(actor_location[1]),
-        '],\n',
-        '      "etype": "',
-        actor_type,
-        '",\n',
-        '      "game_task": ',
-        str(game_task),
-        ',\n',
-        '      "quat" : [',
-        str(actor_rotation[0]),
-        ', ',
-        str(actor_rotation[1]),
-        ', ',
-        str(actor_rotation[2]),
-        ', ',
-        str(actor_rotation[3]),
-        '],\n',
-        '      "bsphere": [',
-        str(actor_location[0]),
-        ', ',
-        str(actor_location[2]),
-        ', ',
-        str(actor_location[1]),
-        ', ',
-        str(bsphere_radius),
-        '],\n',
-        '      "lump": {\n',
-        '        "name":"',
-        actor_name,
-        '"\n',
-        '      }\n',
-        '    }',
-        ]
+def custom_levels_path_ok(path):
+    # should be .../data/custom_levels/, whichever way the slashes go
+    return path[-1:] in ("/", "\\") and path.replace("\\", "/").rstrip("/").split("/")[-2:] == ["data", "custom_levels"]
+
+def check_level_settings(mytool):
+    # what's wrong with a scene's level info, None if it can be exported
+    if not bool(re.match("^[A-Za-z-]*$", mytool.level_title)): # should have only letters and dashes
+        return "Level Title can only contain letters and dashes"
+    if not bool(re.match("^[A-Za-z]*$", mytool.level_nickname)): # should have only letters
+        return "Level Nickname can only contain letters"
+    if (mytool.anchor == "") & mytool.should_export_geometry:
+        return "Anchor cannot be empty if exporting geometry"
+    if mytool.custom_levels_path == "": # can't be empty
+        return "Custom Levels Path cannot be empty"
+    if not custom_levels_path_ok(mytool.custom_levels_path): # check dir and parent dir are correct
+        return "Custom Levels Path seems incorrect"
+    return None
+
+def level_settings(scene):
+    # the values needed to make a scene's level files
+    mytool = scene.my_tool
+    longtitle = mytool.level_title.lower()
+    return {
+        "scene": scene,
+        "longtitle": longtitle,
+        "title": re.sub(r'[^\w\s]', '', mytool.level_title)[0:8], # create 8 digit alpha-only short title
+        "nick": mytool.level_nickname.lower(),
+        "custom_levels_path": mytool.custom_levels_path,
+        "newpath": os.path.join(mytool.custom_levels_path, longtitle, ""),
+        }
+
+# one actor in the .jsonc, formatted in a single pass. the translation and bsphere are already in game axes
+actor_block = (
+    '    {{\n'
+    '      "trans": [{0}, {1}, {2}],\n'
+    '      "etype": "{3}",\n'
+    '      "game_task": {4},\n'
+    '      "quat" : [{5}, {6}, {7}, {8}],\n'
+    '      "bsphere": [{9}, {10}, {11}, {12}],\n'
+    '      "lump": {{\n'
+    '        "name":"{13}"\n'
+    '      }}\n'
+    '    }}'
+    )
+
+# blender is z up and the game is y up, so game (x, y, z) is blender (x, z, y)
+game_axes = [0, 2, 1]
+
+def return_actor_block(actor_name, actor_type, actor_location, actor_rotation, game_task, bsphere_radius, bsphere=None):
+    trans = [actor_location[axis] for axis in game_axes]
+    if bsphere is None:
+        bsphere = trans+[bsphere_radius] # centered on the actor with the radius from its properties
+    return actor_block.format(trans[0], trans[1], trans[2], actor_type, game_task, actor_rotation[0], actor_rotation[1], actor_rotation[2], actor_rotation[3], bsphere[0], bsphere[1], bsphere[2], bsphere[3], actor_name)
+
+# ------------------------------------------------------------------------
+#    Actor Bounding Spheres
+# ------------------------------------------------------------------------
+
+# mesh name -> (center, radius) of its bounding sphere in object space
+mesh_bspheres = {}
 
-def update_files(task_count, current_task, should_export_level_info, should_export_actor_info, newpath, nick, longtitle, title, spawn):
+def ritter_sphere(points):
     
-    if not should_export_level_info:
-        return current_task
+    # start from two points that are far apart
+    first = points[numpy.argmax(numpy.einsum('ij,ij->i', points-points[0], points-points[0]))]
+    second = points[numpy.argmax(numpy.einsum('ij,ij->i', points-first, points-first))]
+    center = (first+second)/2.0
+    radius = numpy.linalg.norm(second-first)/2.0
     
-    print("Task ("+str(current_task)+"/"+str(task_count)+")")
+    # grow just enough to take in the furthest point outside until nothing is left outside
+    for attempt in range(64):
+        distances = numpy.linalg.norm(points-center, axis=1)
+        furthest = numpy.argmax(distances)
+        if distances[furthest] <= radius:
+            return center, radius
+        grown = (radius+distances[furthest])/2.0
+        center = center+(points[furthest]-center)*((grown-radius)/distances[furthest])
+        radius = grown
+    return center, numpy.linalg.norm(points-center, axis=1).max()
+
+def mesh_bsphere(actor, depsgraph):
     
-    current_task += 1
-    print("Updating the necessary files.\n")
+    # actors with modifiers can each end up with a different shape, the rest share the result of their mesh
+    key = actor.data.name if len(actor.modifiers) == 0 else None
+    if key in mesh_bspheres:
+        return mesh_bspheres[key]
     
-    # make the new folder
-    if not os.path.exists(newpath):
-        os.mkdir(newpath)
-        print("\tDirectory created.")
+    evaluated = actor.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    co = numpy.empty(len(mesh.vertices)*3, numpy.float32)
+    mesh.vertices.foreach_get("co", co)
+    evaluated.to_mesh_clear()
     
-    # save the custom levels path so it doesn't have to be retyped
-    with open("blender_goal_config.json", "r+") as f:
-        file = f.read()
-        json_data = json.loads(file)
-        json_data["Custom Levels Path"]=os.path.dirname(os.path.dirname(newpath))+"\\"
-        f.seek(0)
-        f.truncate()
-        json.dump(json_data, f)
-        
-    # save the blend file
-    bpy.ops.wm.save_as_mainfile(filepath=newpath+longtitle+'.blend')
+    if len(co) == 0:
+        sphere = (numpy.zeros(3), 0.0)
+    else:
+        sphere = ritter_sphere(co.reshape(-1, 3).astype(numpy.float64))
+    if key is not None:
+        mesh_bspheres[key] = sphere
+    return sphere
+
+def actor_bspheres(actors, matrices):
+    # matrices are the actors' world matrices, row major. returns game space (x, y, z, radius) for each actor
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    spheres = [mesh_bsphere(actor, depsgraph) for actor in actors]
+    centers = numpy.array([sphere[0] for sphere in spheres]).reshape(-1, 3)
+    radii = numpy.array([sphere[1] for sphere in spheres])
+    minimum = numpy.array([actor["Bounding Sphere Radius"] for actor in actors], numpy.float64)
     
-    # make paths for game.gp and level-info.gc
-    gppath = os.path.dirname(os.path.dirname(os.path.dirname(newpath)))+"\\goal_src\\jak1\\"
-    gcpath = gppath+"engine\\level\\"
+    # move the centers into world space and grow the radii by the largest axis scale, for all actors at once
+    centers = matrices[:,:3,0]*centers[:,0:1] + matrices[:,:3,1]*centers[:,1:2] + matrices[:,:3,2]*centers[:,2:3] + matrices[:,:3,3]
+    scales = numpy.sqrt(matrices[:,0,:3]**2 + matrices[:,1,:3]**2 + matrices[:,2,:3]**2).max(axis=1)
+    # most actor meshes are placeholders far smaller than the actor, so the radius property is a lower bound
+    return numpy.column_stack((centers[:,game_axes], numpy.maximum(radii*scales, minimum)))
+
+def actor_values(actors, attribute, width):
+    # one attribute of every actor as a flat float32 array, laid out like foreach_get (matrices column major).
+    # the actor collection reads them in one call, a list of some of its actors one actor at a time
+    values = numpy.empty(len(actors)*width, numpy.float32)
+    if hasattr(actors, "foreach_get"):
+        actors.foreach_get(attribute, values)
+    elif len(actors):
+        values[:] = numpy.concatenate([numpy.array(getattr(actor, attribute), numpy.float32).ravel(order="F") for actor in actors])
+    return values
+
+def gather_actors(actors, auto_bsphere=False):
+    
+    # every actor's transform in one call each instead of one python lookup per actor and axis
+    locations = actor_values(actors, "location", 3)
+    rotations = actor_values(actors, "rotation_quaternion", 4)
+    
+    # the axis swap for all of them at once, the game takes the meters as they are
+    translations = locations.reshape(-1, 3)[:,game_axes].tolist()
+    
+    names = [actor.name for actor in actors]
+    types = [actor["Actor Type"] for actor in actors]
+    tasks = [actor["Game Task"] for actor in actors]
+    
+    if auto_bsphere:
+        matrices = actor_values(actors, "matrix_world", 16)
+        bspheres = actor_bspheres(actors, matrices.reshape(-1, 4, 4).transpose(0, 2, 1).astype(numpy.float64)).tolist()
+    else:
+        bspheres = [trans+[actor["Bounding Sphere Radius"]] for trans, actor in zip(translations, actors)]
+    return names, types, translations, rotations.reshape(-1, 4).tolist(), tasks, bspheres
+
+def actor_blocks(names, types, translations, rotations, tasks, bspheres):
+    for name, actor_type, trans, quat, task, bsphere in zip(names, types, translations, rotations, tasks, bspheres):
+        yield actor_block.format(trans[0], trans[1], trans[2], actor_type, task, quat[0], quat[1], quat[2], quat[3], bsphere[0], bsphere[1], bsphere[2], bsphere[3], name)
+
+def write_actor_blocks(f, blocks):
+    # stream the blocks straight into the file, the comma goes before every block but the first
+    separator = ""
+    for block in blocks:
+        f.write(separator)
+        f.write(block)
+        separator = ",\n\n"
+    if separator:
+        f.write("\n\n")
+
+# ------------------------------------------------------------------------
+#    Actor Export Cache
+# ------------------------------------------------------------------------
+
+# actor name -> its block in the .jsonc. the depsgraph handler marks actors dirty as they change,
+# so an export only formats those and reassembles the rest from here
+actor_table = {"blocks": {}, "dirty": set(), "valid": False, "auto_bsphere": False}
+
+@persistent
+def track_actor_changes(scene, depsgraph):
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Mesh) and update.is_updated_geometry and update.id.original.name in mesh_bspheres:
+            # an actor model was edited, its bounding sphere and every actor using it need redoing
+            del mesh_bspheres[update.id.original.name]
+            actor_table["valid"] = False
+    dirty = actor_table["dirty"]
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and "Actor Type" in update.id.original.keys():
+            actor_index["stale"] = True
+            actor_display["stale"] = True
+            if actor_table["valid"]: # with nothing cached yet, the next export formats everything anyway
+                dirty.add(update.id.original.name) # added, moved or re-propertied
+
+@persistent
+def invalidate_actor_table(*args):
+    # undo and loading swap out every object under us, start over
+    actor_table["blocks"].clear()
+    actor_table["dirty"].clear()
+    actor_table["valid"] = False
+    mesh_bspheres.clear()
+    actor_index["stale"] = True
+
+def level_actors(scene):
+    # the actors of the level in this scene. actors are linked to the scene they were added in as well as the actor collection.
+    # with one scene that's the whole collection, which the export reads with foreach_get, otherwise a list of some of it
+    if not 'actor_collection' in bpy.data.collections:
+        return []
+    actors = bpy.data.collections['actor_collection'].all_objects
+    if len(bpy.data.scenes) == 1:
+        return actors
+    in_scene = set(scene.objects[:])
+    return [actor for actor in actors if actor in in_scene]
+
+def cached_actor_blocks(actors, auto_bsphere=False):
+    # actors can be any level's actors, blocks of the other levels stay cached
+    blocks = actor_table["blocks"]
+    dirty = actor_table["dirty"]
+    names = [actor.name for actor in actors]
+    
+    if actor_table["auto_bsphere"] != auto_bsphere:
+        actor_table["valid"] = False # every bsphere changes
+    actor_table["auto_bsphere"] = auto_bsphere
+    if not actor_table["valid"]:
+        blocks.clear()
+        dirty.clear()
+    
+    present = set(names)
+    changed = list((dirty & present) | (present - blocks.keys())) # renamed actors show up as new names
+    if len(changed) > len(names)//4:
+        # too much to patch, format everything in one pass
+        fields = gather_actors(actors, auto_bsphere)
+        blocks.update(zip(fields[0], actor_blocks(*fields)))
+        print("\t"+str(len(names))+" actors formatted.")
+    else:
+        changed_actors = [bpy.data.objects[name] for name in changed]
+        bspheres = [None]*len(changed)
+        if auto_bsphere and changed:
+            bspheres = actor_bspheres(changed_actors, numpy.array([numpy.array(actor.matrix_world) for actor in changed_actors], numpy.float64)).tolist()
+        for actor, bsphere in zip(changed_actors, bspheres):
+            blocks[actor.name] = return_actor_block(actor.name, actor["Actor Type"], actor.location, actor.rotation_quaternion, actor["Game Task"], actor["Bounding Sphere Radius"], bsphere)
+        print("\t"+str(len(changed))+" of "+str(len(names))+" actors formatted, the rest reused.")
+    for name in blocks.keys() - present:
+        if not name in bpy.data.objects: # deleted or renamed actors
+            del blocks[name]
+    
+    actor_table["valid"] = True
+    dirty -= present
+    return (blocks[name] for name in names)
+
+def actors_input_hash(actors, auto_bsphere=False):
+    # a hash of everything the actors' blocks are made from, read without formatting any of them. None when that
+    # can't be told without evaluating them, for fitted bounding spheres of actors with modifiers
+    digest = hashlib.sha1(repr(auto_bsphere).encode("utf-8"))
+    digest.update("\n".join([actor.name+"\t"+str(actor["Actor Type"])+"\t"+str(actor["Game Task"])+"\t"+str(actor["Bounding Sphere Radius"]) for actor in actors]).encode("utf-8"))
+    digest.update(actor_values(actors, "location", 3))
+    digest.update(actor_values(actors, "rotation_quaternion", 4))
+    if auto_bsphere:
+        if any([len(actor.modifiers) for actor in actors]):
+            return None
+        digest.update(actor_values(actors, "matrix_world", 16))
+        meshes = dict([(actor.data.name, actor.data) for actor in actors])
+        for name in sorted(meshes):
+            co = numpy.empty(len(meshes[name].vertices)*3, numpy.float32)
+            meshes[name].vertices.foreach_get("co", co)
+            digest.update(name.encode("utf-8"))
+            digest.update(co)
+    return digest.hexdigest()
+
+# ------------------------------------------------------------------------
+#    Actor Validation
+# ------------------------------------------------------------------------
+
+# kd-tree over the actor locations, only rebuilt after actors changed
+actor_index = {"tree": None, "names": [], "locations": None, "stale": True}
+# what the last check found, shown in the actor info panel
+actor_problems = {"coincident": [], "close": [], "far": [], "checked": False}
+
+# actors closer than this are treated as the same spot
+coincident_distance = 0.001
+
+def anchor_children(anchor):
+    # everything select_grouped(type='CHILDREN_RECURSIVE') would select, without touching the selection
+    children = []
+    stack = list(anchor.children)
+    while stack:
+        child = stack.pop()
+        children.append(child)
+        stack.extend(child.children)
+    return children
+
+def get_actor_index(actors):
+    if actor_index["stale"] or [actor.name for actor in actors] != actor_index["names"]: # another level's actors
+        locations = actor_locations(actors).astype(numpy.float64)
+        tree = KDTree(len(actors))
+        for index, co in enumerate(locations.tolist()):
+            tree.insert(co, index)
+        tree.balance()
+        actor_index.update(tree=tree, names=[actor.name for actor in actors], locations=locations, stale=False)
+    return actor_index
+
+def geometry_bounds(objects):
+    # world space bounding boxes of the level geometry, all objects at once
+    meshes = [obj for obj in objects if obj.type == 'MESH']
+    if not meshes:
+        return numpy.empty((0, 3)), numpy.empty((0, 3))
+    corners = numpy.array([obj.bound_box[:] for obj in meshes]) # (objects, 8, 3)
+    matrices = numpy.array([numpy.array(obj.matrix_world) for obj in meshes])
+    corners = numpy.einsum('mij,mkj->mki', matrices[:,:3,:3], corners) + matrices[:,None,:3,3]
+    return corners.min(axis=1), corners.max(axis=1)
+
+def far_from_geometry(locations, lower, upper, distance):
+    far = numpy.ones(len(locations), bool)
+    for start in range(0, len(lower), 256): # a chunk of objects at a time keeps the comparison small
+        low = lower[start:start+256]-distance
+        high = upper[start:start+256]+distance
+        inside = ((locations[:,None,:] >= low[None]) & (locations[:,None,:] <= high[None])).all(axis=2)
+        far &= ~inside.any(axis=1)
+    return far
+
+def validate_actors(scene):
+    mytool = scene.my_tool
+    problems = {"coincident": [], "close": [], "far": [], "checked": True}
+    
+    actors = level_actors(scene)
+    if len(actors):
+        index = get_actor_index(actors)
+        names = index["names"]
+        tree = index["tree"]
+        
+        # only the neighbours the tree finds get compared, not every pair
+        spacing = max(mytool.actor_min_spacing, coincident_distance)
+        for i, co in enumerate(index["locations"].tolist()):
+            for found, j, distance in tree.find_range(co, spacing):
+                if j > i:
+                    problems["coincident" if distance <= coincident_distance else "close"].append((names[i], names[j]))
+        
+        if mytool.actor_max_geometry_distance > 0.0 and mytool.anchor in scene.objects:
+            lower, upper = geometry_bounds(anchor_children(scene.objects[mytool.anchor]))
+            if len(lower):
+                far = far_from_geometry(index["locations"], lower, upper, mytool.actor_max_geometry_distance)
+                problems["far"] = [names[i] for i in numpy.flatnonzero(far).tolist()]
+    
+    actor_problems.update(problems)
+    return problems
+
+def print_actor_problems(problems):
+    print("\tChecked actors: "+str(len(problems["coincident"]))+" pairs on top of each other, "+str(len(problems["close"]))+" pairs too close together, "+str(len(problems["far"]))+" far from the level geometry.")
+    for first, second in problems["coincident"][:10]:
+        print("\t\t"+first+" and "+second+" are on top of each other")
+
+class OBJECT_OT_ValidateActors(Operator):
+    bl_label = "Check Actors"
+    bl_idname = "object.validate_actors"
+    bl_description = "Looks for actors on top of each other, actors closer together than the minimum spacing and actors far from the level geometry.\nThis also runs on every export"
+
+    def execute(self, context):
+        print_actor_problems(validate_actors(context.scene))
+        return {'FINISHED'}
+
+class OBJECT_OT_SelectProblemActors(Operator):
+    bl_label = "Select Problem Actors"
+    bl_idname = "object.select_problem_actors"
+    bl_description = "Selects every actor the last check found a problem with"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        names = set(actor_problems["far"])
+        for pair in actor_problems["coincident"]+actor_problems["close"]:
+            names.update(pair)
+        bpy.ops.object.select_all(action='DESELECT')
+        for name in names:
+            actor = context.view_layer.objects.get(name)
+            if actor is not None:
+                actor.select_set(True)
+        return {'FINISHED'}
+
+# ------------------------------------------------------------------------
+#    Export Manifest
+# ------------------------------------------------------------------------
+
+# kept in the level folder, it remembers a hash of what each export wrote so unchanged files are left alone
+# and goalc's (mi) has less to rebuild
+manifest_name = "export-manifest.json"
+manifest_version = 1
+
+def read_manifest(newpath):
+    try:
+        with open(newpath+manifest_name, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get("version") != manifest_version:
+        manifest = {"version": manifest_version, "artifacts": {}}
+    return manifest
+
+def write_manifest(newpath, manifest):
+    with open(newpath+manifest_name, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def file_stat(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024*1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def current_output_hash(manifest, key, path):
+    # the hash of what's on disk, only read it if it was touched since the last export
+    if not os.path.exists(path):
+        return None
+    entry = manifest["artifacts"].get(key)
+    if entry is not None and entry["stat"] == file_stat(path):
+        return entry["output"]
+    return hash_file(path)
+
+def record_artifact(manifest, key, path, input_hash, output_hash):
+    manifest["artifacts"][key] = {"input": input_hash, "output": output_hash, "stat": file_stat(path)}
+
+def text_hash(lines):
+    return hashlib.sha1("".join(lines).encode("utf-8")).hexdigest()
+
+def artifact_current(manifest, key, path, input_hash):
+    # the file was written from exactly these inputs by the last export and nobody touched it since
+    entry = manifest["artifacts"].get(key)
+    return input_hash is not None and entry is not None and entry["input"] == input_hash and os.path.exists(path) and entry["stat"] == file_stat(path)
+
+def write_artifact(manifest, key, path, write, input_hash, protect=False):
+    # input_hash covers everything write makes the contents from. when the last export wrote the file from the same
+    # inputs nothing is generated at all, otherwise write fills a buffer that's compared with the file before writing.
+    # protected files (ones people like to edit) are only replaced if they're still what the last export wrote
+    if artifact_current(manifest, key, path, input_hash):
+        print("\t"+os.path.basename(path)+" unchanged since the last export, update skipped.")
+        return "unchanged"
+    
+    buffer = io.StringIO()
+    write(buffer)
+    data = buffer.getvalue().replace("\n", os.linesep).encode("utf-8") # newlines as a text file would write them
+    digest = hashlib.sha1(data).hexdigest()
+    
+    existing = current_output_hash(manifest, key, path)
+    entry = manifest["artifacts"].get(key)
+    if existing == digest:
+        status = "unchanged"
+    elif existing is not None and protect and (entry is None or entry["output"] != existing):
+        print("\t"+os.path.basename(path)+" was edited outside the addon, update skipped.")
+        return "kept"
+    else:
+        with open(path, 'wb') as f:
+            f.write(data)
+        status = "created" if existing is None else "updated"
+    
+    record_artifact(manifest, key, path, input_hash if input_hash is not None else digest, digest)
+    print("\t"+os.path.basename(path)+" "+status+".")
+    return status
+
+# ------------------------------------------------------------------------
+#    level-info.gc Index
+# ------------------------------------------------------------------------
+
+# tokens that matter for finding where forms start and end: strings, comments, character literals and parens
+gc_token = re.compile(rb'"(?:[^"\\]|\\.)*"|;[^\n]*|#\|.*?\|#|#\\.|[()]', re.S)
+gc_define = re.compile(rb"\(define\s+([^\s()]+)\s+\(new\s+'static\s+'level-load-info\b")
+gc_cons = re.compile(rb"\(cons!\s+\*level-load-list\*\s+'([^\s()]+)\s*\)")
+
+# path -> (size and mtime, define offsets, cons! offsets), so an unchanged file isn't parsed again
+level_info_cache = {}
+
+def index_level_info(data):
+    # byte offsets of every level's define and cons! form, keyed by the exact level name
+    defines = {}
+    conses = {}
+    depth = 0
+    start = 0
+    for token in gc_token.finditer(data):
+        char = token.group()
+        if char == b"(":
+            if depth == 0:
+                start = token.start()
+            depth += 1
+        elif char == b")" and depth > 0:
+            depth -= 1
+            if depth == 0: # a top level form just closed
+                match = gc_define.match(data, start, token.end())
+                if match:
+                    defines[match.group(1).decode("utf-8")] = (start, token.end())
+                    continue
+                match = gc_cons.match(data, start, token.end())
+                if match:
+                    conses[match.group(1).decode("utf-8")] = (start, token.end())
+    return defines, conses
+
+def get_level_info_index(path, data):
+    stat = file_stat(path)
+    cached = level_info_cache.get(path)
+    if cached is None or cached[0] != stat:
+        cached = (stat,)+index_level_info(data)
+        level_info_cache[path] = cached
+    return cached[1], cached[2]
+
+def update_level_info(path, backuppath, entries):
+    # entries are (longtitle, define text, cons! text), every level is added or replaced with one backup and one write
+    # returns longtitle -> "unchanged", "added" or "updated"
+    
+    with open(path, "rb") as f:
+        data = f.read()
+    defines, conses = get_level_info_index(path, data)
+    
+    # match the file's line endings
+    newline = b"\r\n" if b"\r\n" in data else b"\n"
+    statuses = {}
+    edits = [] # (start, end, replacement)
+    appended = b""
+    
+    for longtitle, define_text, cons_text in entries:
+        define = define_text.replace("\n", newline.decode()).encode("utf-8")
+        cons = cons_text.encode("utf-8")
+        if longtitle in defines:
+            start, end = defines[longtitle]
+            if data[start:end] == define and longtitle in conses:
+                statuses[longtitle] = "unchanged"
+                continue
+            # swap the old entry for the new one where it stands
+            edits.append((start, end, define if longtitle in conses else define+newline*2+cons))
+            statuses[longtitle] = "updated"
+        elif longtitle in conses:
+            start = conses[longtitle][0]
+            edits.append((start, start, define+newline*2)) # it has to be defined before it's added to the list
+            statuses[longtitle] = "added"
+        else:
+            appended += newline*2+define+newline*2+cons
+            statuses[longtitle] = "added"
+    
+    if edits == [] and appended == b"":
+        return statuses
+    
+    pieces = []
+    last = 0
+    for start, end, replacement in sorted(edits):
+        pieces += [data[last:start], replacement]
+        last = end
+    pieces += [data[last:], appended]
+    
+    shutil.copyfile(path, backuppath)
+    print("\tBackup of level-info.gc created")
+    with open(path, "wb") as f: # one write for the whole file
+        f.write(b"".join(pieces))
+    return statuses
+
+# ------------------------------------------------------------------------
+#    game.gp Registration
+# ------------------------------------------------------------------------
+
+gp_level = re.compile(r'\(build-custom-level\s+"([^"]+)"\s*\)')
+gp_anchor = "testzone.gd\")"
+
+def game_gp_block(longtitle, title, nick):
+    return '\n(build-custom-level "'+longtitle+'")\n'+'(custom-level-cgo "'+nick.upper()+'.DGO" "'+longtitle+'/'+title+'.gd")\n'
+
+def registered_levels(lines):
+    # every level with a build-custom-level entry, comments ignored
+    names = []
+    for line in lines:
+        names += gp_level.findall(line.split(";")[0])
+    return names
+
+def register_levels(path, backuppath, levels, levels_path):
+    # levels is a list of (longtitle, title, nick), all the missing ones go in with one backup and one write
+    # returns the names added and the names registered whose folder in levels_path is gone
+    
+    with open(path, "r", encoding="utf-8", newline="") as f: # keep the file's line endings
+        current = f.readlines()
+    registered = registered_levels(current)
+    stale = [name for name in registered if not os.path.isdir(levels_path+name)]
+    
+    missing = []
+    for level in levels:
+        if not level[0] in registered and not level[0] in [added[0] for added in missing]:
+            missing.append(level)
+    if len(missing) == 0:
+        return [], stale
+    
+    newline = "\r\n" if len(current) > 0 and current[0].endswith("\r\n") else "\n"
+    contents = "".join([game_gp_block(*level) for level in missing]).replace("\n", newline)
+    
+    # the custom levels go right after the test zone
+    index = len(current)
+    for i, line in enumerate(current):
+        if gp_anchor in line:
+            index = i+1
+            break
+    current.insert(index, contents)
+    
+    shutil.copyfile(path, backuppath)
+    print("\tBackup of game.gp created")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(current)
+    return [level[0] for level in missing], stale
+
+def print_stale_levels(stale):
+    for name in stale:
+        print("\tgame.gp builds "+name+" but its folder no longer exists.")
+
+# ------------------------------------------------------------------------
+#    Geometry Optimization
+# ------------------------------------------------------------------------
+
+# object types the exporter turns into meshes
+geometry_types = ('MESH', 'CURVE', 'SURFACE', 'FONT')
+
+def mesh_triangles(obj, depsgraph):
+    # the evaluated object's triangles in world space as flat arrays, the object itself is left alone
+    evaluated = obj.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    mesh.calc_loop_triangles()
+    if hasattr(mesh, "calc_normals_split"):
+        mesh.calc_normals_split()
+    
+    co = numpy.empty(len(mesh.vertices)*3, numpy.float32)
+    triangles = numpy.empty(len(mesh.loop_triangles)*3, numpy.int32)
+    corners = numpy.empty(len(mesh.loop_triangles)*3, numpy.int32)
+    material_indices = numpy.empty(len(mesh.loop_triangles), numpy.int32)
+    normals = numpy.empty(len(mesh.loops)*3, numpy.float32)
+    mesh.vertices.foreach_get("co", co)
+    mesh.loop_triangles.foreach_get("vertices", triangles)
+    mesh.loop_triangles.foreach_get("loops", corners)
+    mesh.loop_triangles.foreach_get("material_index", material_indices)
+    mesh.loops.foreach_get("normal", normals)
+    
+    # a mirroring transform turns every triangle inside out, wind them the other way round to keep them facing out
+    matrix = numpy.array(obj.matrix_world, numpy.float64)
+    if numpy.linalg.det(matrix[:3,:3]) < 0.0:
+        triangles = numpy.ascontiguousarray(triangles.reshape(-1, 3)[:, ::-1]).ravel()
+        corners = numpy.ascontiguousarray(corners.reshape(-1, 3)[:, ::-1]).ravel()
+    
+    # only the active uv map and color layer, they're what the level uses
+    uvs = None
+    colors = None
+    if mesh.uv_layers.active is not None:
+        uvs = numpy.empty(len(mesh.loops)*2, numpy.float32)
+        mesh.uv_layers.active.data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2)[corners]
+    if mesh.vertex_colors.active is not None:
+        colors = numpy.empty(len(mesh.loops)*4, numpy.float32)
+        mesh.vertex_colors.active.data.foreach_get("color", colors)
+        colors = colors.reshape(-1, 4)[corners]
+    evaluated.to_mesh_clear()
+    
+    normals = normals.reshape(-1, 3)[corners] @ numpy.linalg.pinv(matrix[:3,:3]) # inverse transpose, applied from the right
+    lengths = numpy.linalg.norm(normals, axis=1)
+    normals /= numpy.where(lengths > 0.0, lengths, 1.0)[:,None]
+    
+    slots = [slot.material for slot in obj.material_slots] or [None]
+    return {
+        "positions": co.reshape(-1, 3) @ matrix[:3,:3].T + matrix[:3,3],
+        "triangles": triangles.reshape(-1, 3),
+        "materials": slots,
+        "material_indices": numpy.minimum(material_indices, len(slots)-1),
+        "normals": normals.astype(numpy.float32),
+        "uvs": uvs,
+        "colors": colors,
+        }
+
+# the cell and the 13 neighbouring cells on one side of it, so every pair of neighbouring cells is compared once
+merge_offsets = numpy.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1) if (x, y, z) >= (0, 0, 0)], numpy.int64)
+
+def cell_keys(cells):
+    # one number per grid cell. different cells can share one, every pair found through it is checked for distance anyway
+    cells = cells.astype(numpy.uint64)
+    return (cells[:,0]*numpy.uint64(0x9E3779B97F4A7C15)) ^ (cells[:,1]*numpy.uint64(0xC2B2AE3D27D4EB4F)) ^ (cells[:,2]*numpy.uint64(0x165667B19E3779F9))
+
+def merge_by_distance(positions, distance):
+    # vertices closer together than distance become one point, and so does anything merged with them in turn.
+    # a pair that close is always in the same or neighbouring cells of a grid of that size, so only those are compared.
+    # returns the first vertex of each point and which point every vertex went to
+    count = len(positions)
+    cells = numpy.floor(positions/distance).astype(numpy.int64)
+    keys = cell_keys(cells)
+    order = numpy.argsort(keys, kind="stable")
+    cell_ids, starts, sizes = numpy.unique(keys[order], return_index=True, return_counts=True)
+    vertex_cell = numpy.empty(count, numpy.int64)
+    vertex_cell[order] = numpy.repeat(numpy.arange(len(cell_ids)), sizes)
+    occupied = cells[order[starts]]
+    
+    firsts = []
+    seconds = []
+    for offset in merge_offsets:
+        # look up each occupied cell's neighbour once, in sorted order so the search stays fast
+        wanted = cell_keys(occupied+offset)
+        wanted_order = numpy.argsort(wanted)
+        match = numpy.minimum(numpy.searchsorted(cell_ids, wanted[wanted_order]), len(cell_ids)-1)
+        hit = cell_ids[match] == wanted[wanted_order]
+        cell_low = numpy.zeros(len(cell_ids), numpy.int64)
+        cell_found = numpy.zeros(len(cell_ids), numpy.int64)
+        cell_low[wanted_order[hit]] = starts[match[hit]]
+        cell_found[wanted_order[hit]] = sizes[match[hit]]
+        low = cell_low[vertex_cell]
+        found = cell_found[vertex_cell]
+        if not found.any():
+            continue
+        # every vertex against every vertex of the cell it's looking at
+        first = numpy.repeat(numpy.arange(count), found)
+        ends = numpy.cumsum(found)
+        second = order[numpy.repeat(low-ends+found, found)+numpy.arange(ends[-1])]
+        close = ((positions[first]-positions[second])**2).sum(axis=1) <= distance*distance
+        if not offset.any():
+            close &= second > first
+        firsts.append(first[close])
+        seconds.append(second[close])
+    
+    # every vertex takes the lowest index it's connected to, until nothing changes
+    labels = numpy.arange(count)
+    if firsts:
+        first = numpy.concatenate(firsts)
+        second = numpy.concatenate(seconds)
+        while len(first):
+            lowest = numpy.minimum(labels[first], labels[second])
+            changed = (labels[first] != lowest) | (labels[second] != lowest)
+            if not changed.any():
+                break
+            numpy.minimum.at(labels, first, lowest)
+            numpy.minimum.at(labels, second, lowest)
+            labels = labels[labels] # jump along chains
+    unique, first, inverse = numpy.unique(labels, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+def count_unique(values):
+    # sorting and counting the changes beats numpy.unique when only the count is needed
+    values = numpy.sort(values, axis=None)
+    return int(len(values) > 0) + int(numpy.count_nonzero(values[1:] != values[:-1]))
+
+def exported_vertex_count(triangles, uvs):
+    # the gltf exporter splits a vertex for every different uv it has at its corners. seams are what add up,
+    # split normals and colors are left out of the estimate
+    if uvs is None:
+        return count_unique(triangles)
+    quantized = numpy.floor(uvs*4096.0+0.5).astype(numpy.int64) & 0xffff
+    keys = (triangles.ravel().astype(numpy.int64) << 32) | (quantized[:,0] << 16) | quantized[:,1]
+    return count_unique(keys)
+
+def geometry_bytes(vertices, triangles, uvs=False, colors=False):
+    # roughly what the exporter writes: a position and normal per vertex, uv and color if there are any, 32 bit indices
+    return vertices*(24 + 8*uvs + 16*colors) + triangles*12
+
+def geometry_figures(parts):
+    vertices = sum([exported_vertex_count(part["triangles"], part["uvs"]) for part in parts])
+    triangles = sum([len(part["triangles"]) for part in parts])
+    uvs = any([part["uvs"] is not None for part in parts])
+    colors = any([part["colors"] is not None for part in parts])
+    return {"vertices": vertices, "triangles": triangles, "bytes": geometry_bytes(vertices, triangles, uvs, colors)}
+
+def format_bytes(count):
+    if count >= 1024*1024:
+        return format(count/(1024*1024), ".1f")+" MB"
+    return format(count/1024, ".1f")+" KB"
+
+def optimize_geometry(objects, depsgraph, distance):
+    # cleaned up copies of the objects' triangles, joined into one part per material
+    # returns the parts and the figures from before and after
+    parts = [mesh_triangles(obj, depsgraph) for obj in objects if obj.type in geometry_types]
+    parts = [part for part in parts if len(part["triangles"])]
+    before = geometry_figures(parts)
+    if parts == []:
+        return [], before, before
+    
+    # everything in one set of arrays
+    materials = []
+    for part in parts:
+        for material in part["materials"]:
+            if not material in materials:
+                materials.append(material)
+    offsets = numpy.cumsum([0]+[len(part["positions"]) for part in parts])
+    positions = numpy.concatenate([part["positions"] for part in parts])
+    triangles = numpy.concatenate([part["triangles"]+offset for part, offset in zip(parts, offsets)])
+    material = numpy.concatenate([numpy.array([materials.index(slot) for slot in part["materials"]])[part["material_indices"]] for part in parts])
+    normals = numpy.concatenate([part["normals"] for part in parts])
+    uvs = None
+    colors = None
+    if any([part["uvs"] is not None for part in parts]):
+        uvs = numpy.concatenate([part["uvs"] if part["uvs"] is not None else numpy.zeros((len(part["triangles"])*3, 2), numpy.float32) for part in parts])
+    if any([part["colors"] is not None for part in parts]):
+        colors = numpy.concatenate([part["colors"] if part["colors"] is not None else numpy.ones((len(part["triangles"])*3, 4), numpy.float32) for part in parts])
+    
+    if distance > 0.0:
+        first, remap = merge_by_distance(positions, distance)
+        positions = positions[first]
+        triangles = remap[triangles]
+    
+    # drop triangles that lost a corner in the merge, and ones with next to no area for their size
+    a = positions[triangles[:,0]]
+    b = positions[triangles[:,1]]
+    c = positions[triangles[:,2]]
+    doubled_area = numpy.linalg.norm(numpy.cross(b-a, c-a), axis=1)
+    longest = numpy.max([((b-a)**2).sum(axis=1), ((c-b)**2).sum(axis=1), ((a-c)**2).sum(axis=1)], axis=0)
+    keep = (triangles[:,0] != triangles[:,1]) & (triangles[:,1] != triangles[:,2]) & (triangles[:,2] != triangles[:,0]) & (doubled_area > 1e-6*longest)
+    
+    # join the triangles sharing a material, each part keeps only the vertices its triangles use
+    kept = numpy.flatnonzero(keep)
+    order = kept[numpy.argsort(material[kept], kind="stable")]
+    optimized = []
+    for group in numpy.split(order, numpy.flatnonzero(numpy.diff(material[order]))+1):
+        if len(group) == 0:
+            continue
+        used, compact = numpy.unique(triangles[group], return_inverse=True)
+        corners = (group[:,None]*3 + numpy.arange(3)).ravel()
+        optimized.append({
+            "name": materials[material[group[0]]].name if materials[material[group[0]]] is not None else "No Material",
+            "material": materials[material[group[0]]],
+            "positions": positions[used].astype(numpy.float32),
+            "triangles": compact.reshape(-1, 3).astype(numpy.int32),
+            "normals": normals[corners],
+            "uvs": uvs[corners] if uvs is not None else None,
+            "colors": colors[corners] if colors is not None else None,
+            })
+    return optimized, before, geometry_figures(optimized)
+
+def optimized_object(name, part, collection):
+    # a new object holding one optimized part, filled straight from its arrays
+    triangles = len(part["triangles"])
+    mesh = bpy.data.meshes.new(name=name)
+    mesh.vertices.add(len(part["positions"]))
+    mesh.loops.add(triangles*3)
+    mesh.polygons.add(triangles)
+    mesh.vertices.foreach_set("co", part["positions"].ravel())
+    mesh.loops.foreach_set("vertex_index", part["triangles"].ravel())
+    mesh.polygons.foreach_set("loop_start", numpy.arange(0, triangles*3, 3, dtype=numpy.int32))
+    try:
+        mesh.polygons.foreach_set("loop_total", numpy.full(triangles, 3, numpy.int32))
+    except (AttributeError, TypeError):
+        pass # newer versions of blender derive it from loop_start and made it read only
+    mesh.polygons.foreach_set("use_smooth", numpy.ones(triangles, bool))
+    mesh.update(calc_edges=True)
+    
+    if part["uvs"] is not None:
+        mesh.uv_layers.new().data.foreach_set("uv", part["uvs"].ravel())
+    if part["colors"] is not None:
+        mesh.vertex_colors.new().data.foreach_set("color", part["colors"].ravel())
+    if hasattr(mesh, "use_auto_smooth"):
+        mesh.use_auto_smooth = True # needed for the custom normals before blender 4.1
+    mesh.normals_split_custom_set(part["normals"]) # shading stays what it was, merged vertices or not
+    if part["material"] is not None:
+        mesh.materials.append(part["material"])
+    
+    obj = bpy.data.objects.new(name, mesh)
+    collection.objects.link(obj)
+    return obj
+
+def optimized_parts(anchor, distance):
+    start = time.perf_counter()
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    parts, before, after = optimize_geometry(anchor_children(bpy.context.scene.objects[anchor]), depsgraph, distance)
+    print("\tOptimized geometry in "+format(time.perf_counter()-start, ".2f")+"s: "
+        +str(before["vertices"])+" -> "+str(after["vertices"])+" vertices, "
+        +str(before["triangles"])+" -> "+str(after["triangles"])+" triangles, about "
+        +format_bytes(before["bytes"])+" -> "+format_bytes(after["bytes"])+".")
+    return parts
+
+def export_optimized_glb(anchor, path, distance):
+    # exports optimized copies of the anchor's children in their place, then throws the copies away
+    parts = optimized_parts(anchor, distance)
+    
+    collection = bpy.data.collections.new("Optimized Geometry")
+    bpy.context.scene.collection.children.link(collection)
+    try:
+        copies = [optimized_object(anchor+" "+part["name"], part, collection) for part in parts]
+        bpy.ops.object.select_all(action='DESELECT')
+        for copy in copies:
+            copy.select_set(True)
+        bpy.ops.export_scene.gltf(
+            filepath=path,
+            use_selection=True
+        )
+    finally:
+        for copy in collection.objects[:]:
+            mesh = copy.data
+            bpy.data.objects.remove(copy)
+            bpy.data.meshes.remove(mesh)
+        bpy.data.collections.remove(collection)
+    print("\tThe optimized .glb is "+format_bytes(os.path.getsize(path))+".")
+
+# ------------------------------------------------------------------------
+#    Direct GLB Writer
+# ------------------------------------------------------------------------
+
+# writes just what the custom level importer reads (positions, normals, uvs, vertex colors, materials and base
+# color textures) straight from numpy arrays, without the selection or blender's general purpose exporter
+
+glb_float = 5126
+glb_unsigned_short = 5123
+glb_unsigned_int = 5125
+glb_array_buffer = 34962
+glb_element_array_buffer = 34963
+
+def object_parts(objects, depsgraph):
+    # each object's triangles split by material, the way the writer takes them
+    parts = []
+    for obj in objects:
+        if not obj.type in geometry_types:
+            continue
+        triangles = mesh_triangles(obj, depsgraph)
+        indices = triangles["material_indices"]
+        for index in numpy.unique(indices).tolist():
+            group = numpy.flatnonzero(indices == index)
+            corners = (group[:,None]*3 + numpy.arange(3)).ravel()
+            parts.append({
+                "name": obj.name,
+                "material": triangles["materials"][index],
+                "positions": triangles["positions"], # the writer only takes the vertices the triangles use
+                "triangles": triangles["triangles"][group],
+                "normals": triangles["normals"][corners],
+                "uvs": triangles["uvs"][corners] if triangles["uvs"] is not None else None,
+                "colors": triangles["colors"][corners] if triangles["colors"] is not None else None,
+                })
+    return parts
+
+def corner_vertices(rows):
+    # rows hold each corner's vertex and attributes as 32 bit words. returns the first corner of every distinct
+    # vertex and which vertex each corner is. a 64 bit hash of the row sorts far faster than the whole row
+    key = rows[:,0].astype(numpy.uint64)
+    for column in range(1, rows.shape[1]):
+        key = (key*numpy.uint64(0x100000001b3)) ^ rows[:,column]
+    unique, first, inverse = numpy.unique(key, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    if not (rows[first][inverse] == rows).all(): # two different corners share a hash, compare them whole instead
+        keys = numpy.ascontiguousarray(rows).view(numpy.dtype((numpy.void, rows.dtype.itemsize*rows.shape[1]))).ravel()
+        unique, first, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+def srgb_to_linear(color):
+    # vertex colors are stored as srgb, gltf wants them linear
+    linear = numpy.where(color <= 0.04045, color/12.92, ((color+0.055)/1.055)**2.4)
+    return numpy.column_stack((linear[:,:3], color[:,3])).astype(numpy.float32)
+
+def glb_image(image):
+    # the image's file as png or jpeg bytes, with its mime type
+    if image.packed_file is not None:
+        data = image.packed_file.data
+    else:
+        path = bpy.path.abspath(image.filepath)
+        data = b""
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                data = f.read()
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return data, "image/png"
+    if data[:3] == b"\xff\xd8\xff":
+        return data, "image/jpeg"
+    
+    # anything else is saved as a png first
+    temppath = os.path.join(bpy.app.tempdir, "glb_texture.png")
+    copy = image.copy()
+    try:
+        copy.filepath_raw = temppath
+        copy.file_format = 'PNG'
+        copy.save()
+    finally:
+        bpy.data.images.remove(copy)
+    with open(temppath, "rb") as f:
+        data = f.read()
+    os.remove(temppath)
+    return data, "image/png"
+
+def base_color(material):
+    # the material's base color and the image feeding it, if any
+    if material is None:
+        return [0.8, 0.8, 0.8, 1.0], None
+    if material.use_nodes:
+        for node in material.node_tree.nodes:
+            if node.type == 'BSDF_PRINCIPLED':
+                socket = node.inputs["Base Color"]
+                if socket.is_linked and socket.links[0].from_node.type == 'TEX_IMAGE':
+                    return [1.0, 1.0, 1.0, 1.0], socket.links[0].from_node.image
+                return list(socket.default_value), None
+    return list(material.diffuse_color), None
+
+class GlbBuilder:
+    # collects the json and the arrays for the binary chunk, the arrays are written as they are, not copied
+    def __init__(self):
+        self.gltf = {
+            "asset": {"version": "2.0", "generator": "OpenGOAL Level Builder"},
+            "scene": 0,
+            "scenes": [{"nodes": []}],
+            "nodes": [],
+            "meshes": [],
+            "materials": [],
+            "textures": [],
+            "images": [],
+            "samplers": [{}], # repeat in both directions, the gltf default
+            "accessors": [],
+            "bufferViews": [],
+            }
+        self.chunks = []
+        self.length = 0
+        self.meshes = {}
+        self.materials = {}
+        self.textures = {}
+    
+    def add_view(self, data, target=None):
+        view = memoryview(data).cast("B")
+        padding = -self.length % 4 # every view starts on 4 bytes
+        if padding:
+            self.chunks.append(bytes(padding))
+            self.length += padding
+        entry = {"buffer": 0, "byteOffset": self.length, "byteLength": view.nbytes}
+        if target is not None:
+            entry["target"] = target
+        self.gltf["bufferViews"].append(entry)
+        self.chunks.append(view)
+        self.length += view.nbytes
+        return len(self.gltf["bufferViews"])-1
+    
+    def add_accessor(self, array, component_type, kind, target, bounds=False):
+        array = numpy.ascontiguousarray(array)
+        accessor = {"bufferView": self.add_view(array, target), "componentType": component_type, "count": len(array), "type": kind}
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"])-1
+    
+    def add_material(self, material):
+        key = material.name if material is not None else None
+        if not key in self.materials:
+            color, image = base_color(material)
+            pbr = {"baseColorFactor": color[:4], "metallicFactor": 0.0}
+            if image is not None:
+                pbr["baseColorTexture"] = {"index": self.add_texture(image)}
+            entry = {"name": key or "No Material", "pbrMetallicRoughness": pbr}
+            if material is not None and not material.use_backface_culling:
+                entry["doubleSided"] = True
+            self.gltf["materials"].append(entry)
+            self.materials[key] = len(self.gltf["materials"])-1
+        return self.materials[key]
+    
+    def add_texture(self, image):
+        if not image.name in self.textures:
+            data, mime_type = glb_image(image)
+            self.gltf["images"].append({"name": image.name, "bufferView": self.add_view(data), "mimeType": mime_type})
+            self.gltf["textures"].append({"source": len(self.gltf["images"])-1, "sampler": 0})
+            self.textures[image.name] = len(self.gltf["textures"])-1
+        return self.textures[image.name]
+    
+    def add_part(self, part):
+        # one primitive. blender is z up and gltf is y up, so gltf (x, y, z) is blender (x, z, -y)
+        triangles = part["triangles"].reshape(-1)
+        columns = [triangles.astype(numpy.uint32)[:,None], numpy.ascontiguousarray(part["normals"], numpy.float32).view(numpy.uint32)]
+        if part["uvs"] is not None:
+            columns.append(numpy.ascontiguousarray(part["uvs"], numpy.float32).view(numpy.uint32))
+        if part["colors"] is not None:
+            columns.append(numpy.ascontiguousarray(part["colors"], numpy.float32).view(numpy.uint32))
+        first, indices = corner_vertices(numpy.hstack(columns))
+        
+        positions = numpy.asarray(part["positions"], numpy.float32)[triangles[first]]
+        normals = numpy.asarray(part["normals"], numpy.float32)[first]
+        attributes = {
+            "POSITION": self.add_accessor(positions[:,[0,2,1]]*numpy.array([1.0, 1.0, -1.0], numpy.float32), glb_float, "VEC3", glb_array_buffer, bounds=True),
+            "NORMAL": self.add_accessor(normals[:,[0,2,1]]*numpy.array([1.0, 1.0, -1.0], numpy.float32), glb_float, "VEC3", glb_array_buffer),
+            }
+        if part["uvs"] is not None:
+            uvs = numpy.asarray(part["uvs"], numpy.float32)[first]
+            attributes["TEXCOORD_0"] = self.add_accessor(numpy.column_stack((uvs[:,0], 1.0-uvs[:,1])).astype(numpy.float32), glb_float, "VEC2", glb_array_buffer)
+        if part["colors"] is not None:
+            attributes["COLOR_0"] = self.add_accessor(srgb_to_linear(numpy.asarray(part["colors"], numpy.float32)[first]), glb_float, "VEC4", glb_array_buffer)
+        if len(first) < 65536:
+            indices = self.add_accessor(indices.astype(numpy.uint16), glb_unsigned_short, "SCALAR", glb_element_array_buffer)
+        else:
+            indices = self.add_accessor(indices.astype(numpy.uint32), glb_unsigned_int, "SCALAR", glb_element_array_buffer)
+        primitive = {"attributes": attributes, "indices": indices, "material": self.add_material(part["material"])}
+        
+        # parts of the same object are primitives of one mesh, already in world space
+        if not part["name"] in self.meshes:
+            self.gltf["meshes"].append({"name": part["name"], "primitives": []})
+            self.gltf["nodes"].append({"name": part["name"], "mesh": len(self.gltf["meshes"])-1})
+            self.gltf["scenes"][0]["nodes"].append(len(self.gltf["nodes"])-1)
+            self.meshes[part["name"]] = len(self.gltf["meshes"])-1
+        self.gltf["meshes"][self.meshes[part["name"]]]["primitives"].append(primitive)
+    
+    def write(self, path):
+        gltf = dict([(key, value) for key, value in self.gltf.items() if value != []]) # gltf doesn't allow empty lists
+        padding = -self.length % 4
+        if self.length:
+            gltf["buffers"] = [{"byteLength": self.length+padding}]
+        document = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+        document += b" "*(-len(document) % 4)
+        total = 12 + 8+len(document) + (8+self.length+padding if self.length else 0)
+        
+        with open(path, "wb") as f:
+            f.write(struct.pack("<4sII", b"glTF", 2, total))
+            f.write(struct.pack("<I4s", len(document), b"JSON"))
+            f.write(document)
+            if self.length:
+                f.write(struct.pack("<I4s", self.length+padding, b"BIN\0"))
+                for chunk in self.chunks:
+                    f.write(chunk)
+                f.write(bytes(padding))
+
+def write_glb(path, parts):
+    # parts hold a name, material, positions and triangles, and corner normals, uvs and colors, all in blender world space
+    builder = GlbBuilder()
+    for part in parts:
+        if len(part["triangles"]):
+            builder.add_part(part)
+    builder.write(path)
+
+# ------------------------------------------------------------------------
+#    Geometry Budget
+# ------------------------------------------------------------------------
+
+# what the level geometry costs, shown in the level info panel. figures are kept per object and image,
+# the depsgraph handler drops the ones that changed and a timer works out only what it has to.
+# the panel just draws the last result, it never evaluates a mesh itself
+geometry_budget = {"key": None, "objects": {}, "images": {}, "result": None, "stale": True}
+
+# how many of the heaviest objects the panel lists
+budget_offenders = 5
+
+# seconds between an edit and the totals being worked out again, edits while dragging share one update
+budget_delay = 0.25
+
+@persistent
+def track_geometry_changes(scene, depsgraph):
+    objects = geometry_budget["objects"]
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and update.is_updated_geometry:
+            objects.pop(update.id.original.name, None)
+            geometry_fingerprints.pop(update.id.original.name, None)
+        elif isinstance(update.id, bpy.types.Mesh) and update.is_updated_geometry:
+            for name in [name for name, figures in objects.items() if figures["mesh"] == update.id.original.name]:
+                del objects[name]
+            for name in [name for name, fingerprint in geometry_fingerprints.items() if fingerprint[0] == update.id.original.name]:
+                del geometry_fingerprints[name]
+        elif isinstance(update.id, (bpy.types.Material, bpy.types.Image, bpy.types.NodeTree)):
+            geometry_budget["images"].clear()
+    geometry_budget["stale"] = True # totals are cheap to add up again from what's left
+    schedule_geometry_budget()
+
+@persistent
+def invalidate_geometry_budget(*args):
+    geometry_fingerprints.clear()
+    geometry_budget["objects"].clear()
+    geometry_budget["images"].clear()
+    geometry_budget["result"] = None
+    geometry_budget["stale"] = True
+
+def schedule_geometry_budget():
+    if not bpy.app.timers.is_registered(update_geometry_budget):
+        bpy.app.timers.register(update_geometry_budget, first_interval=budget_delay)
+
+def update_geometry_budget():
+    # works out the totals for the level info panel, only in object mode where the panel is
+    if bpy.context.mode != 'OBJECT':
+        return None
+    scene = bpy.context.scene
+    analyze_geometry(scene, bpy.context.evaluated_depsgraph_get())
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+    return None
+
+def current_geometry_budget(scene):
+    # the last totals worked out for the scene's anchor, asking for new ones when they're out of date
+    key = (scene.name, scene.my_tool.anchor)
+    if geometry_budget["stale"] or geometry_budget["key"] != key:
+        schedule_geometry_budget()
+    return geometry_budget["result"] if geometry_budget["key"] == key else None
+
+def object_figures(obj, depsgraph):
+    # counts for one object as it would export, from its evaluated mesh
+    evaluated = obj.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    mesh.calc_loop_triangles()
+    triangles = numpy.empty(len(mesh.loop_triangles)*3, numpy.int32)
+    mesh.loop_triangles.foreach_get("vertices", triangles)
+    uvs = None
+    if mesh.uv_layers.active is not None:
+        corners = numpy.empty(len(triangles), numpy.int32)
+        mesh.loop_triangles.foreach_get("loops", corners)
+        uvs = numpy.empty(len(mesh.loops)*2, numpy.float32)
+        mesh.uv_layers.active.data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2)[corners]
+    colors = mesh.vertex_colors.active is not None
+    evaluated.to_mesh_clear()
+    
+    vertices = exported_vertex_count(triangles, uvs)
+    return {
+        "mesh": obj.data.name if obj.data is not None else None,
+        "vertices": vertices,
+        "triangles": len(triangles)//3,
+        "materials": [slot.material.name for slot in obj.material_slots if slot.material is not None],
+        "bytes": geometry_bytes(vertices, len(triangles)//3, uvs is not None, colors),
+        }
+
+def material_images(material):
+    if material is None or not material.use_nodes:
+        return []
+    return [node.image for node in material.node_tree.nodes if node.type == 'TEX_IMAGE' and node.image is not None]
+
+def image_figures(image):
+    # the memory the texture takes uncompressed, and what its file adds to the .glb
+    width, height = image.size
+    if image.packed_file is not None:
+        file_bytes = image.packed_file.size
+    else:
+        path = bpy.path.abspath(image.filepath)
+        file_bytes = os.path.getsize(path) if os.path.isfile(path) else width*height*4
+    return {"memory": width*height*4, "bytes": file_bytes}
+
+def analyze_geometry(scene, depsgraph):
+    # totals for everything under the anchor, the same objects the export takes. None without an anchor
+    mytool = scene.my_tool
+    key = (scene.name, mytool.anchor)
+    if geometry_budget["key"] != key:
+        invalidate_geometry_budget()
+        geometry_budget["key"] = key
+    if not mytool.anchor in scene.objects:
+        geometry_budget["stale"] = False
+        return None
+    if not geometry_budget["stale"] and geometry_budget["result"] is not None:
+        return geometry_budget["result"]
+    
+    objects = geometry_budget["objects"]
+    images = geometry_budget["images"]
+    children = [obj for obj in anchor_children(scene.objects[mytool.anchor]) if obj.type in geometry_types]
+    for obj in children:
+        if not obj.name in objects:
+            objects[obj.name] = object_figures(obj, depsgraph)
+    names = set([obj.name for obj in children])
+    for name in [name for name in objects if not name in names]: # deleted or moved out from under the anchor
+        del objects[name]
+    
+    materials = set()
+    for figures in objects.values():
+        materials.update(figures["materials"])
+    textures = {}
+    for name in materials:
+        for image in material_images(bpy.data.materials.get(name)):
+            if not image.name in images:
+                images[image.name] = image_figures(image)
+            textures[image.name] = images[image.name]
+    
+    heaviest = sorted(objects.items(), key=lambda item: item[1]["bytes"], reverse=True)[:budget_offenders]
+    result = {
+        "objects": len(objects),
+        "vertices": sum([figures["vertices"] for figures in objects.values()]),
+        "triangles": sum([figures["triangles"] for figures in objects.values()]),
+        "materials": len(materials),
+        "texture_memory": sum([texture["memory"] for texture in textures.values()]),
+        # the buffers, the embedded image files and a little json for every object
+        "bytes": sum([figures["bytes"] for figures in objects.values()]) + sum([texture["bytes"] for texture in textures.values()]) + 1024*len(objects),
+        "heaviest": [(name, figures["triangles"], figures["bytes"]) for name, figures in heaviest],
+        }
+    geometry_budget["result"] = result
+    geometry_budget["stale"] = False
+    return result
+
+def draw_geometry_budget(layout, mytool, budget):
+    megabyte = 1024*1024
+    row = layout.row()
+    row.alert = budget["bytes"] > mytool.budget_glb_size*megabyte
+    row.label(text="Estimated .glb: "+format_bytes(budget["bytes"])+" of "+format(mytool.budget_glb_size, "g")+" MB", icon="ERROR" if row.alert else "FILE_3D")
+    row = layout.row()
+    row.alert = budget["triangles"] > mytool.budget_triangles
+    row.label(text="Triangles: "+format(budget["triangles"], ",")+" of "+format(mytool.budget_triangles, ","), icon="ERROR" if row.alert else "MESH_DATA")
+    layout.label(text="Vertices: "+format(budget["vertices"], ",")+" in "+str(budget["objects"])+" objects")
+    row = layout.row()
+    row.alert = budget["texture_memory"] > mytool.budget_texture_memory*megabyte
+    row.label(text=str(budget["materials"])+" materials, "+format_bytes(budget["texture_memory"])+" of textures", icon="ERROR" if row.alert else "TEXTURE")
+    if budget["heaviest"]:
+        layout.label(text="Heaviest objects:")
+        for name, triangles, size in budget["heaviest"]:
+            layout.label(text="    "+name+": "+format(triangles, ",")+" triangles, "+format_bytes(size))
+
+# ------------------------------------------------------------------------
+#    Geometry Fingerprint
+# ------------------------------------------------------------------------
+
+# object name -> (mesh name, hash of its evaluated mesh data). the geometry handler drops objects as they change,
+# so an export only reads the meshes that were edited to tell whether the .glb needs exporting again
+geometry_fingerprints = {}
+
+# what an object's evaluated mesh is hashed from: collection, attribute, type, values per item
+fingerprint_arrays = (
+    ("vertices", "co", numpy.float32, 3),
+    ("loops", "vertex_index", numpy.int32, 1),
+    ("polygons", "loop_start", numpy.int32, 1),
+    ("polygons", "material_index", numpy.int32, 1),
+    ("polygons", "use_smooth", numpy.bool_, 1),
+    )
+
+def hash_array(digest, collection, attribute, dtype, width):
+    data = numpy.empty(len(collection)*width, dtype)
+    collection.foreach_get(attribute, data)
+    digest.update(struct.pack("<I", len(data))) # so the same bytes split differently don't hash the same
+    digest.update(data)
+
+def object_data_hash(obj, depsgraph):
+    # the evaluated mesh's vertices, faces, materials, normals, uvs and colors, hashed straight from the foreach_get buffers
+    evaluated = obj.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    digest = hashlib.sha1()
+    for collection, attribute, dtype, width in fingerprint_arrays:
+        hash_array(digest, getattr(mesh, collection), attribute, dtype, width)
+    # custom and auto smooth normals change the .glb without changing anything above, read them like mesh_triangles does
+    if hasattr(mesh, "calc_normals_split"):
+        mesh.calc_normals_split()
+    hash_array(digest, mesh.loops, "normal", numpy.float32, 3)
+    if mesh.uv_layers.active is not None:
+        hash_array(digest, mesh.uv_layers.active.data, "uv", numpy.float32, 2)
+    if mesh.vertex_colors.active is not None:
+        hash_array(digest, mesh.vertex_colors.active.data, "color", numpy.float32, 4)
+    evaluated.to_mesh_clear()
+    return digest.digest()
+
+def material_fingerprint(material):
+    # what the .glb takes from a material, an image by its file rather than its pixels
+    color, image = base_color(material)
+    parts = [material.name, str(color), str(material.use_backface_culling)]
+    if image is not None:
+        parts += [image.name, image.filepath, str(image.packed_file.size if image.packed_file is not None else None), str(image.is_dirty)]
+        path = bpy.path.abspath(image.filepath)
+        if os.path.isfile(path):
+            parts.append(str(file_stat(path)))
+    return "\n".join(parts)
+
+def geometry_fingerprint(scene, anchor, options):
+    # one hash of everything the .glb is made from, the export options included
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    objects = sorted([obj for obj in anchor_children(scene.objects[anchor]) if obj.type in geometry_types], key=lambda obj: obj.name)
+    matrices = numpy.array([numpy.array(obj.matrix_world) for obj in objects], numpy.float32)
+    
+    digest = hashlib.sha1(repr(options).encode("utf-8"))
+    digest.update(matrices.tobytes()) # moving an object changes the .glb but not its mesh, so these aren't cached
+    materials = set()
+    for obj in objects:
+        if not obj.name in geometry_fingerprints:
+            geometry_fingerprints[obj.name] = (obj.data.name if obj.data is not None else None, object_data_hash(obj, depsgraph))
+        slots = [slot.material for slot in obj.material_slots]
+        materials.update([material for material in slots if material is not None])
+        digest.update((obj.name+"\n"+"\n".join([material.name if material is not None else "" for material in slots])+"\n").encode("utf-8"))
+        digest.update(geometry_fingerprints[obj.name][1])
+    for material in sorted(materials, key=lambda material: material.name):
+        digest.update(material_fingerprint(material).encode("utf-8"))
+    return digest.hexdigest()
+
+def glb_up_to_date(manifest, newpath, longtitle, fingerprint):
+    # the .glb on disk was exported from exactly this geometry and nobody touched it since
+    path = newpath+longtitle+".glb"
+    entry = manifest["artifacts"].get("glb")
+    return entry is not None and entry["input"] == fingerprint and os.path.exists(path) and entry["stat"] == file_stat(path)
+
+def level_templates(nick, longtitle, title, spawn):
+    # the contents of every file a level needs, aside from the .jsonc's actors
     
     gd = [
         '("',
@@ -557,150 +2129,316 @@ def update_files(task_count, current_task, should_export_level_info, should_expo
         ")"
         ]
         
-    gp = '\n(build-custom-level "'+longtitle+'")\n'+'(custom-level-cgo "'+nick.upper()+'.DGO" "'+longtitle+'/'+title+'.gd")\n'
+    gp = game_gp_block(longtitle, title, nick)
+    
+    return {"gd": gd, "jsonc": jsonc, "jsonc_end": jsonc_end, "readme": readme, "gc": gc, "gp": gp}
+
+def save_custom_levels_path(custom_levels_path):
+    # save the custom levels path so it doesn't have to be retyped
+    with open("blender_goal_config.json", "r+") as f:
+        file = f.read()
+        json_data = json.loads(file)
+        json_data["Custom Levels Path"]=custom_levels_path
+        f.seek(0)
+        f.truncate()
+        json.dump(json_data, f)
+
+def level_actor_blocks(scene, manifest, newpath, longtitle, templates, should_export_actor_info, auto_bsphere=False):
+    # the .jsonc's input hash and the scene's actors formatted for it, None if it doesn't need writing.
+    # reads blender data, main thread only
+    path = newpath+longtitle+".jsonc"
+    if should_export_actor_info or not os.path.exists(path): # the actors change far more often than the rest, so rewrite it when they're exported
+        actors = level_actors(scene)
+        actors_hash = actors_input_hash(actors, auto_bsphere)
+        input_hash = text_hash(templates["jsonc"]+templates["jsonc_end"]+[actors_hash]) if actors_hash is not None else None
+        if artifact_current(manifest, "jsonc", path, input_hash):
+            return input_hash, [] # write_artifact skips it, so none of the actors are formatted
+        return input_hash, cached_actor_blocks(actors, auto_bsphere) if len(actors) else []
+    return None
+
+def write_level_files(manifest, newpath, longtitle, title, templates, jsonc, should_export_level_info=True):
+    # the files in the level's own folder. no blender data involved, so other levels can be exported meanwhile
+    # with only the actor info exported, only the .jsonc is written. jsonc is what level_actor_blocks returned
     
     # create gd
     path = newpath
     filename = title+".gd"
-    contents = gd
-    if not os.path.exists(path+filename):
-        f = open(path+filename, 'w', encoding="utf-8")
-        # write the contents
-        f.writelines(contents)
-        # close the file
-        f.close()
-        print("\t"+filename+" created.")
-    else:
-        print("\t"+filename+" already exists, creation skipped.")
+    if should_export_level_info:
+        write_artifact(manifest, "gd", path+filename, lambda f: f.writelines(templates["gd"]), text_hash(templates["gd"]), protect=True)
         
     # create jsonc
     path = newpath
     filename = longtitle+".jsonc"
-    contents = jsonc
-    if not os.path.exists(path+filename):
-        f = open(path+filename, 'w', encoding="utf-8")
-        # write the contents
-        f.writelines(contents)
-        
-        contents = []
-        commas = len(bpy.data.collections['actor_collection'].all_objects)
-        
-        for actor in bpy.data.collections['actor_collection'].all_objects:
-            contents+=return_actor_block(actor.name, actor["Actor Type"], actor.location, actor.rotation_quaternion, actor["Game Task"], actor["Bounding Sphere Radius"])
-            if commas>1:
-                contents+=",\n\n"
-                commas-=1
-            else:
-                contents+="\n\n"
-        f.writelines(contents)
-        
-        contents = jsonc_end
-        f.writelines(contents)
-        # close the file
-        f.close()
-        
-        print("\t"+filename+" created.")
+    if jsonc is not None:
+        input_hash, blocks = jsonc
+        def write_jsonc(f):
+            f.writelines(templates["jsonc"])
+            write_actor_blocks(f, blocks)
+            f.writelines(templates["jsonc_end"])
+            
+        write_artifact(manifest, "jsonc", path+filename, write_jsonc, input_hash)
     else:
         print("\t"+filename+" already exists, creation skipped.")
         
     # create readme
     path = newpath
     filename = "README.MD"
-    contents = readme
-    if not os.path.exists(path+filename):
-        f = open(path+filename, 'w', encoding="utf-8")
-        # write the contents
-        f.writelines(contents)
-        # close the file
-        f.close()
-        print("\t"+filename+" created.")
-    else:
-        print("\t"+filename+" already exists, creation skipped.")
-    
-    # create a backup and append new level to level-info.gc
+    if should_export_level_info:
+        write_artifact(manifest, "readme", path+filename, lambda f: f.writelines(templates["readme"]), text_hash(templates["readme"]), protect=True)
+
+def patch_level_info(gcpath, levels):
+    # create a backup and add or update the levels in level-info.gc, one read and at most one write for all of them
     path = gcpath
     filename = "level-info.gc"
     backupname = "level-info.bak"
-    contents = gc
-    needs_update = True
-    
-    # check level-info.gc for the level before adding it
-    f = open(path+filename, 'r', encoding="utf-8")
-    for line in f:
-        if longtitle in line:
-            needs_update = False
-    # close the file
-    f.close()
-    
-    if needs_update:    
-        shutil.copyfile(path+filename,path+backupname)
-        print("\tBackup of level-info.gc created")
-        f = open(path+filename, 'a', encoding="utf-8")
-        # write the contents
-        f.writelines(contents)
-        # close the file
-        f.close()
-        print("\t"+filename+" updated.")
-    else:
-        print("\t"+filename+" already contains the level, modification skipped.")
+    stat = file_stat(path+filename)
+    hashes = [hashlib.sha1("".join(level["templates"]["gc"]).encode("utf-8")).hexdigest() for level in levels]
+    
+    entries = []
+    for level, patch_hash in zip(levels, hashes):
+        entry = level["manifest"]["artifacts"].get("level-info.gc")
+        if entry is not None and entry["input"] == patch_hash and entry["stat"] == stat:
+            # nobody touched it since the last export added this exact entry, no need to even read it
+            print("\t"+filename+" unchanged since the last export of "+level["longtitle"]+", modification skipped.")
+        else:
+            contents = level["templates"]["gc"]
+            entries.append((level["longtitle"], "".join(contents[:-3]).strip("\n"), "".join(contents[-3:])))
+    if entries == []:
+        return
+    
+    # find each level's entry by name and add it, or replace it if it changed (i.e. a new spawn point)
+    statuses = update_level_info(path+filename, path+backupname, entries)
+    for longtitle, status in statuses.items():
+        if status == "unchanged":
+            print("\t"+filename+" already contains "+longtitle+", modification skipped.")
+        elif status == "added":
+            print("\t"+filename+" updated with "+longtitle+".")
+        else:
+            print("\t"+filename+" entry for "+longtitle+" replaced.")
     
-    # create a backup and append new level to game.gp
+    output_hash = hash_file(path+filename)
+    for level, patch_hash in zip(levels, hashes):
+        record_artifact(level["manifest"], "level-info.gc", path+filename, patch_hash, output_hash)
+
+def patch_game_gp(gppath, levels, levels_path):
+    # create a backup and add the missing levels to game.gp, one read and at most one write for all of them
     path = gppath
     filename = "game.gp"
     backupname = "game.bak"
-    contents = gp
-    needs_update = True
-    
-    # check level-info.gc for the level before adding it
-    f = open(path+filename, 'r', encoding="utf-8")
-    for line in f:
-        if longtitle in line:
-            needs_update = False
-    # close the file
-    f.close()
-    
-    if needs_update:
-        shutil.copyfile(path+filename,path+backupname)
-        print("\tBackup of game.gp created")
-        
-        match_string = "testzone.gd\")"
-        with open(path+filename, 'r+') as f:
-            current = f.readlines()
-            if match_string in current[-1]: # this will fail if the levels have to be in order
-                current.append(contents)
-            else:
-                for index, line in enumerate(current):
-                    if match_string in line and contents not in current[index + 1]:
-                        current.insert(index + 1, contents)
-                        break
-            f.seek(0)
-            f.writelines(current)
-        print("\t"+filename+" updated.")
-    else:
-        print("\t"+filename+" already contains the level, modification skipped.")
+    stat = file_stat(path+filename)
+    hashes = [hashlib.sha1(level["templates"]["gp"].encode("utf-8")).hexdigest() for level in levels]
+    
+    pending = []
+    for level, patch_hash in zip(levels, hashes):
+        entry = level["manifest"]["artifacts"].get("game.gp")
+        if entry is not None and entry["input"] == patch_hash and entry["stat"] == stat:
+            print("\t"+filename+" unchanged since the last export of "+level["longtitle"]+", modification skipped.")
+        else:
+            pending.append(level)
+    if pending == []:
+        return
+    
+    added, stale = register_levels(path+filename, path+backupname, [(level["longtitle"], level["title"], level["nick"]) for level in pending], levels_path)
+    for level in pending:
+        if level["longtitle"] in added:
+            print("\t"+filename+" updated with "+level["longtitle"]+".")
+        else:
+            print("\t"+filename+" already contains "+level["longtitle"]+", modification skipped.")
+    print_stale_levels(stale)
+    
+    output_hash = hash_file(path+filename)
+    for level, patch_hash in zip(levels, hashes):
+        record_artifact(level["manifest"], "game.gp", path+filename, patch_hash, output_hash)
+
+def update_files(task_count, current_task, should_export_level_info, should_export_actor_info, newpath, nick, longtitle, title, spawn, auto_bsphere=False):
+    
+    if not (should_export_level_info or should_export_actor_info):
+        return current_task
+    
+    print("Task ("+str(current_task)+"/"+str(task_count)+")")
+    
+    current_task += 1
+    print("Updating the necessary files.\n")
+    
+    # make the new folder
+    if not os.path.exists(newpath):
+        os.mkdir(newpath)
+        print("\tDirectory created.")
+    
+    save_custom_levels_path(os.path.join(os.path.dirname(os.path.dirname(newpath)), ""))
+        
+    # save the blend file
+    if should_export_level_info:
+        bpy.ops.wm.save_as_mainfile(filepath=newpath+longtitle+'.blend')
+    
+    # make paths for game.gp and level-info.gc
+    gppath = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(newpath))), "goal_src", "jak1", "")
+    gcpath = os.path.join(gppath, "engine", "level", "")
+    
+    manifest = read_manifest(newpath)
+    templates = level_templates(nick, longtitle, title, spawn)
+    level = {"longtitle": longtitle, "title": title, "nick": nick, "manifest": manifest, "templates": templates}
+    
+    write_level_files(manifest, newpath, longtitle, title, templates, level_actor_blocks(bpy.context.scene, manifest, newpath, longtitle, templates, should_export_actor_info, auto_bsphere), should_export_level_info)
+    if should_export_level_info:
+        patch_level_info(gcpath, [level])
+        patch_game_gp(gppath, [level], os.path.join(os.path.dirname(os.path.dirname(newpath)), ""))
+    
+    write_manifest(newpath, manifest)
         
     print("\nDone.\n")
     
     return current_task
-        
-def export_geometry(context, anchor, newpath, longtitle):
+
+def export_glb(anchor, path, optimize=False, merge_distance=0.0, direct=False):
+    # the anchor's children in the current scene, through the direct writer or blender's gltf exporter. main thread only
+    if direct:
+        start = time.perf_counter()
+        if optimize:
+            parts = optimized_parts(anchor, merge_distance)
+        else:
+            parts = object_parts(anchor_children(bpy.context.scene.objects[anchor]), bpy.context.evaluated_depsgraph_get())
+        write_glb(path, parts)
+        print("\t.glb written directly in "+format(time.perf_counter()-start, ".2f")+"s, "+format_bytes(os.path.getsize(path))+".")
+        return
+    if optimize:
+        export_optimized_glb(anchor, path, merge_distance)
+        return
+    bpy.ops.object.select_all(action='DESELECT') # deselect everything, probably not necessary
+    bpy.context.scene.objects[anchor].select_set(True) # select the anchor
+    bpy.ops.object.select_grouped(type='CHILDREN_RECURSIVE') # select the anchor's children
+    bpy.ops.export_scene.gltf( # actually export
+        filepath=path,
+        use_selection=True # export only the selection
+    )
+
+def replace_glb(manifest, newpath, longtitle, fingerprint=None):
+    # only replace the .glb if the geometry actually changed, so goalc doesn't rebuild it for nothing
+    # no blender data involved, so other levels can be exported meanwhile
+    path = newpath+longtitle+".glb"
+    temppath = newpath+longtitle+".new.glb"
+    digest = hash_file(temppath)
+    existing = current_output_hash(manifest, "glb", path)
+    if digest == existing:
+        os.remove(temppath)
+        print("\t"+longtitle+".glb unchanged.\n")
+    else:
+        os.replace(temppath, path)
+        print("\t"+longtitle+".glb "+("created" if existing is None else "updated")+".\n")
+    record_artifact(manifest, "glb", path, fingerprint, digest)
+
+def export_geometry(context, anchor, newpath, longtitle, optimize=False, merge_distance=0.0, direct=False):
         
     print("Exporting geometry.\n")
     
-    if not os.path.exists(newpath+longtitle+".glb"):
-        bpy.ops.object.select_all(action='DESELECT') # deselect everything, probably not necessary
-        bpy.context.scene.objects[anchor].select_set(True) # select the anchor
-        bpy.ops.object.select_grouped(type='CHILDREN_RECURSIVE') # select the anchor's children
-        bpy.ops.export_scene.gltf( # actually export
-            filepath=newpath+longtitle+".glb",
-            use_selection=True # export only the selection
-        )
-        print("\t"+longtitle+".glb created.\n")
-    else:
-        print("\t"+longtitle+".glb already exists, creation skipped.\n")
+    if not os.path.exists(newpath):
+        os.mkdir(newpath)
+    manifest = read_manifest(newpath)
     
+    # nothing under the anchor changed since the .glb was exported, no need to export it at all
+    fingerprint = geometry_fingerprint(context.scene, anchor, (optimize, merge_distance, direct))
+    if glb_up_to_date(manifest, newpath, longtitle, fingerprint):
+        print("\t"+longtitle+".glb geometry unchanged, export skipped.\n")
+        print("Done.\n")
+        return
+    
+    export_glb(anchor, newpath+longtitle+".new.glb", optimize, merge_distance, direct) # next to the old one so it can be compared
+    replace_glb(manifest, newpath, longtitle, fingerprint)
+    write_manifest(newpath, manifest)
     
     print("Done.\n")
+
+def timed(timings, stage, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    timings[stage] = time.perf_counter()-start
+    return result
+
+def export_levels(context, levels):
+    # every level with one read and write of level-info.gc, game.gp and the config between them
+    # blender data is only touched here on the main thread. a level's file writing and .glb comparing go to
+    # worker threads while the next level is gathered and exported
+    
+    start = time.perf_counter()
+    print("\n   ---Beginning Export of "+str(len(levels))+" Levels---\n")
+    
+    levels_path = os.path.join(os.path.dirname(levels[0]["custom_levels_path"]), "")
+    gppath = os.path.join(os.path.dirname(os.path.dirname(levels[0]["custom_levels_path"])), "goal_src", "jak1", "")
+    gcpath = os.path.join(gppath, "engine", "level", "")
+    
+    for level in levels:
+        if not os.path.exists(level["newpath"]):
+            os.mkdir(level["newpath"])
+            print("\t"+level["longtitle"]+" directory created.")
+    save_custom_levels_path(levels_path)
+    
+    # the one project file holds every level, save it once instead of copying it into every level folder
+    if any([level["scene"].my_tool.should_export_level_info for level in levels]):
+        if bpy.data.filepath:
+            bpy.ops.wm.save_mainfile()
+        else:
+            bpy.ops.wm.save_as_mainfile(filepath=levels[0]["newpath"]+levels[0]["longtitle"]+'.blend')
+    
+    timings = {}
+    shared = [] # the levels with entries in level-info.gc and game.gp
+    window = context.window
+    original_scene = context.scene
+    
+    with ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1)) as pool:
+        jobs = []
+        try:
+            for level in levels:
+                scene = level["scene"]
+                mytool = scene.my_tool
+                longtitle = level["longtitle"]
+                newpath = level["newpath"]
+                stages = timings[longtitle] = {}
+                print("\nExporting "+longtitle+" from the scene "+scene.name+".\n")
+                
+                level["manifest"] = read_manifest(newpath)
+                level["templates"] = level_templates(level["nick"], longtitle, level["title"], mytool.spawn_location)
+                
+                if mytool.should_export_level_info or mytool.should_export_actor_info:
+                    if mytool.should_export_actor_info:
+                        print_actor_problems(timed(stages, "actor check", validate_actors, scene))
+                    jsonc = timed(stages, "actors", level_actor_blocks, scene, level["manifest"], newpath, longtitle, level["templates"], mytool.should_export_actor_info, mytool.auto_bsphere)
+                    if jsonc is not None:
+                        jsonc = (jsonc[0], list(jsonc[1])) # the next level reuses the actor table while this one is written on a worker
+                    jobs.append(pool.submit(timed, stages, "files", write_level_files, level["manifest"], newpath, longtitle, level["title"], level["templates"], jsonc, mytool.should_export_level_info))
+                    if mytool.should_export_level_info:
+                        shared.append(level)
+                
+                if mytool.should_export_geometry:
+                    if window is not None:
+                        window.scene = scene # the exporter works on the current scene
+                    options = (mytool.optimize_geometry, mytool.merge_distance, mytool.direct_glb)
+                    fingerprint = timed(stages, "fingerprint", geometry_fingerprint, scene, mytool.anchor, options)
+                    if glb_up_to_date(level["manifest"], newpath, longtitle, fingerprint):
+                        print("\t"+longtitle+".glb geometry unchanged, export skipped.")
+                    else:
+                        timed(stages, "glb export", export_glb, mytool.anchor, newpath+longtitle+".new.glb", *options)
+                        jobs.append(pool.submit(timed, stages, "glb compare", replace_glb, level["manifest"], newpath, longtitle, fingerprint))
+        finally:
+            if window is not None:
+                window.scene = original_scene
+        
+        # the shared files, while the last levels are still being written
+        if len(shared):
+            print("\nUpdating level-info.gc and game.gp.\n")
+            stages = timings["level-info.gc and game.gp"] = {}
+            timed(stages, "level-info.gc", patch_level_info, gcpath, shared)
+            timed(stages, "game.gp", patch_game_gp, gppath, shared, levels_path)
+        
+        for job in jobs:
+            job.result() # anything that went wrong on a worker is raised here
+    
+    for level in levels:
+        write_manifest(level["newpath"], level["manifest"])
+    
+    print("\n   ---Export Timings---\n")
+    for name, stages in timings.items():
+        print("\t"+name+": "+(", ".join([stage+" "+format(seconds, ".2f")+"s" for stage, seconds in stages.items()]) or "nothing exported"))
+    print("\tTotal: "+format(time.perf_counter()-start, ".2f")+"s\n")
         
 def playtest_level(longtitle,newpath):
         
@@ -806,7 +2544,7 @@ class OBJECT_PT_LevelInfoPanel(Panel):
         path = layout.row()
         if not mytool.custom_levels_path:
             path.alert = True
-        if not os.path.dirname(mytool.custom_levels_path)[-19:] == "\data\custom_levels":
+        if not custom_levels_path_ok(mytool.custom_levels_path):
             path.alert = True
             
         # set these properties manually
@@ -817,17 +2555,51 @@ class OBJECT_PT_LevelInfoPanel(Panel):
         trans.prop(bpy.context.scene.objects[mytool.anchor], "location", text = "Anchor Location*") # breaks when no anchor is selected
         #trans.prop(mytool, "level_rotation", text="Level Rotation*")
         anch.operator("wm.create_world_reference")
+        world = layout.row(align=True)
+        world.prop(mytool, "world_reference_mode", text="")
+        nearby = world.row(align=True)
+        nearby.active = mytool.world_reference_mode == 'NEARBY'
+        nearby.prop(mytool, "world_reference_center", text="")
+        nearby.prop(mytool, "world_reference_radius")
+        proxies = layout.row(align=True)
+        proxies.prop(mytool, "world_reference_merge")
+        proxies.prop(mytool, "world_reference_proxies")
+        settings = proxies.row(align=True)
+        settings.active = mytool.world_reference_proxies
+        settings.prop(mytool, "world_reference_proxy_ratio")
+        settings.prop(mytool, "world_reference_display", text="")
         path.prop(mytool, "custom_levels_path")
         layout.prop(mytool, "should_export_level_info")
-        layout.prop(mytool, "should_export_actor_info", text="Actor Info*")
+        layout.prop(mytool, "should_export_actor_info")
         layout.prop(mytool, "should_export_geometry", )
+        optimize = layout.row()
+        optimize.active = mytool.should_export_geometry
+        optimize.prop(mytool, "optimize_geometry")
+        optimize.prop(mytool, "merge_distance", text="Distance")
+        direct = layout.row()
+        direct.active = mytool.should_export_geometry
+        direct.prop(mytool, "direct_glb")
+        
+        # what the geometry will cost, worked out by a timer for what changed since the last time
+        budget = current_geometry_budget(scene)
+        if budget is not None:
+            box = layout.box()
+            draw_geometry_budget(box, mytool, budget)
+            limits = box.row(align=True)
+            limits.prop(mytool, "budget_glb_size", text="MB")
+            limits.prop(mytool, "budget_triangles", text="Tris")
+            limits.prop(mytool, "budget_texture_memory", text="Tex MB")
+        
         layout.prop(mytool, "should_playtest_level")
         layout.operator("wm.export")
+        export_all = layout.row()
+        export_all.prop(mytool, "include_in_export_all", text="")
+        export_all.operator("wm.export_all")
         layout.label(text="Options with * do not currently export/function.", icon="ERROR")
         layout.separator()
         
 class OBJECT_PT_ActorInfoPanel(Panel):
-    bl_label = "Actor Info*"
+    bl_label = "Actor Info"
     bl_idname = "OBJECT_PT_actor_info_panel"
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
@@ -843,7 +2615,7 @@ class OBJECT_PT_ActorInfoPanel(Panel):
         scene = context.scene
         mytool = scene.my_tool
         
-        if (bpy.context.object.data is not None) and ("Game Task" in bpy.context.object.data.keys()): # only check for custom properties on actors, not other objects
+        if "Game Task" in context.active_object.keys(): # only check for custom properties on actors, not other objects
             layout.prop(context.active_object, "name", text = "Actor Name")
             layout.prop(mytool, "actor_type") # dummy
             layout.prop(context.active_object, "type")
@@ -853,13 +2625,36 @@ class OBJECT_PT_ActorInfoPanel(Panel):
             layout.prop(context.active_object, "rotation_quaternion", text = "Actor Rotation") # this won't display properly unless the object is in quaternion mode, so I force all actors into quat mode when added
         
             # set these properties manually in the panel
-            layout.prop(bpy.data.objects[bpy.context.object.data.name], '["Actor Type"]')
-            layout.prop(bpy.data.objects[bpy.context.object.data.name], '["Game Task"]')
-            layout.prop(bpy.data.objects[bpy.context.object.data.name], '["Bounding Sphere Radius"]')
+            layout.prop(context.active_object, '["Actor Type"]')
+            layout.prop(context.active_object, '["Game Task"]')
+            layout.prop(context.active_object, '["Bounding Sphere Radius"]')
+            layout.operator("object.relink_actor_meshes")
+            layout.operator("object.clean_actor_materials")
             #layout.operator("wm.print") # this is a debug button to print all the current actors and their attributes before exporting
         else:
             layout.label(text="Select an actor to see its properties.", icon="ERROR")
         
+        # results of the last actor check
+        check = layout.box()
+        check.operator("object.validate_actors")
+        if actor_problems["checked"]:
+            for key, text in (("coincident", " pairs on top of each other"), ("close", " pairs too close together"), ("far", " far from the level geometry")):
+                found = actor_problems[key]
+                check.label(text=str(len(found))+text, icon="ERROR" if found else "CHECKMARK")
+                for problem in found[:3]:
+                    check.label(text="    "+(problem if key == "far" else " / ".join(problem)))
+            if actor_problems["coincident"] or actor_problems["close"] or actor_problems["far"]:
+                check.operator("object.select_problem_actors")
+        check.prop(mytool, "actor_min_spacing")
+        check.prop(mytool, "actor_max_geometry_distance")
+        
+        layout.prop(mytool, "auto_bsphere")
+        layout.prop(mytool, "actor_display")
+        display = layout.column()
+        if mytool.actor_display == 'MESH':
+            display.active = False
+        display.prop(mytool, "actor_proxy_threshold")
+        display.prop(mytool, "actor_proxy_distance")
         layout.separator()
         
 # ------------------------------------------------------------------------
@@ -892,15 +2687,17 @@ class EDIT_PT_LevelInfoPanel(Panel):
         layout.prop(mytool, "level_rotation", text="Level Rotation*")
         layout.prop(mytool, "custom_levels_path")
         layout.prop(mytool, "should_export_level_info")
-        layout.prop(mytool, "should_export_actor_info", text="Actor Info*")
+        layout.prop(mytool, "should_export_actor_info")
         layout.prop(mytool, "should_export_geometry", )
         layout.prop(mytool, "should_playtest_level")
+        if world_reference_attribute in getattr(context.object.data, "attributes", ()):
+            layout.operator("wm.select_world_reference_pieces")
         layout.label(text="Switch to Object Mode to export.", icon="ERROR")
         layout.label(text="Options with * do not currently export.", icon="ERROR")
         layout.separator()
         
 class EDIT_PT_ActorInfoPanel(Panel):
-    bl_label = "Actor Info*"
+    bl_label = "Actor Info"
     bl_idname = "EDIT_PT_actor_info_panel"
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
@@ -916,7 +2713,7 @@ class EDIT_PT_ActorInfoPanel(Panel):
         scene = context.scene
         mytool = scene.my_tool
         
-        if "Game Task" in bpy.data.objects[bpy.context.object.data.name].keys(): # only check for custom properties on actors, not other objects
+        if "Game Task" in context.active_object.keys(): # only check for custom properties on actors, not other objects
             layout.prop(context.active_object, "name", text = "Actor Name")
             layout.prop(mytool, "actor_type") # dummy
             layout.prop(context.active_object, "type")
@@ -926,9 +2723,9 @@ class EDIT_PT_ActorInfoPanel(Panel):
             layout.prop(context.active_object, "rotation_quaternion", text = "Actor Rotation") # this won't display properly unless the object is in quaternion mode, so I force all actors into quat mode when added
         
             # set these properties manually in the panel
-            layout.prop(bpy.data.objects[bpy.context.object.data.name], '["Actor Type"]')
-            layout.prop(bpy.data.objects[bpy.context.object.data.name], '["Game Task"]')
-            layout.prop(bpy.data.objects[bpy.context.object.data.name], '["Bounding Sphere"]')
+            layout.prop(context.active_object, '["Actor Type"]')
+            layout.prop(context.active_object, '["Game Task"]')
+            layout.prop(context.active_object, '["Bounding Sphere"]')
             #layout.operator("wm.print") # this is a debug button to print all the current actors and their attributes before exporting
         else:
             layout.label(text="Select an actor to see its properties.", icon="ERROR")
@@ -936,7 +2733,7 @@ class EDIT_PT_ActorInfoPanel(Panel):
         layout.separator()
 
 # ------------------------------------------------------------------------
-#    New Mesh Initialization               # This will be cleaned up with the verts,edges,faces in a separate file for each actor model
+#    New Mesh Initialization               # actor models live in ./actors as packed binary files, see ObjectToActorModel.py
 # ------------------------------------------------------------------------       
 
 actor_types = [
@@ -948,389 +2745,405 @@ actor_types = [
                 ["Red Eco","redeco"],
             ]
 
-def add_object(self, context, actor_type):
+# actor model files: a header followed by the raw arrays, all little endian
+# header: magic "GACT", version, vertex count, edge count, loop count, polygon count
+# arrays: float32 vertex co[3*verts], int32 edge vertices[2*edges], int32 loop_start[polys], int32 loop_total[polys], int32 loop vertex_index[loops]
+actor_model_header = struct.Struct("<4sIIIII")
+actor_model_version = 1
 
-    verts = [
-        Vector((0.0849609375,0.0234375,0.06640625)),
-        Vector((0.1220703125,0.025390625,-0.064453125)),
-        Vector((0.12109375,0.025390625,0.068359375)),
-        Vector((0.1220703125,0.025390625,-0.064453125)),
-        Vector((0.1240234375,0.0537109375,0.068359375)),
-        Vector((0.1240234375,0.0537109375,-0.06640625)),
-        Vector((0.08984375,0.052734375,0.099609375)),
-        Vector((-0.0888671875,0.0537109375,0.1005859375)),
-        Vector((0.0869140625,0.0244140625,0.1015625)),
-        Vector((-0.0859375,0.0244140625,0.1005859375)),
-        Vector((0.087890625,0.17578125,0.0947265625)),
-        Vector((-0.087890625,0.17578125,0.0947265625)),
-        Vector((0.087890625,0.14453125,0.09375)),
-        Vector((-0.087890625,0.14453125,0.09375)),
-        Vector((0.087890625,0.140625,-0.0966796875)),
-        Vector((-0.0869140625,0.14453125,-0.0966796875)),
-        Vector((0.0869140625,0.1796875,-0.09765625)),
-        Vector((-0.0869140625,0.177734375,-0.09765625)),
-        Vector((0.0869140625,0.0244140625,-0.099609375)),
-        Vector((-0.091796875,0.0234375,-0.1044921875)),
-        Vector((0.08984375,0.052734375,-0.0986328125)),
-        Vector((-0.0947265625,0.052734375,-0.103515625)),
-        Vector((0.0859375,0.0234375,-0.0634765625)),
-        Vector((-0.0908203125,0.0234375,-0.0673828125)),
-        Vector((0.0869140625,0.0244140625,-0.099609375)),
-        Vector((-0.091796875,0.0234375,-0.1044921875)),
-        Vector((0.0869140625,0.0244140625,0.1015625)),
-        Vector((-0.0859375,0.0244140625,0.1005859375)),
-        Vector((-0.083984375,0.0234375,0.0654296875)),
-        Vector((0.126953125,0.1787109375,-0.0634765625)),
-        Vector((0.126953125,0.14453125,-0.064453125)),
-        Vector((0.12109375,0.1787109375,0.0029296875)),
-        Vector((0.126953125,0.146484375,0.064453125)),
-        Vector((0.126953125,0.177734375,0.064453125)),
-        Vector((0.1279296875,0.1416015625,-0.103515625)),
-        Vector((0.125,0.0537109375,-0.099609375)),
-        Vector((0.125,0.0537109375,-0.099609375)),
-        Vector((0.126953125,0.14453125,-0.064453125)),
-        Vector((0.1279296875,0.1416015625,-0.103515625)),
-        Vector((0.126953125,0.0546875,0.103515625)),
-        Vector((0.1298828125,0.142578125,0.099609375)),
-        Vector((0.138671875,0.1474609375,-0.015625)),
-        Vector((0.1357421875,0.1552734375,-0.0146484375)),
-        Vector((0.1328125,0.1435546875,-0.0283203125)),
-        Vector((0.1220703125,0.1533203125,-0.0146484375)),
-        Vector((0.126953125,0.140625,-0.01953125)),
-        Vector((0.138671875,0.1474609375,0.0224609375)),
-        Vector((0.1328125,0.1435546875,0.0341796875)),
-        Vector((0.1357421875,0.1552734375,0.0205078125)),
-        Vector((0.126953125,0.140625,0.025390625)),
-        Vector((0.1220703125,0.1533203125,0.0205078125)),
-        Vector((0.0859375,0.0234375,-0.0634765625)),
-        Vector((0.12109375,0.025390625,0.068359375)),
-        Vector((-0.126953125,0.0,-0.1025390625)),
-        Vector((-0.125,0.0,-0.0693359375)),
-        Vector((-0.1279296875,0.142578125,-0.103515625)),
-        Vector((-0.130859375,0.052734375,-0.1044921875)),
-        Vector((-0.1298828125,0.0537109375,-0.0703125)),
-        Vector((-0.126953125,0.142578125,-0.0654296875)),
-        Vector((-0.130859375,0.052734375,-0.1044921875)),
-        Vector((-0.1279296875,0.142578125,-0.103515625)),
-        Vector((-0.1279296875,0.0244140625,-0.0703125)),
-        Vector((-0.125,0.0,-0.0693359375)),
-        Vector((-0.0908203125,0.0234375,-0.0673828125)),
-        Vector((-0.0947265625,0.0,-0.0703125)),
-        Vector((-0.0908203125,0.0234375,-0.0673828125)),
-        Vector((-0.0947265625,0.0,-0.0703125)),
-        Vector((-0.091796875,0.0234375,-0.1044921875)),
-        Vector((-0.0947265625,0.0,-0.1025390625)),
-        Vector((-0.1318359375,0.1103515625,-0.0224609375)),
-        Vector((-0.126953125,0.140625,-0.01953125)),
-        Vector((-0.146484375,0.111328125,-0.021484375)),
-        Vector((-0.138671875,0.1474609375,-0.015625)),
-        Vector((-0.140625,0.1103515625,-0.0341796875)),
-        Vector((-0.1328125,0.1435546875,-0.0283203125)),
-        Vector((-0.1318359375,0.1103515625,-0.0224609375)),
-        Vector((-0.126953125,0.140625,-0.01953125)),
-        Vector((-0.146484375,0.111328125,-0.021484375)),
-        Vector((-0.14453125,0.0986328125,-0.0224609375)),
-        Vector((-0.140625,0.1103515625,-0.0341796875)),
-        Vector((-0.1337890625,0.1005859375,-0.0224609375)),
-        Vector((-0.1318359375,0.1103515625,-0.0224609375)),
-        Vector((-0.138671875,0.1474609375,-0.015625)),
-        Vector((-0.1328125,0.1435546875,-0.0283203125)),
-        Vector((-0.1357421875,0.1552734375,-0.0146484375)),
-        Vector((-0.126953125,0.140625,-0.01953125)),
-        Vector((-0.1220703125,0.1533203125,-0.0146484375)),
-        Vector((-0.126953125,0.140625,0.025390625)),
-        Vector((-0.1318359375,0.1103515625,0.0283203125)),
-        Vector((-0.138671875,0.1474609375,0.0224609375)),
-        Vector((-0.1455078125,0.1103515625,0.03125)),
-        Vector((-0.1328125,0.1435546875,0.0341796875)),
-        Vector((-0.140625,0.1103515625,0.041015625)),
-        Vector((-0.126953125,0.140625,0.025390625)),
-        Vector((-0.1318359375,0.1103515625,0.0283203125)),
-        Vector((-0.1455078125,0.1103515625,0.03125)),
-        Vector((-0.14453125,0.0986328125,0.0283203125)),
-        Vector((-0.140625,0.1103515625,0.041015625)),
-        Vector((-0.1337890625,0.1005859375,0.0283203125)),
-        Vector((-0.1318359375,0.1103515625,0.0283203125)),
-        Vector((-0.138671875,0.1474609375,0.0224609375)),
-        Vector((-0.1357421875,0.1552734375,0.0205078125)),
-        Vector((-0.1328125,0.1435546875,0.0341796875)),
-        Vector((-0.1220703125,0.1533203125,0.0205078125)),
-        Vector((-0.126953125,0.140625,0.025390625)),
-        Vector((-0.0947265625,0.0,-0.1025390625)),
-        Vector((-0.0947265625,0.0,-0.0703125)),
-        Vector((0.0859375,0.0,0.099609375)),
-        Vector((0.119140625,0.0,0.099609375)),
-        Vector((0.08984375,0.052734375,0.099609375)),
-        Vector((0.126953125,0.0546875,0.103515625)),
-        Vector((0.087890625,0.14453125,0.09375)),
-        Vector((0.1298828125,0.142578125,0.099609375)),
-        Vector((0.0849609375,0.0234375,0.06640625)),
-        Vector((0.12109375,0.025390625,0.068359375)),
-        Vector((0.0849609375,0.0,0.068359375)),
-        Vector((0.1171875,0.0,0.068359375)),
-        Vector((0.0869140625,0.0244140625,0.1015625)),
-        Vector((0.0849609375,0.0234375,0.06640625)),
-        Vector((0.0859375,0.0,0.099609375)),
-        Vector((0.0849609375,0.0,0.068359375)),
-        Vector((-0.0859375,0.0244140625,0.1005859375)),
-        Vector((-0.08203125,0.0,0.1005859375)),
-        Vector((-0.083984375,0.0234375,0.0654296875)),
-        Vector((-0.0810546875,0.0,0.06640625)),
-        Vector((0.12109375,0.025390625,0.068359375)),
-        Vector((0.1240234375,0.0244140625,0.1025390625)),
-        Vector((0.1171875,0.0,0.068359375)),
-        Vector((0.119140625,0.0,0.099609375)),
-        Vector((0.146484375,0.111328125,-0.021484375)),
-        Vector((0.138671875,0.1474609375,-0.015625)),
-        Vector((0.1318359375,0.1103515625,-0.0224609375)),
-        Vector((0.126953125,0.140625,-0.01953125)),
-        Vector((0.140625,0.1103515625,-0.0341796875)),
-        Vector((0.1328125,0.1435546875,-0.0283203125)),
-        Vector((0.146484375,0.111328125,-0.021484375)),
-        Vector((0.138671875,0.1474609375,-0.015625)),
-        Vector((0.146484375,0.111328125,-0.021484375)),
-        Vector((0.14453125,0.0986328125,-0.0224609375)),
-        Vector((0.140625,0.1103515625,-0.0341796875)),
-        Vector((0.1337890625,0.1005859375,-0.0224609375)),
-        Vector((0.1318359375,0.1103515625,-0.0224609375)),
-        Vector((0.138671875,0.1474609375,0.0224609375)),
-        Vector((0.1455078125,0.1103515625,0.03125)),
-        Vector((0.126953125,0.140625,0.025390625)),
-        Vector((0.1318359375,0.1103515625,0.0283203125)),
-        Vector((0.1328125,0.1435546875,0.0341796875)),
-        Vector((0.140625,0.1103515625,0.041015625)),
-        Vector((0.138671875,0.1474609375,0.0224609375)),
-        Vector((0.1455078125,0.1103515625,0.03125)),
-        Vector((0.1455078125,0.1103515625,0.03125)),
-        Vector((0.14453125,0.0986328125,0.0283203125)),
-        Vector((0.140625,0.1103515625,0.041015625)),
-        Vector((0.1337890625,0.1005859375,0.0283203125)),
-        Vector((0.1318359375,0.1103515625,0.0283203125)),
-        Vector((0.126953125,0.0546875,0.103515625)),
-        Vector((0.1240234375,0.0537109375,0.068359375)),
-        Vector((0.0849609375,0.0,0.068359375)),
-        Vector((0.1171875,0.0,0.068359375)),
-        Vector((0.12890625,0.1767578125,0.099609375)),
-        Vector((0.0869140625,0.1796875,-0.09765625)),
-        Vector((0.126953125,0.1787109375,-0.1015625)),
-        Vector((0.087890625,0.140625,-0.0966796875)),
-        Vector((0.1279296875,0.1416015625,-0.103515625)),
-        Vector((0.126953125,0.14453125,-0.064453125)),
-        Vector((0.1279296875,0.1416015625,-0.103515625)),
-        Vector((0.126953125,0.1787109375,-0.0634765625)),
-        Vector((0.126953125,0.1787109375,-0.1015625)),
-        Vector((0.1298828125,0.142578125,0.099609375)),
-        Vector((0.126953125,0.146484375,0.064453125)),
-        Vector((0.12890625,0.1767578125,0.099609375)),
-        Vector((0.126953125,0.177734375,0.064453125)),
-        Vector((0.0869140625,0.0244140625,0.1015625)),
-        Vector((0.1240234375,0.0244140625,0.1025390625)),
-        Vector((0.126953125,0.0546875,0.103515625)),
-        Vector((0.08984375,0.052734375,-0.0986328125)),
-        Vector((0.125,0.0537109375,-0.099609375)),
-        Vector((0.0869140625,0.0244140625,-0.099609375)),
-        Vector((0.123046875,0.0244140625,-0.099609375)),
-        Vector((0.1220703125,0.025390625,-0.064453125)),
-        Vector((0.123046875,0.0244140625,-0.099609375)),
-        Vector((0.1240234375,0.0537109375,-0.06640625)),
-        Vector((0.125,0.0537109375,-0.099609375)),
-        Vector((0.0869140625,0.0,-0.09765625)),
-        Vector((0.1181640625,0.0,-0.09765625)),
-        Vector((0.0859375,0.0,-0.0654296875)),
-        Vector((0.1162109375,0.0,-0.0654296875)),
-        Vector((0.0869140625,0.0,-0.09765625)),
-        Vector((0.1181640625,0.0,-0.09765625)),
-        Vector((0.1181640625,0.0,-0.09765625)),
-        Vector((0.1162109375,0.0,-0.0654296875)),
-        Vector((0.1220703125,0.025390625,-0.064453125)),
-        Vector((0.0859375,0.0234375,-0.0634765625)),
-        Vector((0.1162109375,0.0,-0.0654296875)),
-        Vector((0.0859375,0.0,-0.0654296875)),
-        Vector((0.0859375,0.0234375,-0.0634765625)),
-        Vector((0.0869140625,0.0244140625,-0.099609375)),
-        Vector((0.0859375,0.0,-0.0654296875)),
-        Vector((0.0869140625,0.0,-0.09765625)),
-        Vector((0.119140625,0.0,0.099609375)),
-        Vector((0.0859375,0.0,0.099609375)),
-        Vector((-0.0810546875,0.0,0.06640625)),
-        Vector((-0.08203125,0.0,0.1005859375)),
-        Vector((-0.1162109375,0.0,0.06640625)),
-        Vector((-0.1181640625,0.0,0.1005859375)),
-        Vector((0.123046875,0.212890625,-0.0908203125)),
-        Vector((0.126953125,0.1787109375,-0.1015625)),
-        Vector((0.0869140625,0.1796875,-0.09765625)),
-        Vector((0.1240234375,0.208984375,0.08984375)),
-        Vector((0.087890625,0.17578125,0.0947265625)),
-        Vector((0.087890625,0.14453125,0.09375)),
-        Vector((0.087890625,0.17578125,0.0947265625)),
-        Vector((-0.126953125,0.142578125,-0.0654296875)),
-        Vector((-0.126953125,0.1796875,-0.1025390625)),
-        Vector((-0.1279296875,0.0244140625,-0.0703125)),
-        Vector((-0.1220703125,0.0244140625,0.0673828125)),
-        Vector((-0.1298828125,0.0537109375,-0.0703125)),
-        Vector((-0.1240234375,0.0546875,0.068359375)),
-        Vector((-0.126953125,0.177734375,0.064453125)),
-        Vector((-0.126953125,0.146484375,0.064453125)),
-        Vector((-0.12109375,0.1787109375,0.0029296875)),
-        Vector((-0.126953125,0.1787109375,-0.0634765625)),
-        Vector((-0.083984375,0.0234375,0.0654296875)),
-        Vector((-0.1220703125,0.0244140625,0.0673828125)),
-        Vector((-0.0908203125,0.0234375,-0.0673828125)),
-        Vector((-0.1279296875,0.0244140625,-0.0703125)),
-        Vector((0.0849609375,0.0234375,0.06640625)),
-        Vector((0.0859375,0.0234375,-0.0634765625)),
-        Vector((0.08984375,0.052734375,-0.0986328125)),
-        Vector((-0.0947265625,0.052734375,-0.103515625)),
-        Vector((0.087890625,0.140625,-0.0966796875)),
-        Vector((-0.0869140625,0.14453125,-0.0966796875)),
-        Vector((-0.1240234375,0.0546875,0.068359375)),
-        Vector((-0.126953125,0.142578125,-0.0654296875)),
-        Vector((-0.126953125,0.146484375,0.064453125)),
-        Vector((0.087890625,0.14453125,0.09375)),
-        Vector((-0.087890625,0.14453125,0.09375)),
-        Vector((0.08984375,0.052734375,0.099609375)),
-        Vector((-0.0888671875,0.0537109375,0.1005859375)),
-        Vector((-0.123046875,0.212890625,-0.0908203125)),
-        Vector((-0.0869140625,0.177734375,-0.09765625)),
-        Vector((-0.126953125,0.1796875,-0.1025390625)),
-        Vector((-0.12890625,0.1767578125,0.099609375)),
-        Vector((-0.087890625,0.17578125,0.0947265625)),
-        Vector((-0.1240234375,0.208984375,0.08984375)),
-        Vector((-0.126953125,0.1796875,-0.1025390625)),
-        Vector((-0.126953125,0.1787109375,-0.0634765625)),
-        Vector((-0.123046875,0.212890625,-0.0908203125)),
-        Vector((-0.12109375,0.1787109375,0.0029296875)),
-        Vector((-0.1220703125,0.2373046875,-0.068359375)),
-        Vector((-0.12109375,0.251953125,-0.03515625)),
-        Vector((-0.12109375,0.2568359375,0.0029296875)),
-        Vector((-0.12109375,0.25,0.0390625)),
-        Vector((-0.1220703125,0.234375,0.0703125)),
-        Vector((-0.1240234375,0.208984375,0.08984375)),
-        Vector((-0.126953125,0.177734375,0.064453125)),
-        Vector((-0.12890625,0.1767578125,0.099609375)),
-        Vector((-0.126953125,0.1787109375,-0.0634765625)),
-        Vector((-0.1279296875,0.142578125,-0.103515625)),
-        Vector((0.1240234375,0.0537109375,0.068359375)),
-        Vector((0.126953125,0.146484375,0.064453125)),
-        Vector((0.12890625,0.1767578125,0.099609375)),
-        Vector((0.126953125,0.177734375,0.064453125)),
-        Vector((0.1240234375,0.208984375,0.08984375)),
-        Vector((0.12109375,0.1787109375,0.0029296875)),
-        Vector((0.1220703125,0.234375,0.0703125)),
-        Vector((0.12109375,0.25,0.0390625)),
-        Vector((0.12109375,0.2568359375,0.0029296875)),
-        Vector((0.12109375,0.251953125,-0.03515625)),
-        Vector((0.1220703125,0.2373046875,-0.068359375)),
-        Vector((0.123046875,0.212890625,-0.0908203125)),
-        Vector((0.126953125,0.1787109375,-0.0634765625)),
-        Vector((0.126953125,0.1787109375,-0.1015625)),
-        Vector((0.1318359375,0.1103515625,-0.0224609375)),
-        Vector((0.1318359375,0.1103515625,0.0283203125)),
-        Vector((0.146484375,0.111328125,-0.021484375)),
-        Vector((0.1455078125,0.1103515625,0.03125)),
-        Vector((0.14453125,0.0986328125,-0.0224609375)),
-        Vector((0.14453125,0.0986328125,0.0283203125)),
-        Vector((0.1337890625,0.1005859375,-0.0224609375)),
-        Vector((0.1337890625,0.1005859375,0.0283203125)),
-        Vector((0.138671875,0.1474609375,-0.015625)),
-        Vector((0.138671875,0.1474609375,0.0224609375)),
-        Vector((0.126953125,0.140625,-0.01953125)),
-        Vector((0.126953125,0.140625,0.025390625)),
-        Vector((0.1220703125,0.1533203125,-0.0146484375)),
-        Vector((0.1220703125,0.1533203125,0.0205078125)),
-        Vector((0.1357421875,0.1552734375,-0.0146484375)),
-        Vector((0.1357421875,0.1552734375,0.0205078125)),
-        Vector((0.1240234375,0.0537109375,-0.06640625)),
-        Vector((0.126953125,0.14453125,-0.064453125)),
-        Vector((-0.1298828125,0.1416015625,0.099609375)),
-        Vector((-0.12890625,0.1767578125,0.099609375)),
-        Vector((-0.1298828125,0.1416015625,0.099609375)),
-        Vector((-0.12890625,0.1767578125,0.099609375)),
-        Vector((-0.126953125,0.146484375,0.064453125)),
-        Vector((-0.126953125,0.177734375,0.064453125)),
-        Vector((-0.0859375,0.0244140625,0.1005859375)),
-        Vector((-0.0888671875,0.0537109375,0.1005859375)),
-        Vector((-0.125,0.0234375,0.103515625)),
-        Vector((-0.1279296875,0.0546875,0.103515625)),
-        Vector((-0.0947265625,0.052734375,-0.103515625)),
-        Vector((-0.091796875,0.0234375,-0.1044921875)),
-        Vector((-0.130859375,0.052734375,-0.1044921875)),
-        Vector((-0.12890625,0.0244140625,-0.103515625)),
-        Vector((-0.125,0.0234375,0.103515625)),
-        Vector((-0.1279296875,0.0546875,0.103515625)),
-        Vector((-0.1220703125,0.0244140625,0.0673828125)),
-        Vector((-0.1240234375,0.0546875,0.068359375)),
-        Vector((-0.1279296875,0.0546875,0.103515625)),
-        Vector((-0.126953125,0.146484375,0.064453125)),
-        Vector((-0.0888671875,0.0537109375,0.1005859375)),
-        Vector((-0.1298828125,0.1416015625,0.099609375)),
-        Vector((-0.0947265625,0.0,-0.1025390625)),
-        Vector((-0.126953125,0.0,-0.1025390625)),
-        Vector((-0.1162109375,0.0,0.06640625)),
-        Vector((-0.1181640625,0.0,0.1005859375)),
-        Vector((-0.1181640625,0.0,0.1005859375)),
-        Vector((-0.08203125,0.0,0.1005859375)),
-        Vector((-0.146484375,0.111328125,-0.021484375)),
-        Vector((-0.1455078125,0.1103515625,0.03125)),
-        Vector((-0.1318359375,0.1103515625,-0.0224609375)),
-        Vector((-0.1318359375,0.1103515625,0.0283203125)),
-        Vector((-0.1337890625,0.1005859375,-0.0224609375)),
-        Vector((-0.1337890625,0.1005859375,0.0283203125)),
-        Vector((-0.14453125,0.0986328125,-0.0224609375)),
-        Vector((-0.14453125,0.0986328125,0.0283203125)),
-        Vector((-0.126953125,0.140625,-0.01953125)),
-        Vector((-0.126953125,0.140625,0.025390625)),
-        Vector((-0.138671875,0.1474609375,-0.015625)),
-        Vector((-0.138671875,0.1474609375,0.0224609375)),
-        Vector((-0.1357421875,0.1552734375,-0.0146484375)),
-        Vector((-0.1357421875,0.1552734375,0.0205078125)),
-        Vector((-0.1220703125,0.1533203125,-0.0146484375)),
-        Vector((-0.1220703125,0.1533203125,0.0205078125)),
-        Vector((-0.087890625,0.14453125,0.09375)),
-        Vector((-0.087890625,0.17578125,0.0947265625)),
-        Vector((-0.126953125,0.1796875,-0.1025390625)),
-        Vector((-0.1279296875,0.142578125,-0.103515625)),
-        Vector((-0.1279296875,0.0244140625,-0.0703125)),
-        Vector((-0.1298828125,0.0537109375,-0.0703125)),
-        Vector((-0.12890625,0.0244140625,-0.103515625)),
-        Vector((-0.130859375,0.052734375,-0.1044921875)),
-        Vector((-0.126953125,0.0,-0.1025390625)),
-        Vector((-0.125,0.0,-0.0693359375)),
-        Vector((-0.083984375,0.0234375,0.0654296875)),
-        Vector((-0.0810546875,0.0,0.06640625)),
-        Vector((-0.1220703125,0.0244140625,0.0673828125)),
-        Vector((-0.1162109375,0.0,0.06640625)),
-        Vector((-0.0869140625,0.177734375,-0.09765625)),
-        Vector((-0.0869140625,0.14453125,-0.0966796875)),
-        Vector((-0.1220703125,0.2373046875,-0.068359375)),
-        Vector((0.1220703125,0.2373046875,-0.068359375)),
-        Vector((-0.123046875,0.212890625,-0.0908203125)),
-        Vector((0.123046875,0.212890625,-0.0908203125)),
-        Vector((-0.1240234375,0.208984375,0.08984375)),
-        Vector((0.1240234375,0.208984375,0.08984375)),
-        Vector((-0.1220703125,0.234375,0.0703125)),
-        Vector((0.1220703125,0.234375,0.0703125)),
-        Vector((-0.12109375,0.25,0.0390625)),
-        Vector((0.12109375,0.25,0.0390625)),
-        Vector((0.12109375,0.251953125,-0.03515625)),
-        Vector((-0.12109375,0.251953125,-0.03515625)),
-        Vector((0.12109375,0.2568359375,0.0029296875)),
-        Vector((-0.12109375,0.2568359375,0.0029296875)),
-        Vector((0.12109375,0.25,0.0390625)),
-        Vector((-0.12109375,0.25,0.0390625)),
-        Vector((-0.12109375,0.251953125,-0.03515625)),
-        Vector((0.12109375,0.251953125,-0.03515625)),
-        ]
+def actor_model_path(actor_type):
+    actors_dir = os.path.join(os.path.dirname(__file__), "actors")
+    path = os.path.join(actors_dir, actor_type+".bin")
+    if not os.path.exists(path):
+        path = os.path.join(actors_dir, "actor.bin") # every type without its own model uses the generic one
+    return path
+
+def read_actor_model(filepath):
+    
+    # read the whole file into one writable buffer, the arrays below are views into it rather than copies
+    data = bytearray(os.path.getsize(filepath))
+    with open(filepath, "rb") as f:
+        f.readinto(data)
+        
+    magic, version, vertex_count, edge_count, loop_count, polygon_count = actor_model_header.unpack_from(data)
+    if magic != b"GACT" or version != actor_model_version:
+        raise ValueError(filepath+" is not a version "+str(actor_model_version)+" actor model")
+    
+    arrays = []
+    offset = actor_model_header.size
+    for dtype, count in (("<f4", vertex_count*3), ("<i4", edge_count*2), ("<i4", polygon_count), ("<i4", polygon_count), ("<i4", loop_count)):
+        arrays.append(numpy.frombuffer(data, dtype, count, offset))
+        offset += count*4
+    return arrays
 
-    edges = [[257,258],[8,9],[265,266],[16,17],[273,274],[273,275],[273,279],[273,280],[24,25],[0,26],[0,27],[0,28],[281,287],[281,288],[32,33],[289,290],[179,181],[32,40],[297,298],[297,299],[48,49],[48,50],[0,51],[0,52],[274,276],[313,314],[305,315],[305,316],[297,317],[297,318],[321,322],[321,323],[358,360],[72,73],[72,74],[329,331],[80,81],[337,338],[320,322],[88,89],[88,90],[345,347],[337,349],[337,350],[96,97],[96,98],[282,284],[361,362],[361,363],[359,360],[144,145],[144,146],[152,153],[152,154],[112,159],[160,161],[160,162],[168,169],[168,170],[176,177],[176,178],[42,44],[184,185],[184,186],[73,74],[192,193],[192,194],[208,209],[112,210],[112,211],[216,217],[224,225],[224,227],[216,232],[216,233],[232,234],[240,241],[208,244],[353,354],[248,249],[248,250],[248,251],[248,252],[248,253],[248,254],[248,255],[264,265],[264,266],[264,267],[264,268],[264,269],[264,270],[264,271],[39,40],[357,358],[41,42],[41,43],[49,50],[1,51],[1,52],[43,44],[304,313],[57,58],[57,59],[320,321],[65,66],[65,67],[320,326],[281,283],[328,329],[328,330],[73,75],[328,334],[312,335],[89,90],[89,91],[352,353],[97,98],[97,99],[105,106],[352,368],[113,114],[113,115],[121,122],[121,123],[129,130],[129,131],[137,138],[137,139],[145,146],[145,147],[153,154],[70,72],[51,52],[161,162],[161,163],[169,170],[169,171],[177,178],[185,186],[177,187],[193,194],[201,202],[201,203],[233,234],[341,342],[209,243],[209,244],[352,354],[249,250],[78,79],[2,3],[2,4],[10,11],[10,12],[18,19],[18,20],[275,277],[26,27],[283,284],[283,285],[259,289],[259,290],[34,35],[291,292],[259,260],[42,43],[299,300],[307,308],[303,304],[58,59],[315,316],[299,317],[66,67],[323,324],[323,325],[74,75],[74,76],[331,333],[291,335],[291,336],[82,83],[82,84],[339,341],[339,343],[339,344],[90,91],[90,92],[98,99],[355,356],[355,357],[363,364],[363,365],[67,68],[114,115],[114,116],[122,123],[122,124],[29,30],[305,307],[130,131],[130,132],[138,139],[138,140],[267,268],[146,147],[146,148],[162,163],[170,171],[178,187],[178,188],[202,203],[202,204],[210,211],[75,76],[331,332],[218,219],[218,220],[226,227],[242,243],[242,244],[275,276],[250,251],[3,4],[3,5],[266,267],[11,12],[11,13],[212,221],[274,275],[66,68],[19,21],[274,280],[282,283],[27,28],[351,367],[282,288],[351,368],[298,299],[298,300],[43,45],[306,307],[306,308],[59,60],[322,323],[322,324],[330,331],[330,332],[83,84],[83,85],[346,347],[91,92],[91,93],[302,304],[7,8],[362,363],[107,108],[338,350],[115,116],[123,124],[300,311],[300,312],[131,132],[131,133],[139,140],[139,141],[147,148],[147,149],[155,156],[107,157],[107,158],[367,368],[346,348],[179,180],[329,330],[308,310],[187,188],[179,189],[179,190],[195,196],[195,197],[270,272],[203,204],[232,233],[219,220],[235,236],[235,237],[335,336],[243,244],[349,350],[300,335],[251,252],[213,257],[213,258],[4,5],[261,262],[261,263],[12,13],[269,270],[20,21],[277,278],[277,279],[285,286],[285,287],[4,32],[20,34],[20,35],[36,37],[36,38],[4,39],[4,40],[44,45],[301,302],[301,303],[23,24],[293,308],[293,309],[293,310],[317,318],[325,326],[333,334],[84,85],[84,86],[341,343],[92,93],[92,94],[100,101],[100,102],[357,359],[365,366],[362,364],[132,133],[132,134],[69,70],[140,141],[148,149],[286,288],[108,158],[164,165],[164,166],[172,173],[180,181],[180,182],[305,306],[180,189],[196,197],[196,198],[172,199],[172,200],[212,219],[212,220],[220,221],[228,229],[228,230],[236,237],[236,238],[332,334],[252,253],[58,60],[212,257],[212,258],[268,269],[276,277],[276,278],[284,285],[284,286],[29,31],[260,290],[5,36],[5,37],[37,38],[308,309],[53,54],[21,55],[21,56],[61,62],[61,63],[324,325],[324,326],[69,71],[332,333],[77,78],[77,79],[292,336],[340,341],[85,86],[340,342],[93,94],[356,357],[101,102],[101,103],[53,105],[53,106],[364,365],[109,110],[109,111],[117,118],[117,119],[125,126],[125,127],[133,134],[133,135],[125,155],[125,156],[157,158],[165,166],[165,167],[109,172],[109,173],[173,174],[181,182],[189,190],[197,198],[173,199],[205,206],[205,207],[293,294],[293,295],[229,230],[229,231],[237,238],[205,239],[245,246],[245,247],[253,254],[255,256],[6,7],[6,8],[263,265],[14,15],[14,16],[14,20],[22,23],[22,24],[30,31],[30,32],[14,34],[295,296],[356,358],[46,47],[46,48],[339,340],[62,63],[62,64],[319,321],[319,325],[319,326],[70,71],[327,328],[327,329],[327,333],[327,334],[311,335],[78,80],[343,344],[263,264],[351,352],[351,353],[102,103],[102,104],[54,106],[110,111],[110,112],[118,119],[118,120],[126,127],[126,128],[134,135],[134,136],[142,143],[142,144],[364,366],[281,282],[150,151],[150,152],[126,155],[347,348],[166,167],[271,272],[206,207],[214,215],[214,216],[222,223],[222,224],[222,226],[222,227],[230,231],[345,346],[246,247],[246,248],[254,255],[254,256],[262,263],[262,264],[7,9],[270,271],[15,16],[15,17],[15,21],[278,279],[278,280],[23,25],[286,287],[31,32],[31,33],[207,240],[294,295],[294,296],[279,280],[302,303],[47,48],[47,49],[15,55],[55,56],[302,313],[63,64],[71,72],[71,73],[79,80],[79,81],[87,88],[87,89],[95,96],[95,97],[358,359],[103,104],[111,112],[119,120],[127,128],[135,136],[319,320],[143,144],[143,145],[287,288],[151,152],[151,153],[304,314],[175,176],[175,177],[183,184],[183,185],[191,192],[191,193],[199,200],[159,208],[159,209],[159,211],[109,174],[215,216],[215,217],[223,224],[223,225],[307,315],[207,239],[239,240],[239,241],[247,248],[247,249],[19,20]]
+def write_actor_model(mesh, filepath):
+    
+    co = numpy.empty(len(mesh.vertices)*3, "<f4")
+    edges = numpy.empty(len(mesh.edges)*2, "<i4")
+    loop_starts = numpy.empty(len(mesh.polygons), "<i4")
+    loop_totals = numpy.empty(len(mesh.polygons), "<i4")
+    loop_vertices = numpy.empty(len(mesh.loops), "<i4")
+    mesh.vertices.foreach_get("co", co)
+    mesh.edges.foreach_get("vertices", edges)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    
+    with open(filepath, "wb") as f:
+        f.write(actor_model_header.pack(b"GACT", actor_model_version, len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons)))
+        for data in (co, edges, loop_starts, loop_totals, loop_vertices):
+            f.write(data.tobytes())
 
-    faces = [[0,51,52],[51,52,1],[2,3,4],[3,4,5],[6,7,8],[7,8,9],[10,11,12],[11,12,13],[14,15,16],[15,16,17],[18,19,20],[19,20,21],[22,23,24],[23,24,25],[27,0,26],[27,0,28],[29,30,31],[30,31,32],[31,32,33],[14,34,20],[34,20,35],[5,36,37],[36,37,38],[39,4,40],[4,40,32],[41,42,43],[42,43,44],[43,44,45],[46,47,48],[47,48,49],[48,49,50],[105,106,53],[106,53,54],[15,21,55],[21,55,56],[57,58,59],[58,59,60],[61,62,63],[62,63,64],[65,66,67],[66,67,68],[69,70,71],[70,71,72],[71,72,73],[72,73,74],[73,74,75],[74,75,76],[77,78,79],[78,79,80],[79,80,81],[82,83,84],[83,84,85],[84,85,86],[87,88,89],[88,89,90],[89,90,91],[90,91,92],[91,92,93],[92,93,94],[95,96,97],[96,97,98],[97,98,99],[100,101,102],[101,102,103],[102,103,104],[157,158,107],[158,107,108],[109,110,111],[110,111,112],[113,114,115],[114,115,116],[117,118,119],[118,119,120],[121,122,123],[122,123,124],[125,126,127],[126,127,128],[129,130,131],[130,131,132],[131,132,133],[132,133,134],[133,134,135],[134,135,136],[137,138,139],[138,139,140],[139,140,141],[142,143,144],[143,144,145],[144,145,146],[145,146,147],[146,147,148],[147,148,149],[150,151,152],[151,152,153],[152,153,154],[126,125,155],[125,155,156],[210,112,211],[112,211,159],[160,161,162],[161,162,163],[164,165,166],[165,166,167],[168,169,170],[169,170,171],[172,173,109],[173,109,174],[175,176,177],[176,177,178],[179,180,181],[180,181,182],[183,184,185],[184,185,186],[177,178,187],[178,187,188],[180,179,189],[179,189,190],[191,192,193],[192,193,194],[195,196,197],[196,197,198],[173,172,199],[172,199,200],[201,202,203],[202,203,204],[205,206,207],[159,208,209],[212,257,258],[257,258,213],[214,215,216],[215,216,217],[218,219,220],[219,220,212],[220,212,221],[222,223,224],[223,224,225],[226,222,227],[222,227,224],[228,229,230],[229,230,231],[216,232,233],[232,233,234],[235,236,237],[236,237,238],[205,207,239],[207,239,240],[239,240,241],[242,243,244],[243,244,209],[244,209,208],[245,246,247],[246,247,248],[247,248,249],[248,249,250],[250,251,248],[251,248,252],[248,252,253],[253,248,254],[248,254,255],[254,255,256],[289,290,259],[290,259,260],[261,262,263],[262,263,264],[263,264,265],[264,265,266],[266,267,264],[267,264,268],[264,268,269],[269,264,270],[264,270,271],[270,271,272],[273,274,275],[274,275,276],[275,276,277],[276,277,278],[277,278,279],[278,279,280],[279,280,273],[280,273,274],[281,282,283],[282,283,284],[283,284,285],[284,285,286],[285,286,287],[286,287,288],[287,288,281],[288,281,282],[335,336,291],[336,291,292],[293,294,295],[294,295,296],[297,298,299],[298,299,300],[301,302,303],[302,303,304],[305,306,307],[306,307,308],[309,293,308],[293,308,310],[311,335,300],[335,300,312],[302,313,304],[313,304,314],[307,315,305],[315,305,316],[299,317,297],[317,297,318],[319,320,321],[320,321,322],[321,322,323],[322,323,324],[323,324,325],[324,325,326],[325,326,319],[326,319,320],[327,328,329],[328,329,330],[329,330,331],[330,331,332],[331,332,333],[332,333,334],[333,334,327],[334,327,328],[349,350,337],[350,337,338],[339,340,341],[340,341,342],[341,343,339],[343,339,344],[345,346,347],[346,347,348],[367,368,351],[368,351,352],[351,352,353],[352,353,354],[355,356,357],[356,357,358],[357,358,359],[358,359,360],[361,362,363],[362,363,364],[363,364,365],[364,365,366]]
+def load_actor_model(filepath, name):
+    
+    co, edges, loop_starts, loop_totals, loop_vertices = read_actor_model(filepath)
+    return mesh_from_arrays(name, co, loop_starts, loop_totals, loop_vertices, edges)
 
-    mesh = bpy.data.meshes.new(name=actor_type)
-    mesh.from_pydata(verts, edges, faces)
+def mesh_from_arrays(name, co, loop_starts, loop_totals, loop_vertices, edges=()):
+    
+    # same layout from_pydata builds, but filled straight from the buffers
+    mesh = bpy.data.meshes.new(name=name)
+    mesh.vertices.add(len(co)//3)
+    mesh.edges.add(len(edges)//2)
+    mesh.loops.add(len(loop_vertices))
+    mesh.polygons.add(len(loop_starts))
+    mesh.vertices.foreach_set("co", co)
+    mesh.edges.foreach_set("vertices", edges)
+    mesh.loops.foreach_set("vertex_index", loop_vertices)
+    mesh.polygons.foreach_set("loop_start", loop_starts)
+    try:
+        mesh.polygons.foreach_set("loop_total", loop_totals)
+    except (AttributeError, TypeError):
+        pass # newer versions of blender derive it from loop_start and made it read only
+    mesh.update(calc_edges=True)
     # useful for development when the mesh may be invalid.
     # mesh.validate(verbose=True)
-    object_data_add(context, mesh, operator=self)
+    return mesh
+
+def new_actor_mesh(actor_type):
+    mesh = load_actor_model(actor_model_path(actor_type), actor_type)
+    mesh["Actor Mesh"] = actor_type # tag the mesh so it can be found again after a save and reload
+    mesh.materials.append(get_actor_material(actor_type))
+    return mesh
+
+# ------------------------------------------------------------------------
+#    Actor Mesh Cache
+# ------------------------------------------------------------------------
+
+# actor type -> name of the shared mesh, every actor of a type links to the same mesh instead of getting its own copy
+actor_meshes = {}
+
+def get_actor_mesh(actor_type):
+    
+    # try the cache first, the mesh may have been deleted or renamed since
+    mesh = bpy.data.meshes.get(actor_meshes.get(actor_type, ""))
+    if mesh is None or mesh.get("Actor Mesh") != actor_type:
+        # fall back to the tag, this finds the shared mesh in a freshly loaded file
+        mesh = next((m for m in bpy.data.meshes if m.get("Actor Mesh") == actor_type), None)
+        if mesh is None:
+            mesh = new_actor_mesh(actor_type) # build it once
+        actor_meshes[actor_type] = mesh.name
+    return mesh
+
+def add_object(self, context, actor_type):
+    return object_data_add(context, get_actor_mesh(actor_type), operator=self, name="Actor")
+
+def get_actor_collection():
+    if not 'actor_collection' in bpy.data.collections: # check if there is already a collection of actors
+        bpy.data.collections.new('actor_collection') # create a collection to house the actors
+    return bpy.data.collections['actor_collection']
+
+def set_actor_properties(actor, actor_type):
+    actor["Actor Type"] = actor_type # create custom property
+    actor["Game Task"] = 0 # create custom property
+    actor["Bounding Sphere Radius"] = 10 # create custom property
+
+def read_mesh_array(collection, attribute, typecode, width):
+    # read a whole attribute in one call instead of looping in python
+    data = array.array(typecode, [0]) * (len(collection)*width)
+    collection.foreach_get(attribute, data)
+    return data
+
+def mesh_geometry_matches(mesh, other):
+    if (len(mesh.vertices), len(mesh.loops), len(mesh.polygons)) != (len(other.vertices), len(other.loops), len(other.polygons)):
+        return False
+    return (read_mesh_array(mesh.vertices, "co", 'f', 3) == read_mesh_array(other.vertices, "co", 'f', 3)
+        and read_mesh_array(mesh.loops, "vertex_index", 'i', 1) == read_mesh_array(other.loops, "vertex_index", 'i', 1)
+        and read_mesh_array(mesh.polygons, "loop_start", 'i', 1) == read_mesh_array(other.polygons, "loop_start", 'i', 1))
+
+# ------------------------------------------------------------------------
+#    Actor Material Registry
+# ------------------------------------------------------------------------
+
+actor_color = (178/225,113/225,0,1)
+
+# (actor type, color) -> name of the one material actors of that type and color use
+actor_materials = {}
+
+def color_key(color):
+    return tuple(round(channel, 4) for channel in color)
+
+def get_actor_material(actor_type, color=actor_color):
+    key = (actor_type, color_key(color))
+    
+    # same idea as the mesh cache: trust the registry, fall back to the tags, create it if it's really missing
+    material = bpy.data.materials.get(actor_materials.get(key, ""))
+    if material is None or material.get("Actor Material") != actor_type or color_key(material.diffuse_color) != key[1]:
+        material = next((m for m in bpy.data.materials if m.get("Actor Material") == actor_type and color_key(m.diffuse_color) == key[1]), None)
+        if material is None:
+            material = bpy.data.materials.new(actor_type) # create a material
+            material.diffuse_color = color # add color
+            material["Actor Material"] = actor_type
+        actor_materials[key] = material.name
+    return material
+
+class OBJECT_OT_CleanActorMaterials(Operator):
+    bl_label = "Clean Up Actor Materials"
+    bl_idname = "object.clean_actor_materials"
+    bl_description = "Swaps every actor material for the one shared material of its actor type and color, then deletes the copies nothing uses anymore.\nUse this on levels made when every actor got its own \"Color\" material"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        
+        if not 'actor_collection' in bpy.data.collections:
+            show_message("There are no actors in this file","Error","ERROR")
+            return {'CANCELLED'}
+        
+        remapped = 0
+        replaced = set()
+        
+        for actor in bpy.data.collections['actor_collection'].all_objects:
+            if actor.type != 'MESH' or not "Actor Type" in actor.keys():
+                continue
+            for slot in actor.material_slots: # covers both mesh and object linked slots
+                material = slot.material
+                if material is None:
+                    continue
+                shared = get_actor_material(actor["Actor Type"], tuple(material.diffuse_color))
+                if material == shared:
+                    continue
+                slot.material = shared
+                replaced.add(material)
+                remapped += 1
+        
+        # purge the copies that are orphans now
+        removed = 0
+        for material in replaced:
+            if material.users == 0:
+                bpy.data.materials.remove(material)
+                removed += 1
+        
+        print("\t"+str(remapped)+" actor materials remapped, "+str(removed)+" duplicate materials removed.")
+        
+        return {'FINISHED'}
+
+# ------------------------------------------------------------------------
+#    Actor Viewport Display
+# ------------------------------------------------------------------------
+
+# state of the proxy display. in proxy mode the actor collection is hidden in the view layer and the actors are drawn
+# here instead, as boxes and the far away ones as points. the actor objects themselves are never written to
+actor_display = {
+    "views": {}, # window -> the batches drawn in it and what they were built from
+    "hidden": set(), # (scene, view layer) names where the proxy display hid the actor collection, one the user hid stays hidden
+    "proxy": {}, # (scene, view layer) names -> whether it was showing proxies at the last check
+    "stale": True, # actors changed since the batches were built
+    }
+
+# the 12 edges between the 8 corners of an object's bound_box
+box_edges = numpy.array([[0,1],[1,2],[2,3],[3,0],[4,5],[5,6],[6,7],[7,4],[0,4],[1,5],[2,6],[3,7]], numpy.int32)
+
+def actor_proxy_shader():
+    try:
+        return gpu.shader.from_builtin('UNIFORM_COLOR')
+    except ValueError:
+        return gpu.shader.from_builtin('3D_UNIFORM_COLOR') # blender versions before 3.0
+
+def draw_actor_proxies():
+    window = bpy.context.window
+    view = actor_display["views"].get(window.as_pointer()) if window is not None else None
+    if view is None:
+        return
+    shader = actor_proxy_shader()
+    try:
+        gpu.state.point_size_set(6.0)
+        gpu.state.depth_test_set('LESS_EQUAL')
+    except AttributeError: # blender versions before 3.0
+        import bgl
+        bgl.glPointSize(6.0)
+        bgl.glEnable(bgl.GL_DEPTH_TEST)
+    shader.bind()
+    shader.uniform_float("color", actor_color)
+    for batch in (view["boxes"], view["points"]):
+        if batch is not None:
+            batch.draw(shader)
+    try:
+        gpu.state.depth_test_set('NONE')
+    except AttributeError:
+        bgl.glDisable(bgl.GL_DEPTH_TEST)
+
+def actor_locations(actors):
+    # matrix_world comes out column major, so the translation is the 4th group of 4
+    matrices = actor_values(actors, "matrix_world", 16)
+    return matrices.reshape(-1, 4, 4)[:,3,:3]
+
+def actor_boxes(actors):
+    # every actor's bounding box corners in world space, (actors, 8, 3), and its location
+    matrices = actor_values(actors, "matrix_world", 16).reshape(-1, 4, 4).transpose(0, 2, 1).astype(numpy.float64)
+    corners = numpy.array([numpy.array(actor.bound_box) for actor in actors], numpy.float64).reshape(-1, 8, 3)
+    return numpy.einsum('aij,akj->aki', matrices[:,:3,:3], corners) + matrices[:,None,:3,3], matrices[:,:3,3]
+
+def view_location(window):
+    if window is None:
+        return None
+    for area in window.screen.areas:
+        if area.type == 'VIEW_3D':
+            return numpy.array(area.spaces.active.region_3d.view_matrix.inverted().translation)
+    return None
+
+def actor_layer_collection(layer_collection):
+    # the actor collection's entry in a view layer, wherever it's nested
+    for child in layer_collection.children:
+        if child.name == 'actor_collection':
+            return child
+        found = actor_layer_collection(child)
+        if found is not None:
+            return found
+    return None
+
+def refresh_actor_display(window, force=False):
+    # works out what the window draws, returns whether that changed
+    views = actor_display["views"]
+    scene, view_layer = window.scene, window.view_layer
+    layer = actor_layer_collection(view_layer.layer_collection) if 'actor_collection' in bpy.data.collections else None
+    if layer is None:
+        return views.pop(window.as_pointer(), None) is not None
+    
+    mytool = scene.my_tool
+    actors = level_actors(scene)
+    proxy = mytool.actor_display == 'PROXY' or (mytool.actor_display == 'AUTO' and len(actors) > mytool.actor_proxy_threshold)
+    
+    # switching modes hides or shows the actor collection once, what the user does with it in between is left alone
+    key = (scene.name, view_layer.name)
+    if proxy != actor_display["proxy"].get(key, False):
+        actor_display["proxy"][key] = proxy
+        if proxy and not layer.hide_viewport:
+            layer.hide_viewport = True
+            actor_display["hidden"].add(key)
+        elif not proxy and key in actor_display["hidden"]:
+            layer.hide_viewport = False
+            actor_display["hidden"].discard(key)
+    if not proxy or not layer.hide_viewport:
+        return views.pop(window.as_pointer(), None) is not None
+    
+    # a small move of the view doesn't change which actors are far away
+    center = view_location(window)
+    distance = mytool.actor_proxy_distance
+    view = views.get(window.as_pointer())
+    if not force and not actor_display["stale"] and view is not None and view["key"] == key and view["count"] == len(actors):
+        if distance == 0.0 or center is None or (view["center"] is not None and numpy.linalg.norm(center-view["center"]) < distance*0.1):
+            return False
+    
+    corners, locations = actor_boxes(actors)
+    if center is not None and distance > 0.0:
+        far = numpy.linalg.norm(locations-center, axis=1) > distance
+    else:
+        far = numpy.zeros(len(actors), bool)
+    
+    # the near actors' boxes in one batch and the far actors' points in another, two draw calls no matter how many
+    shader = actor_proxy_shader()
+    boxes = None
+    points = None
+    near = corners[~far]
+    if len(near):
+        indices = (numpy.arange(len(near), dtype=numpy.int32)[:,None,None]*8 + box_edges[None]).reshape(-1, 2)
+        boxes = batch_for_shader(shader, 'LINES', {"pos": numpy.ascontiguousarray(near.reshape(-1, 3), numpy.float32)}, indices=indices)
+    if far.any():
+        points = batch_for_shader(shader, 'POINTS', {"pos": numpy.ascontiguousarray(locations[far], numpy.float32)})
+    views[window.as_pointer()] = {"key": key, "center": center, "count": len(actors), "boxes": boxes, "points": points}
+    return True
+
+def update_actor_display(self, context):
+    if context.window is not None:
+        refresh_actor_display(context.window, force=True)
+
+def actor_display_timer():
+    windows = bpy.context.window_manager.windows
+    for window in windows:
+        if refresh_actor_display(window):
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+    actor_display["stale"] = False
+    # closed windows
+    open_windows = set([window.as_pointer() for window in windows])
+    for pointer in [pointer for pointer in actor_display["views"] if not pointer in open_windows]:
+        del actor_display["views"][pointer]
+    return 0.5
+
+def reset_actor_display():
+    actor_display["views"].clear()
+    actor_display["hidden"].clear()
+    actor_display["proxy"].clear()
+    actor_display["stale"] = True
+
+@persistent
+def unhide_actor_proxies(dummy):
+    # save the actor collection the way the user left it, the timer hides it again right after
+    for scene_name, view_layer_name in actor_display["hidden"]:
+        scene = bpy.data.scenes.get(scene_name)
+        view_layer = scene.view_layers.get(view_layer_name) if scene is not None else None
+        layer = actor_layer_collection(view_layer.layer_collection) if view_layer is not None else None
+        if layer is not None:
+            layer.hide_viewport = False
+    reset_actor_display()
+
+@persistent
+def clear_actor_caches(dummy):
+    actor_meshes.clear()
+    actor_materials.clear()
+    reset_actor_display()
+    invalidate_actor_table()
+
+class OBJECT_OT_RelinkActorMeshes(Operator):
+    bl_label = "Re-link Duplicate Actor Meshes"
+    bl_idname = "object.relink_actor_meshes"
+    bl_description = "Points every actor whose mesh is an identical copy of the actor model at the one shared mesh for its type and removes the copies.\nUse this on levels made before actors shared their mesh"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        
+        if not 'actor_collection' in bpy.data.collections:
+            show_message("There are no actors in this file","Error","ERROR")
+            return {'CANCELLED'}
+        
+        relinked = 0
+        duplicates = set()
+        
+        for actor in bpy.data.collections['actor_collection'].all_objects:
+            if actor.type != 'MESH' or not "Actor Type" in actor.keys():
+                continue
+            shared = get_actor_mesh(actor["Actor Type"])
+            if actor.data == shared or not mesh_geometry_matches(actor.data, shared): # leave edited meshes alone
+                continue
+            duplicates.add(actor.data)
+            actor.data = shared
+            relinked += 1
+        
+        # remove the copies nothing uses anymore, along with their materials
+        removed = 0
+        for mesh in duplicates:
+            if mesh.users == 0:
+                materials = [material for material in mesh.materials if material is not None]
+                bpy.data.meshes.remove(mesh)
+                removed += 1
+                for material in materials:
+                    if material.users == 0:
+                        bpy.data.materials.remove(material)
+        
+        print("\t"+str(relinked)+" actors re-linked, "+str(removed)+" duplicate meshes removed.")
+        
+        return {'FINISHED'}
 
 class OBJECT_OT_add_object(Operator, AddObjectHelper):
     """Create a new Mesh Object"""
@@ -1351,21 +3164,13 @@ class OBJECT_OT_add_object(Operator, AddObjectHelper):
         
         print(self.actor_type)
 
-        add_object(self, context, "Actor") # create the actor
-        bpy.context.active_object.rotation_euler[0] = math.radians(90) # fix the rotation
-        if not 'actor_collection' in bpy.data.collections: # check if there is already a collection of actors
-            actor_collection = bpy.data.collections.new('actor_collection') # create a collection to house the actors
-        bpy.data.objects[bpy.context.object.data.name].active_material = bpy.data.materials.new("Color") # create a material
-        bpy.data.objects[bpy.context.object.data.name].active_material.diffuse_color = (178/225,113/225,0,1) # add color
-
-        bpy.data.collections['actor_collection'].objects.link(bpy.data.objects[bpy.context.object.data.name]) # add the actor to a collection
-        bpy.data.objects[bpy.context.object.data.name].rotation_mode = 'QUATERNION' # set rotation mode to quaternion
-        bpy.data.objects[bpy.context.object.data.name]["Actor Type"] = self.actor_type # create custom property
-        bpy.data.objects[bpy.context.object.data.name]["Game Task"] = 0 # create custom property
-        bpy.data.objects[bpy.context.object.data.name]["Bounding Sphere Radius"] = 10 # create custom property
+        actor = add_object(self, context, self.actor_type) # create the actor, linked to the shared mesh for its type
+        actor.rotation_euler[0] = math.radians(90) # fix the rotation
+        get_actor_collection().objects.link(actor) # add the actor to a collection
+        actor.rotation_mode = 'QUATERNION' # set rotation mode to quaternion
+        set_actor_properties(actor, self.actor_type)
         
         ''' #commenting this out because it messes with collections
-        actor = bpy.data.objects[bpy.context.object.data.name] # rename duplicates in a less stupid way
         if '.' in actor.name:
             basename, suffix = actor.name.split('.')
             actor.name = basename + suffix'''
@@ -1373,6 +3178,211 @@ class OBJECT_OT_add_object(Operator, AddObjectHelper):
         return {'FINISHED'}
 
 
+# ------------------------------------------------------------------------
+#    Actor Scattering
+# ------------------------------------------------------------------------
+
+# the same 90 degree turn around x that a single added actor gets, as a quaternion
+actor_rotation = (math.cos(math.radians(45)), math.sin(math.radians(45)), 0.0, 0.0)
+
+def transform_points(points, matrix):
+    matrix = numpy.array(matrix, dtype=numpy.float64)
+    return points @ matrix[:3,:3].T + matrix[:3,3]
+
+def curve_scatter_points(curve, depsgraph, count):
+    
+    # the evaluated curve as a polyline, already resolved and with modifiers applied
+    evaluated = curve.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    co = numpy.empty(len(mesh.vertices)*3, numpy.float32)
+    edges = numpy.empty(len(mesh.edges)*2, numpy.int32)
+    mesh.vertices.foreach_get("co", co)
+    mesh.edges.foreach_get("vertices", edges)
+    evaluated.to_mesh_clear()
+    
+    if len(edges) == 0:
+        return numpy.empty((0, 3))
+    co = transform_points(co.reshape(-1, 3), curve.matrix_world)
+    starts, ends = co[edges[0::2]], co[edges[1::2]]
+    
+    # space the actors evenly by distance along the segments
+    lengths = numpy.linalg.norm(ends-starts, axis=1)
+    travelled = numpy.concatenate(([0.0], numpy.cumsum(lengths)))
+    distances = numpy.linspace(0.0, travelled[-1], count)
+    segment = numpy.clip(numpy.searchsorted(travelled, distances, side="right")-1, 0, len(lengths)-1)
+    t = (distances-travelled[segment]) / numpy.maximum(lengths[segment], 1e-12)
+    return starts[segment] + (ends[segment]-starts[segment])*t[:,None]
+
+def grid_scatter_points(center, count_x, count_y, spacing):
+    x = (numpy.arange(count_x)-(count_x-1)/2)*spacing
+    y = (numpy.arange(count_y)-(count_y-1)/2)*spacing
+    x, y = numpy.meshgrid(x, y)
+    return numpy.column_stack((x.ravel(), y.ravel(), numpy.zeros(x.size))) + numpy.array(center)
+
+def face_scatter_points(obj, count, seed):
+    
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+    co = numpy.empty(len(mesh.vertices)*3, numpy.float32)
+    triangles = numpy.empty(len(mesh.loop_triangles)*3, numpy.int32)
+    polygon_index = numpy.empty(len(mesh.loop_triangles), numpy.int32)
+    selected = numpy.empty(len(mesh.polygons), bool)
+    mesh.vertices.foreach_get("co", co)
+    mesh.loop_triangles.foreach_get("vertices", triangles)
+    mesh.loop_triangles.foreach_get("polygon_index", polygon_index)
+    mesh.polygons.foreach_get("select", selected)
+    
+    # work in world space so scaled objects still get an even spread
+    co = transform_points(co.reshape(-1, 3), obj.matrix_world)
+    triangles = triangles.reshape(-1, 3)[selected[polygon_index]]
+    a, b, c = co[triangles[:,0]], co[triangles[:,1]], co[triangles[:,2]]
+    cross = numpy.cross(b-a, c-a)
+    areas = numpy.linalg.norm(cross, axis=1)
+    if len(areas) == 0 or areas.sum() == 0.0:
+        return numpy.empty((0, 3)), numpy.empty((0, 3))
+    
+    # pick triangles weighted by area, then a uniform point inside each
+    rng = numpy.random.default_rng(seed)
+    picked = rng.choice(len(areas), size=count, p=areas/areas.sum())
+    r1 = numpy.sqrt(rng.random(count))[:,None]
+    r2 = rng.random(count)[:,None]
+    points = a[picked]*(1.0-r1) + b[picked]*(r1*(1.0-r2)) + c[picked]*(r1*r2)
+    normals = cross[picked] / areas[picked][:,None]
+    return points, normals
+
+def unused_names(basename, count):
+    # blender's own name deduplication searches every object for every new name, which crawls at thousands of actors
+    taken = set(bpy.data.objects.keys())
+    index = 0
+    names = []
+    while len(names) < count:
+        name = basename if index == 0 else basename+"."+format(index, "03d")
+        if not name in taken:
+            names.append(name)
+        index += 1
+    return names
+
+def add_actors(context, actor_type, locations):
+    
+    mesh = get_actor_mesh(actor_type)
+    scene_collection = context.collection
+    actor_collection = get_actor_collection()
+    
+    actors = []
+    for name, location in zip(unused_names("Actor", len(locations)), locations.tolist()):
+        actor = bpy.data.objects.new(name, mesh)
+        actor.location = location
+        actor.rotation_mode = 'QUATERNION'
+        actor.rotation_quaternion = actor_rotation
+        set_actor_properties(actor, actor_type)
+        scene_collection.objects.link(actor)
+        actor_collection.objects.link(actor)
+        actors.append(actor)
+    return actors
+
+class OBJECT_OT_ScatterActors(Operator):
+    bl_label = "Scatter Actors"
+    bl_idname = "object.scatter_actors"
+    bl_description = "Places many actors of one type at once along the active curve, in a grid around the 3D cursor or across the selected faces of the active mesh"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    actor_type: EnumProperty(
+        name="Actor Type",
+        items=[(actor_type[1], actor_type[0], '') for actor_type in actor_types],
+        )
+    
+    mode: EnumProperty(
+        name="Scatter",
+        items=[ ('CURVE', 'Along Curve', 'Space the actors evenly along the active curve'),
+                ('GRID', 'Grid', 'Lay the actors out in a grid centered on the 3D cursor'),
+                ('FACES', 'Selected Faces', 'Scatter the actors randomly across the selected faces of the active mesh'),
+               ]
+        )
+    
+    count: IntProperty(
+        name="Count",
+        default=10,
+        min=1,
+        max=100000
+        )
+        
+    count_x: IntProperty(
+        name="Columns",
+        default=10,
+        min=1,
+        max=1000
+        )
+        
+    count_y: IntProperty(
+        name="Rows",
+        default=10,
+        min=1,
+        max=1000
+        )
+        
+    spacing: FloatProperty(
+        name="Spacing",
+        description="The distance between neighbouring actors in the grid",
+        default=2.0,
+        min=0.0
+        )
+        
+    height: FloatProperty(
+        name="Height",
+        description="How far above the curve, grid or faces to place the actors",
+        default=1.0
+        )
+        
+    seed: IntProperty(
+        name="Seed",
+        default=0,
+        min=0
+        )
+    
+    @classmethod
+    def poll(self, context):
+        return context.mode == 'OBJECT'
+
+    def execute(self, context):
+        obj = context.active_object
+        
+        if self.mode == 'CURVE':
+            if obj is None or obj.type != 'CURVE':
+                show_message("Select a curve to scatter the actors along","Error","ERROR")
+                return {'CANCELLED'}
+            locations = curve_scatter_points(obj, context.evaluated_depsgraph_get(), self.count) + (0.0, 0.0, self.height)
+        elif self.mode == 'GRID':
+            locations = grid_scatter_points(context.scene.cursor.location, self.count_x, self.count_y, self.spacing) + (0.0, 0.0, self.height)
+        else:
+            if obj is None or obj.type != 'MESH':
+                show_message("Select a mesh with some faces selected to scatter the actors across","Error","ERROR")
+                return {'CANCELLED'}
+            points, normals = face_scatter_points(obj, self.count, self.seed)
+            locations = points + normals*self.height
+            
+        if len(locations) == 0:
+            show_message("There's nowhere to place the actors","Error","ERROR")
+            return {'CANCELLED'}
+        
+        actors = add_actors(context, self.actor_type, locations)
+        print("\t"+str(len(actors))+" "+self.actor_type+" actors placed.")
+        
+        return {'FINISHED'}
+    
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "actor_type")
+        layout.prop(self, "mode")
+        if self.mode == 'GRID':
+            layout.prop(self, "count_x")
+            layout.prop(self, "count_y")
+            layout.prop(self, "spacing")
+        else:
+            layout.prop(self, "count")
+        if self.mode == 'FACES':
+            layout.prop(self, "seed")
+        layout.prop(self, "height")
+
 # add buttons for the new meshes
 def add_object_button(self, context):
     for actor_type in actor_types:
@@ -1382,6 +3392,7 @@ def add_object_button(self, context):
             #icon_value=custom_icons[actor_type[1]].icon_id,
             )
         op.actor_type = actor_type[1]
+    self.layout.operator(OBJECT_OT_ScatterActors.bl_idname)
 
 # This allows you to right click on a button and link to documentation
 def add_object_manual_map():
@@ -1391,6 +3402,520 @@ def add_object_manual_map():
     )
     return url_manual_prefix, url_manual_mapping
 
+# ------------------------------------------------------------------------
+#    World Reference
+# ------------------------------------------------------------------------
+
+world_reference_missing = "The world folder isn't next to LevelBuilder.py, copy it into your Blender addons folder to create a world reference."
+
+def world_reference_dir(custom_levels_path):
+    # the decompiler writes the level .obj files to data/debug_out, next to data/custom_levels
+    return os.path.join(os.path.dirname(os.path.dirname(custom_levels_path.replace("\\", "/"))), "debug_out")
+
+def world_reference_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, item) for item in sorted(os.listdir(directory)) if item.endswith('.obj')]
+
+def world_reference_cache(directory, proxy_ratio=None):
+    # converted .obj files are kept in debug_out so the next import loads them instead of parsing again
+    cache = os.path.join(directory, "level-builder-cache")
+    try:
+        os.makedirs(cache, exist_ok=True)
+        ObjParser.prune_cache(cache, world_reference_files(directory), proxy_ratio)
+    except OSError as error:
+        print("\tWorld reference cache unavailable ("+str(error)+"), every file is parsed.")
+        return None
+    return cache
+
+def world_reference_anchor(scene, collection, cache=None, proxy_ratio=None):
+    # the empty the level models hang from, scaled up by 16. importing again adds to the one already there
+    anchor = scene.objects.get("World Geometry")
+    if anchor is None:
+        anchor = bpy.data.objects.new("World Geometry", None)
+        anchor.empty_display_type = 'PLAIN_AXES'
+        anchor.scale = (16,16,16)
+        collection.objects.link(anchor)
+    # proxies need the cache, the full meshes are loaded from it when they're swapped in
+    anchor["World Reference Cache"] = cache or ""
+    if proxy_ratio is not None and cache is not None:
+        anchor["World Reference Proxy Ratio"] = proxy_ratio
+    elif "World Reference Proxy Ratio" in anchor:
+        del anchor["World Reference Proxy Ratio"]
+    return anchor
+
+def loaded_world_reference(anchor):
+    # names of the .obj files already under the anchor
+    return set([child["World Reference File"] for child in anchor.children if "World Reference File" in child])
+
+def world_reference_settings(anchor):
+    # the cache folder and proxy ratio the anchor's objects were imported with, kept on the anchor so proxies
+    # still swap after the .blend is opened again
+    cache = anchor.get("World Reference Cache") or None
+    proxy_ratio = anchor.get("World Reference Proxy Ratio") if cache is not None else None
+    return cache, proxy_ratio
+
+# merged levels keep which of the file's objects each face came from in this face attribute
+world_reference_attribute = "World Reference Object"
+
+def merged_groups(name, groups):
+    # every group of a file as one mesh, each face keeping the index of the group it came from
+    offsets = numpy.cumsum([0]+[len(group[1])//3 for group in groups])
+    co = numpy.concatenate([group[1] for group in groups])
+    loop_totals = numpy.concatenate([group[2] for group in groups])
+    loop_vertices = numpy.concatenate([group[3]+offset for group, offset in zip(groups, offsets)]).astype(numpy.int32)
+    sources = numpy.repeat(numpy.arange(len(groups), dtype=numpy.int32), [len(group[2]) for group in groups])
+    return name, co, loop_totals, loop_vertices, sources
+
+def world_reference_mesh(name, co, loop_totals, loop_vertices, sources=None):
+    mesh = mesh_from_arrays(name, co, numpy.cumsum(loop_totals, dtype=numpy.int32)-loop_totals, loop_totals, loop_vertices)
+    if sources is not None:
+        mesh.attributes.new(world_reference_attribute, 'INT', 'FACE').data.foreach_set("value", sources)
+    return mesh
+
+def world_reference_parts(path, groups, merge):
+    # the meshes to make of a file's groups: all of them, or one per file when merging
+    if merge and groups:
+        return [merged_groups(os.path.splitext(os.path.basename(path))[0], groups)]
+    return groups
+
+def select_world_reference_pieces(mesh):
+    # select every face that shares a source object with a selected face, returns the source indices
+    sources = numpy.empty(len(mesh.polygons), numpy.int32)
+    mesh.attributes[world_reference_attribute].data.foreach_get("value", sources)
+    selected = numpy.empty(len(mesh.polygons), bool)
+    mesh.polygons.foreach_get("select", selected)
+    pieces = numpy.unique(sources[selected])
+    faces = numpy.isin(sources, pieces)
+    
+    # vertices and edges follow so edit mode shows the same selection in every select mode
+    loop_totals = numpy.empty(len(mesh.polygons), numpy.int32)
+    loop_vertices = numpy.empty(len(mesh.loops), numpy.int32)
+    edges = numpy.empty(len(mesh.edges)*2, numpy.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    mesh.edges.foreach_get("vertices", edges)
+    vertices = numpy.zeros(len(mesh.vertices), bool)
+    vertices[loop_vertices[numpy.repeat(faces, loop_totals)]] = True
+    edges = edges.reshape(-1, 2)
+    mesh.vertices.foreach_set("select", vertices)
+    mesh.edges.foreach_set("select", vertices[edges[:, 0]] & vertices[edges[:, 1]])
+    mesh.polygons.foreach_set("select", faces)
+    return pieces.tolist()
+
+# a modal import makes meshes for this many seconds per timer tick, ticks this often
+world_reference_slice = 0.05
+world_reference_tick = 0.02
+
+class WorldReferenceLoader:
+    # builds the world reference one mesh at a time so a modal operator can spread the import over timer ticks.
+    # files are converted on worker processes (cached ones read on threads) while the main thread only makes the objects
+    
+    def __init__(self, anchor, paths, workers=None, display='WIRE', merge=False, created=False):
+        if ObjParser is None:
+            raise OSError(world_reference_missing)
+        self.anchor, self.paths, self.display, self.merge = anchor, paths, display, merge
+        self.created = created # the anchor was made for this import, a cancel that leaves it empty removes it
+        self.collection = anchor.users_collection[0]
+        self.cache, self.proxy_ratio = world_reference_settings(anchor)
+        if paths:
+            anchor["World Reference Directory"] = os.path.dirname(paths[0])
+        
+        self.stale = [self.cache is None or not os.path.exists(ObjParser.cache_path(path, self.cache, self.proxy_ratio)) for path in paths]
+        if self.cache is not None:
+            print("\t"+str(self.stale.count(False))+" .obj files cached, "+str(self.stale.count(True))+" to convert.")
+        self.threads = ThreadPoolExecutor()
+        self.processes = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) if any(self.stale) else None
+        self.futures = [self.submit(path, stale) for path, stale in zip(paths, self.stale)]
+        
+        self.file = 0 # the file being built
+        self.parts = None # its meshes still to make
+        self.objects = [] # and the objects made of it so far
+        self.count = 0
+    
+    def submit(self, path, stale):
+        if not stale:
+            return self.threads.submit(ObjParser.load_groups, ObjParser.cache_path(path, self.cache, self.proxy_ratio))
+        if self.processes is not None:
+            try:
+                return self.processes.submit(ObjParser.convert_obj, path, self.cache, self.proxy_ratio)
+            except (BrokenProcessPool, OSError, RuntimeError) as error:
+                self.without_processes(error)
+        return self.threads.submit(ObjParser.convert_obj, path, self.cache, self.proxy_ratio)
+    
+    def without_processes(self, error):
+        # worker processes couldn't start, the files still to convert go to the threads instead
+        print("\tWorker processes unavailable ("+str(error)+"), parsing the rest on threads.")
+        self.processes.shutdown(wait=False)
+        self.processes = None
+        for index in range(self.file, len(self.futures)):
+            if self.stale[index]:
+                self.futures[index] = self.threads.submit(ObjParser.convert_obj, self.paths[index], self.cache, self.proxy_ratio)
+    
+    def groups(self, block):
+        # the current file's groups, None while they aren't ready and there's no waiting for them
+        future = self.futures[self.file]
+        if not block and not future.done():
+            return None
+        try:
+            return future.result()
+        except BrokenProcessPool as error:
+            self.without_processes(error)
+            return self.groups(block)
+    
+    def build(self, path, groups, group, part):
+        obj = bpy.data.objects.new(part[0], world_reference_mesh(*part))
+        obj["World Reference File"] = os.path.basename(path) # so following the anchor knows what's loaded
+        obj["World Reference Group"] = group if not self.merge else -1 # and swapping proxies knows which mesh in the file it is
+        if self.merge:
+            obj["World Reference Objects"] = "\n".join([source[0] for source in groups])
+        obj["World Reference Proxy"] = self.proxy_ratio is not None
+        if self.proxy_ratio is not None:
+            obj.display_type = self.display
+        obj.parent = self.anchor # parent them to the anchor
+        self.collection.objects.link(obj)
+        self.objects.append(obj)
+        self.count += 1
+    
+    def step(self, budget=None):
+        # makes meshes until budget seconds are used up, at least one per call, or all of them without a budget.
+        # returns whether the import is finished
+        end = time.perf_counter()+budget if budget is not None else None
+        while self.file < len(self.paths):
+            if self.parts is None:
+                groups = self.groups(block=end is None)
+                if groups is None:
+                    return False # still converting, the next tick looks again
+                self.sources = groups
+                self.parts = list(enumerate(world_reference_parts(self.paths[self.file], groups, self.merge)))
+            while self.parts:
+                group, part = self.parts.pop(0)
+                self.build(self.paths[self.file], self.sources, group, part)
+                if end is not None and time.perf_counter() >= end and (self.parts or self.file+1 < len(self.paths)):
+                    return False
+            self.file += 1
+            self.parts = None
+            self.objects = []
+        self.close()
+        return True
+    
+    def close(self):
+        for future in self.futures[self.file:]:
+            future.cancel()
+        self.threads.shutdown(wait=False)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False)
+    
+    def cancel(self):
+        # the half built file's objects are removed, so every file is either all there or not at all
+        # and importing again picks up where this one stopped
+        # any of them may have been deleted already, along with the anchor
+        for obj in self.objects:
+            try:
+                mesh = obj.data
+                bpy.data.objects.remove(obj)
+            except ReferenceError:
+                continue
+            if mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+        self.objects = []
+        self.close()
+        try:
+            if self.created and not self.anchor.children:
+                bpy.data.objects.remove(self.anchor)
+        except ReferenceError:
+            pass
+
+def start_world_reference(context, paths, workers=None, cache=None, proxy_ratio=None, display='WIRE', merge=False):
+    # a loader for the files that aren't under the anchor yet
+    created = context.scene.objects.get("World Geometry") is None
+    anchor = world_reference_anchor(context.scene, context.collection, cache, proxy_ratio)
+    context.view_layer.objects.active = anchor
+    loaded = loaded_world_reference(anchor)
+    return WorldReferenceLoader(anchor, [path for path in paths if not os.path.basename(path) in loaded], workers, display, merge, created)
+
+def add_world_reference(anchor, paths, workers=None, display='WIRE', merge=False):
+    # the whole import in one go. merging makes one object per file instead of one per object in it
+    loader = WorldReferenceLoader(anchor, paths, workers, display, merge)
+    try:
+        loader.step()
+    except Exception:
+        loader.cancel()
+        raise
+    return loader.count
+
+def import_world_reference(context, paths, workers=None, cache=None, proxy_ratio=None, display='WIRE', merge=False):
+    loader = start_world_reference(context, paths, workers, cache, proxy_ratio, display, merge)
+    try:
+        loader.step()
+    except Exception:
+        loader.cancel()
+        raise
+    return loader.anchor, loader.count
+
+# ------------------------------------------------------------------------
+#    World Reference Proxies
+# ------------------------------------------------------------------------
+
+def cursor_inside(obj, cursor):
+    # whether the 3D cursor is within the object's bounding box
+    local = obj.matrix_world.inverted() @ cursor
+    corners = numpy.array(obj.bound_box)
+    return bool(numpy.all(corners.min(axis=0) <= local) and numpy.all(local <= corners.max(axis=0)))
+
+def swap_world_reference_mesh(obj, anchor, proxy, display, files):
+    # replace the object's mesh with its proxy or its full mesh from the cache. files holds the cache entries already read
+    cache, proxy_ratio = world_reference_settings(anchor)
+    if ObjParser is None or cache is None or proxy_ratio is None or not "World Reference Directory" in anchor:
+        return False
+    path = os.path.join(anchor["World Reference Directory"], obj["World Reference File"])
+    try:
+        entry = ObjParser.cache_path(path, cache, proxy_ratio if proxy else None)
+        if not entry in files:
+            files[entry] = ObjParser.load_groups(entry)
+    except (OSError, ValueError):
+        return False # the .obj or its cache entry changed since, importing again brings them back
+    
+    group = obj["World Reference Group"]
+    part = files[entry][group] if group >= 0 else merged_groups(os.path.splitext(obj["World Reference File"])[0], files[entry])
+    old = obj.data
+    obj.data = world_reference_mesh(*part)
+    if old.users == 0:
+        bpy.data.meshes.remove(old)
+    obj.display_type = display if proxy else 'TEXTURED'
+    obj["World Reference Proxy"] = proxy
+    return True
+
+def refresh_world_reference_proxies(scene, view_layer, display):
+    # full resolution for the selected world reference objects and the ones the 3D cursor is in, proxies for the rest.
+    # returns whether anything was swapped
+    anchor = scene.objects.get("World Geometry")
+    if anchor is None or world_reference_settings(anchor)[1] is None:
+        return False
+    cursor = scene.cursor.location
+    files = {}
+    changed = False
+    for obj in anchor.children:
+        if not "World Reference Group" in obj or obj.type != 'MESH' or obj.mode == 'EDIT':
+            continue
+        try:
+            selected = obj.select_get(view_layer=view_layer)
+        except RuntimeError:
+            selected = False # not in this view layer
+        proxy = not (selected or cursor_inside(obj, cursor))
+        if proxy != bool(obj["World Reference Proxy"]):
+            changed = swap_world_reference_mesh(obj, anchor, proxy, display, files) or changed
+    return changed
+
+def update_world_reference_display(self, context):
+    anchor = context.scene.objects.get("World Geometry")
+    if anchor is None:
+        return
+    for obj in anchor.children:
+        if obj.get("World Reference Proxy"):
+            obj.display_type = self.world_reference_display
+
+# ------------------------------------------------------------------------
+#    World Reference Bounds
+# ------------------------------------------------------------------------
+
+# what nearby loading follows: the debug_out folder, its files' bounds, where the center was last checked
+# and the loader adding the levels that came into range, a slice on every timer tick
+world_reference = {"directory": None, "cache": None, "proxy_ratio": None, "bounds": {}, "center": None, "importing": False, "loader": None}
+
+def world_reference_bounds(paths, cache):
+    # file name -> min and max corner of its vertices, or None. kept as bounds.json in the cache folder,
+    # only files whose size or modification time changed are scanned again
+    index_path = os.path.join(cache, "bounds.json") if cache is not None else None
+    index = {}
+    if index_path is not None and os.path.exists(index_path):
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except ValueError:
+            pass # written by something else, scan everything again
+    
+    stats = dict([(os.path.basename(path), file_stat(path)) for path in paths])
+    stale = [path for path in paths if index.get(os.path.basename(path), {}).get("stat") != stats[os.path.basename(path)]]
+    if stale:
+        print("\tScanning the bounds of "+str(len(stale))+" .obj files.")
+        with ThreadPoolExecutor() as pool:
+            for path, bounds in zip(stale, pool.map(ObjParser.scan_bounds, stale)):
+                index[os.path.basename(path)] = {"stat": stats[os.path.basename(path)], "bounds": bounds}
+    
+    current = dict([(name, index[name]) for name in stats])
+    if index_path is not None and (stale or len(current) != len(index)):
+        try:
+            with open(index_path, "w") as f:
+                json.dump(current, f)
+        except OSError:
+            pass
+    return dict([(name, entry["bounds"]) for name, entry in current.items() if entry["bounds"] is not None])
+
+def files_within(bounds, matrix, center, radius):
+    # the files whose bounds, placed by the anchor's matrix, come within radius of center
+    names = sorted(bounds)
+    if not names:
+        return []
+    low = numpy.array([bounds[name][0] for name in names])
+    high = numpy.array([bounds[name][1] for name in names])
+    # the same y up to z up turn the loader gives the vertices
+    low, high = numpy.stack((low[:, 0], -high[:, 2], low[:, 1]), axis=1), numpy.stack((high[:, 0], -low[:, 2], high[:, 1]), axis=1)
+    rotation = matrix[:3, :3]
+    middle = (low+high)/2 @ rotation.T + matrix[:3, 3]
+    extent = (high-low)/2 @ numpy.abs(rotation).T
+    distance = numpy.linalg.norm(numpy.maximum(numpy.abs(middle-center)-extent, 0.0), axis=1)
+    return [name for name, within in zip(names, distance <= radius) if within]
+
+def world_reference_center(scene, mytool):
+    if mytool.world_reference_center == 'ANCHOR' and mytool.anchor in scene.objects:
+        return numpy.array(scene.objects[mytool.anchor].matrix_world.translation)
+    return numpy.array(scene.cursor.location)
+
+def nearby_world_reference(scene, mytool, center):
+    # paths of the files in range that aren't loaded yet
+    anchor = scene.objects.get("World Geometry")
+    matrix = numpy.array(anchor.matrix_world) if anchor is not None else numpy.diag([16.0, 16.0, 16.0, 1.0])
+    loaded = loaded_world_reference(anchor) if anchor is not None else set()
+    names = files_within(world_reference["bounds"], matrix, center, mytool.world_reference_radius)
+    return [os.path.join(world_reference["directory"], name) for name in names if not name in loaded]
+
+def stop_nearby_world_reference():
+    # drops the levels nearby loading is in the middle of, the ones it finished stay
+    loader = world_reference["loader"]
+    world_reference["loader"] = None
+    if loader is not None:
+        loader.cancel()
+
+@persistent
+def forget_world_reference(dummy):
+    # another file, nearby loading starts again from its own Create World Reference
+    stop_nearby_world_reference()
+    world_reference.update(directory=None, cache=None, proxy_ratio=None, bounds={}, center=None, importing=False)
+
+def follow_world_reference(scene, mytool):
+    # nearby loading adds the levels that come into range as the anchor or the 3D cursor moves.
+    # one loader works through them a slice per call, the center is only checked again once it's done
+    loader = world_reference["loader"]
+    if loader is None:
+        center = world_reference_center(scene, mytool)
+        if world_reference["center"] is not None and numpy.array_equal(center, world_reference["center"]):
+            return False
+        world_reference["center"] = center
+        paths = nearby_world_reference(scene, mytool, center)
+        if not paths:
+            return False
+    try:
+        if loader is None:
+            anchor = scene.objects.get("World Geometry") or world_reference_anchor(scene, scene.collection, world_reference["cache"], world_reference["proxy_ratio"])
+            loader = world_reference["loader"] = WorldReferenceLoader(anchor, paths, display=mytool.world_reference_display, merge=mytool.world_reference_merge)
+        loader.anchor.name # deleted anchors raise ReferenceError
+        if loader.step(world_reference_slice):
+            world_reference["loader"] = None
+            print("\tLoaded "+str(loader.count)+" objects from "+str(len(loader.paths))+" nearby .obj files.")
+    except Exception as error: # an error here would unregister the timer
+        print("\tStopped loading nearby levels: "+str(error))
+        stop_nearby_world_reference()
+        world_reference["directory"] = None
+    return True
+
+def world_reference_timer():
+    for window in bpy.context.window_manager.windows:
+        scene = window.scene
+        mytool = scene.my_tool
+        changed = False
+        if world_reference["importing"]:
+            break # the modal import is still adding objects under the anchor
+        if world_reference["directory"] is not None and mytool.world_reference_mode == 'NEARBY':
+            changed = follow_world_reference(scene, mytool)
+        elif world_reference["loader"] is not None:
+            stop_nearby_world_reference() # switched to loading everything or the file's reference was forgotten
+        changed = refresh_world_reference_proxies(scene, window.view_layer, mytool.world_reference_display) or changed
+        if changed:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+        break
+    return world_reference_tick if world_reference["loader"] is not None else 0.5
+
+# ------------------------------------------------------------------------
+#    Command Line
+# ------------------------------------------------------------------------
+
+# exports the level in the .blend's active scene without the ui, pick another scene with blender's own --scene
+# blender -b level.blend --python LevelBuilder.py -- export --stages jsonc,glb --out <path to data/custom_levels>
+# exit codes: 0 exported, 1 the export failed, 2 bad arguments or level info, 3 the actor check failed with --strict
+
+cli_stages = ("level", "jsonc", "glb")
+
+def command_line(argv):
+    parser = argparse.ArgumentParser(prog="blender -b level.blend --python LevelBuilder.py --", description="Exports the level in the active scene of a .blend.")
+    commands = parser.add_subparsers(dest="command")
+    export = commands.add_parser("export", help="export the level")
+    export.add_argument("--stages", default=",".join(cli_stages), help="comma separated stages to run: level (level info files), jsonc (actor info), glb (level geometry). Default: all of them")
+    export.add_argument("--out", help="the custom_levels folder to export into instead of the scene's Custom Levels Path")
+    export.add_argument("--optimize", action="store_true", help="optimize the geometry before writing the .glb")
+    export.add_argument("--direct", action="store_true", help="write the .glb with the direct writer")
+    export.add_argument("--strict", action="store_true", help="fail if the actor check finds problems")
+    try:
+        arguments = parser.parse_args(argv)
+    except SystemExit as error: # argparse exits on its own after --help or a bad argument
+        return 0 if error.code == 0 else 2
+    if arguments.command is None:
+        parser.print_help()
+        return 2
+    
+    stages = [stage.strip() for stage in arguments.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if not stage in cli_stages]
+    if unknown or not stages:
+        print("Error: unknown stages "+", ".join(unknown)+", choose from "+", ".join(cli_stages), file=sys.stderr)
+        return 2
+    
+    # the command line decides what to export, the rest comes from the scene.
+    # its choices are only in the scene while the settings are read, the level stage saves the .blend as it was
+    scene = bpy.context.scene
+    mytool = scene.my_tool
+    overridden = ("custom_levels_path", "should_export_level_info", "should_export_actor_info", "should_export_geometry")
+    original = {name: getattr(mytool, name) for name in overridden}
+    try:
+        if arguments.out:
+            mytool.custom_levels_path = os.path.join(os.path.abspath(arguments.out), "")
+        mytool.should_export_level_info = "level" in stages
+        mytool.should_export_actor_info = "jsonc" in stages
+        mytool.should_export_geometry = "glb" in stages
+        error = check_level_settings(mytool)
+        level = level_settings(scene)
+    finally:
+        for name, value in original.items():
+            setattr(mytool, name, value)
+    if error is not None:
+        print("Error: "+error, file=sys.stderr)
+        return 2
+    
+    print("\n   ---Beginning Export Process---\n")
+    timings = {}
+    start = time.perf_counter()
+    try:
+        if "jsonc" in stages:
+            problems = timed(timings, "actor check", validate_actors, scene)
+            print_actor_problems(problems)
+            if arguments.strict and (problems["coincident"] or problems["close"] or problems["far"]):
+                print("Error: the actor check found problems", file=sys.stderr)
+                return 3
+        
+        task_count = ("level" in stages or "jsonc" in stages)+("glb" in stages)
+        current_task = timed(timings, "files", update_files, task_count, 1, "level" in stages, "jsonc" in stages, level["newpath"], level["nick"], level["longtitle"], level["title"], mytool.spawn_location, mytool.auto_bsphere)
+        if "glb" in stages:
+            print("Task ("+str(current_task)+"/"+str(task_count)+")")
+            timed(timings, "glb", export_geometry, bpy.context, mytool.anchor, level["newpath"], level["longtitle"], arguments.optimize or mytool.optimize_geometry, mytool.merge_distance, arguments.direct or mytool.direct_glb)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    
+    print("\t"+level["longtitle"]+": "+", ".join([stage+" "+format(seconds, ".2f")+"s" for stage, seconds in timings.items()]))
+    print("\tTotal: "+format(time.perf_counter()-start, ".2f")+"s\n")
+    return 0
+
 # ------------------------------------------------------------------------
 #    Registration
 # ------------------------------------------------------------------------
@@ -1398,7 +3923,14 @@ def add_object_manual_map():
 classes = (
     MyProperties,
     WM_OT_World_Ref,
+    WM_OT_Select_World_Reference_Pieces,
     WM_OT_Export,
+    WM_OT_ExportAll,
+    OBJECT_OT_RelinkActorMeshes,
+    OBJECT_OT_CleanActorMaterials,
+    OBJECT_OT_ScatterActors,
+    OBJECT_OT_ValidateActors,
+    OBJECT_OT_SelectProblemActors,
     OBJECT_PT_LevelInfoPanel,
     EDIT_PT_LevelInfoPanel,
     OBJECT_PT_ActorInfoPanel,
@@ -1423,6 +3955,29 @@ def register():
     bpy.utils.register_manual_map(add_object_manual_map)
     bpy.types.VIEW3D_MT_mesh_add.append(add_object_button)
     
+    # forget the shared actor meshes and materials of the previous file
+    bpy.app.handlers.load_post.append(clear_actor_caches)
+    
+    # keep track of which actors need formatting again on the next export
+    bpy.app.handlers.depsgraph_update_post.append(track_actor_changes)
+    bpy.app.handlers.undo_post.append(invalidate_actor_table)
+    bpy.app.handlers.redo_post.append(invalidate_actor_table)
+    
+    # keep the geometry budget's figures for whatever didn't change
+    bpy.app.handlers.depsgraph_update_post.append(track_geometry_changes)
+    bpy.app.handlers.load_post.append(invalidate_geometry_budget)
+    bpy.app.handlers.undo_post.append(invalidate_geometry_budget)
+    bpy.app.handlers.redo_post.append(invalidate_geometry_budget)
+    
+    # draw far away actors as points once there are too many of them
+    actor_display["handler"] = bpy.types.SpaceView3D.draw_handler_add(draw_actor_proxies, (), 'WINDOW', 'POST_VIEW')
+    bpy.app.timers.register(actor_display_timer, first_interval=1.0, persistent=True)
+    bpy.app.handlers.save_pre.append(unhide_actor_proxies)
+    
+    # load the game's levels that come near as the anchor moves, swap world reference proxies for the full meshes
+    bpy.app.timers.register(world_reference_timer, first_interval=1.0, persistent=True)
+    bpy.app.handlers.load_post.append(forget_world_reference)
+    
     # add custom icons
     global custom_icons
     custom_icons = bpy.utils.previews.new()
@@ -1450,7 +4005,34 @@ def unregister():
     bpy.utils.unregister_class(OBJECT_OT_add_object)
     bpy.utils.unregister_manual_map(add_object_manual_map)
     bpy.types.VIEW3D_MT_mesh_add.remove(add_object_button)
+    
+    bpy.app.handlers.load_post.remove(clear_actor_caches)
+    
+    bpy.app.handlers.depsgraph_update_post.remove(track_actor_changes)
+    bpy.app.handlers.undo_post.remove(invalidate_actor_table)
+    bpy.app.handlers.redo_post.remove(invalidate_actor_table)
+    
+    bpy.app.handlers.depsgraph_update_post.remove(track_geometry_changes)
+    bpy.app.handlers.load_post.remove(invalidate_geometry_budget)
+    bpy.app.handlers.undo_post.remove(invalidate_geometry_budget)
+    bpy.app.handlers.redo_post.remove(invalidate_geometry_budget)
+    
+    bpy.types.SpaceView3D.draw_handler_remove(actor_display.pop("handler"), 'WINDOW')
+    if bpy.app.timers.is_registered(actor_display_timer):
+        bpy.app.timers.unregister(actor_display_timer)
+    bpy.app.handlers.save_pre.remove(unhide_actor_proxies)
+    if bpy.app.timers.is_registered(world_reference_timer):
+        bpy.app.timers.unregister(world_reference_timer)
+    stop_nearby_world_reference()
+    if bpy.app.timers.is_registered(update_geometry_budget):
+        bpy.app.timers.unregister(update_geometry_budget)
+    bpy.app.handlers.load_post.remove(forget_world_reference)
+    unhide_actor_proxies(None)
 
 
 if __name__ == "__main__":
-    register()
\ No newline at end of file
+    register()
+    
+    # run from the command line with arguments after --, see command_line()
+    if "--" in sys.argv:
+        sys.exit(command_line(sys.argv[sys.argv.index("--")+1:]))
\ No newline at end of file
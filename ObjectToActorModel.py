@@ -0,0 +1,14 @@
+import bpy, os, sys
+
+# writes the active mesh as a packed actor model that LevelBuilder loads from its actors folder
+# name the mesh after the actor type it's for (i.e. "money") or "actor" to replace the generic model
+# this needs the addon to be installed so LevelBuilder can be imported
+from LevelBuilder import write_actor_model
+
+me = bpy.context.object.data
+
+actors_dir = os.path.join(os.path.dirname(sys.modules["LevelBuilder"].__file__), "actors")
+filename = os.path.join(actors_dir, me.name.split('.')[0]+".bin")
+print(filename)
+
+write_actor_model(me, filename)
@@ -0,0 +1,262 @@
+import os, re, mmap, math, numpy
+
+# reads the decompiler's level .obj files into numpy arrays for the world reference.
+# it lives outside LevelBuilder.py so worker processes can import it without bpy.
+# the file is scanned as one byte array instead of line by line, a level has millions of lines
+
+# the texture and normal indices trailing a face corner, 3/1/2 -> 3
+corner_extras = re.compile(rb"/\S*")
+slashes = bytes.maketrans(b"/", b" ")
+
+def line_kinds(data):
+    # where each line starts, how long it is and its keyword
+    starts = numpy.concatenate(([0], numpy.flatnonzero(data == 10)+1))
+    starts = starts[starts < len(data)]
+    lengths = numpy.diff(numpy.append(starts, len(data)))
+    padded = numpy.append(data, [10, 10]) # every line gets a first and second byte to look at
+    first, second = padded[starts], padded[starts+1]
+    spaced = (second == 32) | (second == 9)
+    return starts, lengths, first, spaced
+
+def line_bodies(starts, lengths, kind):
+    # a mask over the file's bytes of the chosen lines, past their keyword and the space after it
+    mask = numpy.repeat(kind, lengths)
+    mask[starts[kind]] = False
+    mask[starts[kind]+1] = False
+    return mask
+
+# spaces, tabs and line ends, looked up for every byte of the file at once
+separator_bytes = numpy.zeros(256, bool)
+separator_bytes[[9, 10, 13, 32]] = True
+
+def word_starts(mask, separator):
+    # the positions of the first byte of every word inside the mask
+    starts = mask & ~separator
+    starts[1:] &= separator[:-1]
+    return numpy.flatnonzero(starts)
+
+def parse_vertices(data, separator, starts, lengths, is_vertex):
+    # v x y z, sometimes followed by a vertex color that the reference doesn't need.
+    # lines can have different widths, so each line's first three numbers are found by where its numbers start
+    count = int(is_vertex.sum())
+    if not count:
+        return numpy.zeros((0, 3), numpy.float32)
+    mask = line_bodies(starts, lengths, is_vertex)
+    values = numpy.fromstring(data[mask].tobytes(), numpy.float32, sep=" ")
+    positions = word_starts(mask, separator)
+    if len(values) != len(positions):
+        raise ValueError("a v line has something other than numbers")
+    line_starts, line_ends = starts[is_vertex], starts[is_vertex]+lengths[is_vertex]
+    first = numpy.searchsorted(positions, line_starts)
+    if (numpy.searchsorted(positions, line_ends)-first).min() < 3:
+        raise ValueError("a v line has fewer than three coordinates")
+    return values[first[:, None]+numpy.arange(3)]
+
+def parse_corners(data, separator, mask, corner_positions):
+    # the vertex index of every face corner. corners can be 3, 3/1, 3//2 or 3/1/2 and a file can mix them,
+    # the vertex is the number a corner starts with
+    numbers = numpy.fromstring(data[mask].tobytes().translate(slashes), numpy.int64, sep=" ")
+    positions = word_starts(mask, separator | (data == 47))
+    if len(numbers) == len(positions):
+        first = numpy.searchsorted(positions, corner_positions)
+        if numpy.array_equal(positions[numpy.minimum(first, len(positions)-1)], corner_positions):
+            return numbers[first]
+    return numpy.fromstring(corner_extras.sub(b"", data[mask].tobytes()), numpy.int64, sep=" ")
+
+def group_mesh(name, positions, loop_totals, indices):
+    # keep only the vertices this group uses, renumbered from 0 in their file order
+    low, high = int(indices.min()), int(indices.max())
+    used = numpy.zeros(high-low+1, bool)
+    used[indices-low] = True
+    remap = numpy.cumsum(used, dtype=numpy.int32)-1
+    co = positions[low:high+1][used]
+    # obj is y up, blender is z up. same as the obj importer's default -Z forward, Y up
+    co = numpy.stack((co[:, 0], -co[:, 2], co[:, 1]), axis=1)
+    return (name, numpy.ascontiguousarray(co, numpy.float32).ravel(), loop_totals.astype(numpy.int32), remap[indices-low])
+
+def parse_obj(path):
+    # one (name, co, loop_totals, loop_vertices) per object or group in the file, split like the obj importer does.
+    # faces before the first o or g line are named after the file
+    with open(path, "rb") as file:
+        raw = file.read()
+    data = numpy.frombuffer(raw, numpy.uint8)
+    if not len(data):
+        return []
+
+    starts, lengths, first, spaced = line_kinds(data)
+    is_vertex = (first == ord("v")) & spaced
+    is_face = (first == ord("f")) & spaced
+    is_group = ((first == ord("o")) | (first == ord("g"))) & spaced
+
+    separator = separator_bytes[data]
+    positions = parse_vertices(data, separator, starts, lengths, is_vertex)
+
+    # every face corner with the line it's on
+    mask = line_bodies(starts, lengths, is_face)
+    corner_positions = word_starts(mask, separator)
+    corner_lines = numpy.searchsorted(starts, corner_positions, "right")-1
+    if not len(corner_lines):
+        return []
+    indices = parse_corners(data, separator, mask, corner_positions)
+    if len(indices) != len(corner_lines):
+        raise ValueError(path+": couldn't read the face corners")
+
+    # negative indices count back from the vertices read so far
+    indices = numpy.where(indices < 0, numpy.cumsum(is_vertex)[corner_lines]+indices+1, indices)-1
+    if indices.min() < 0 or indices.max() >= len(positions):
+        raise ValueError(path+": a face uses a vertex that doesn't exist")
+
+    face_lines = numpy.flatnonzero(is_face)
+    loop_totals = numpy.bincount(corner_lines, minlength=len(starts))[face_lines]
+    face_lines, loop_totals = face_lines[loop_totals > 0], loop_totals[loop_totals > 0]
+
+    # faces come in file order, so each group's faces and corners are one run
+    group_of_line = numpy.cumsum(is_group)
+    face_groups = group_of_line[face_lines]
+    names = [os.path.splitext(os.path.basename(path))[0]]
+    names += [raw[start+2:start+length].strip().decode("utf-8", "replace") for start, length in zip(starts[is_group], lengths[is_group])]
+    corner_ends = numpy.cumsum(loop_totals)
+
+    groups = []
+    for group in numpy.unique(face_groups):
+        face_start, face_end = numpy.searchsorted(face_groups, group), numpy.searchsorted(face_groups, group, "right")
+        corner_start = corner_ends[face_start-1] if face_start else 0
+        corner_end = corner_ends[face_end-1]
+        groups.append(group_mesh(names[group], positions, loop_totals[face_start:face_end], indices[corner_start:corner_end]))
+    return groups
+
+def scan_bounds(path, chunk_size=1<<24):
+    # the min and max corner of the file's vertices as the decompiler wrote them, or None without any.
+    # only v lines are read, through mmap a chunk of whole lines at a time so a big file is never in memory at once
+    low, high = numpy.full(3, numpy.inf, numpy.float32), numpy.full(3, -numpy.inf, numpy.float32)
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if not size:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            start = 0
+            while start < size:
+                end = size if start+chunk_size >= size else view.rfind(b"\n", start, start+chunk_size)+1
+                if end <= start:
+                    end = view.find(b"\n", start+chunk_size)+1 or size # a line longer than a chunk
+                raw = view[start:end]
+                data = numpy.frombuffer(raw, numpy.uint8)
+                starts, lengths, first, spaced = line_kinds(data)
+                positions = parse_vertices(data, separator_bytes[data], starts, lengths, (first == ord("v")) & spaced)
+                if len(positions):
+                    low, high = numpy.minimum(low, positions.min(axis=0)), numpy.maximum(high, positions.max(axis=0))
+                start = end
+    if not numpy.all(low <= high):
+        return None
+    return [low.tolist(), high.tolist()]
+
+# converted files are cached as .npz, named after the .obj with its size and modification time so
+# an .obj that changes (a new extraction) misses its old entry and only that file is converted again
+cache_version = 1
+
+def cache_path(path, cache, proxy_ratio=None):
+    # proxies are kept next to the full file, one entry per ratio
+    stat = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    proxy = "-proxy"+format(proxy_ratio, "g") if proxy_ratio is not None else ""
+    return os.path.join(cache, name+"-"+str(stat.st_size)+"-"+str(stat.st_mtime_ns)+"-v"+str(cache_version)+proxy+".npz")
+
+def prune_cache(cache, paths, proxy_ratio=None):
+    # entries of .obj files that changed or are gone, proxies of other ratios and anything a crash left half written
+    keep = set([os.path.basename(cache_path(path, cache)) for path in paths])
+    if proxy_ratio is not None:
+        keep.update([os.path.basename(cache_path(path, cache, proxy_ratio)) for path in paths])
+    for item in os.listdir(cache):
+        if item.endswith((".npz", ".tmp")) and not item in keep:
+            os.remove(os.path.join(cache, item))
+
+def save_groups(groups, path):
+    # every group's arrays end to end, with the counts to split them again
+    names = [group[0] for group in groups]
+    arrays = dict(
+        names=numpy.array(names, str),
+        vertex_counts=numpy.array([len(group[1])//3 for group in groups], numpy.int64),
+        face_counts=numpy.array([len(group[2]) for group in groups], numpy.int64),
+        co=numpy.concatenate([group[1] for group in groups]) if groups else numpy.zeros(0, numpy.float32),
+        loop_totals=numpy.concatenate([group[2] for group in groups]) if groups else numpy.zeros(0, numpy.int32),
+        loop_vertices=numpy.concatenate([group[3] for group in groups]) if groups else numpy.zeros(0, numpy.int32),
+        )
+    with open(path+".tmp", "wb") as file:
+        numpy.savez(file, **arrays)
+    os.replace(path+".tmp", path) # a half written entry never looks finished
+
+def load_groups(path):
+    with numpy.load(path) as data:
+        names, vertex_counts, face_counts = data["names"], data["vertex_counts"], data["face_counts"]
+        co, loop_totals, loop_vertices = data["co"], data["loop_totals"], data["loop_vertices"]
+    vertex_ends, face_ends = numpy.cumsum(vertex_counts)*3, numpy.cumsum(face_counts)
+    loop_ends = numpy.cumsum(loop_totals)
+    groups = []
+    vertex_start, face_start, loop_start = 0, 0, 0
+    for name, vertex_end, face_end in zip(names, vertex_ends, face_ends):
+        loop_end = int(loop_ends[face_end-1]) if face_end else 0
+        groups.append((str(name), co[vertex_start:vertex_end], loop_totals[face_start:face_end], loop_vertices[loop_start:loop_end]))
+        vertex_start, face_start, loop_start = vertex_end, face_end, loop_end
+    return groups
+
+def triangles(loop_totals, loop_vertices):
+    # every polygon as a fan of triangles, (count, 3) vertex indices
+    counts = numpy.maximum(loop_totals.astype(numpy.int64)-2, 0)
+    polygon = numpy.repeat(numpy.arange(len(loop_totals)), counts)
+    corner = numpy.arange(int(counts.sum()))-numpy.repeat(numpy.cumsum(counts)-counts, counts)
+    starts = (numpy.cumsum(loop_totals, dtype=numpy.int64)-loop_totals)[polygon]
+    return numpy.stack((loop_vertices[starts], loop_vertices[starts+corner+1], loop_vertices[starts+corner+2]), axis=1)
+
+def decimate_group(group, ratio, attempts=8):
+    # vertex clustering: vertices are snapped into a grid whose cells are sized to leave about ratio of them,
+    # each cell becomes the average of its vertices and triangles that collapse are dropped
+    name, co, loop_totals, loop_vertices = group
+    positions = co.reshape(-1, 3).astype(numpy.float64)
+    target = max(len(positions)*ratio, 8)
+    if ratio >= 1 or len(positions) <= target:
+        return group
+    low = positions.min(axis=0)
+    size = max(float((positions.max(axis=0)-low).max()), 1e-6)
+    cell = size/math.sqrt(target) # a surface that fills its bounds has about this many cells
+    for attempt in range(attempts):
+        grid = numpy.floor((positions-low)/cell).astype(numpy.int64)
+        extent = grid.max(axis=0)+1
+        cells, inverse = numpy.unique((grid[:, 0]*extent[1]+grid[:, 1])*extent[2]+grid[:, 2], return_inverse=True)
+        if len(cells) <= target:
+            break
+        cell *= math.sqrt(len(cells)/target)*1.05
+    inverse = inverse.ravel()
+
+    counts = numpy.bincount(inverse, minlength=len(cells))
+    merged = numpy.stack([numpy.bincount(inverse, positions[:, axis], len(cells)) for axis in range(3)], axis=1)/counts[:, None]
+    faces = inverse[triangles(loop_totals, loop_vertices)]
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])]
+
+    # drop the cells no triangle uses anymore
+    used = numpy.zeros(len(cells), bool)
+    used[faces.ravel()] = True
+    remap = numpy.cumsum(used, dtype=numpy.int32)-1
+    return (name, merged[used].astype(numpy.float32).ravel(), numpy.full(len(faces), 3, numpy.int32), remap[faces].ravel())
+
+def convert_obj(path, cache, proxy_ratio=None):
+    # parse an .obj and keep the result for next time. with a proxy ratio the decimated groups are made, cached and returned,
+    # from the cached full file if it's already there
+    full_path = cache_path(path, cache) if cache is not None else None
+    if proxy_ratio is not None and full_path is not None and os.path.exists(full_path):
+        groups = load_groups(full_path)
+    else:
+        groups = parse_obj(path)
+        if full_path is not None:
+            try:
+                save_groups(groups, full_path)
+            except OSError:
+                pass # an unwritable cache only costs the next import its speed
+    if proxy_ratio is None:
+        return groups
+    proxies = [decimate_group(group, proxy_ratio) for group in groups]
+    if cache is not None:
+        try:
+            save_groups(proxies, cache_path(path, cache, proxy_ratio))
+        except OSError:
+            pass
+    return proxies